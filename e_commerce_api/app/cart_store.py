@@ -0,0 +1,499 @@
+import asyncio
+import itertools
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional
+
+from colorama import Fore, Style
+from sqlalchemy import event, func, insert
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, delete, select, update
+
+from app.database import engine
+from app.models import Cart, CartItem, CartLineSummary, CartSummary, Product, Reservation
+from app.reservations import StockShortage, set_holds
+
+# "sqlite" keeps carts in the cart/cartitem tables; "memory" keeps them in process
+CART_STORE = os.getenv("CART_STORE", "sqlite")
+# Memory store: carts untouched this long are dropped
+CART_TTL = float(os.getenv("CART_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+# Memory store: most carts kept; the least recently used go first
+CART_MAX_ENTRIES = int(os.getenv("CART_MAX_ENTRIES", "100000"))
+# Memory store: how often changed carts are written behind to the tables;
+# 0 writes nothing until checkout (carts are lost on restart)
+CART_FLUSH_INTERVAL = float(os.getenv("CART_FLUSH_INTERVAL_SECONDS", "0"))
+# How often idle carts are dropped when write-behind is off
+CART_SWEEP_INTERVAL = 60.0
+
+
+class CheckoutConflict(Exception):
+    """Raised when a cart was checked out by another request while this checkout ran."""
+
+    def __init__(self, cart_id: int):
+        super().__init__(f"Cart {cart_id} was already checked out")
+        self.cart_id = cart_id
+
+
+class CartStore(ABC):
+    """
+    Where active carts live. The cart router reads and changes carts only
+    through these methods, so the backend can be swapped with CART_STORE.
+    """
+
+    @abstractmethod
+    def items(self, session: Session, user_id: int) -> List[CartItem]:
+        """The user's cart lines, oldest first; empty if there is no cart."""
+
+    @abstractmethod
+    def item(self, session: Session, user_id: int, item_id: int) -> Optional[CartItem]:
+        """One line of the user's cart, or None."""
+
+    @abstractmethod
+    def quantities(self, session: Session, user_id: int) -> Dict[int, int]:
+        """Product id -> units in the user's cart."""
+
+    @abstractmethod
+    def set_quantities(self, session: Session, user_id: int, quantities: Dict[int, int]) -> None:
+        """
+        Sets the cart's lines to `quantities` (product id -> units; 0 removes
+        the line), creating the cart if needed, and saves the change. Raises
+        StockShortage if a product is missing or short, changing nothing.
+        """
+
+    @abstractmethod
+    def summary(self, session: Session, user_id: int) -> CartSummary:
+        """The cart with product names, prices, line totals and availability."""
+
+    @abstractmethod
+    def clear(self, session: Session, user_id: int, cart_id: int) -> None:
+        """
+        Removes cart `cart_id` (the one whose items are being ordered) as
+        part of the caller's checkout transaction. Raises CheckoutConflict if
+        it is no longer the user's active cart: a concurrent checkout took it.
+        """
+
+    def flush(self) -> int:
+        """Writes pending changes to the database; returns how many carts were written."""
+        return 0
+
+
+class SQLCartStore(CartStore):
+    """Carts as cart/cartitem rows, with their stock held by reservations."""
+
+    def _cart(self, session: Session, user_id: int) -> Optional[Cart]:
+        return session.exec(
+            select(Cart).where(Cart.user_id == user_id, Cart.is_active == True)
+        ).first()
+
+    def _lines(self, user_id: int):
+        return (
+            select(CartItem)
+            .join(Cart, Cart.id == CartItem.cart_id)
+            .where(Cart.user_id == user_id, Cart.is_active == True)
+        )
+
+    def items(self, session: Session, user_id: int) -> List[CartItem]:
+        return session.exec(self._lines(user_id).order_by(CartItem.id)).all()
+
+    def item(self, session: Session, user_id: int, item_id: int) -> Optional[CartItem]:
+        return session.exec(self._lines(user_id).where(CartItem.id == item_id)).first()
+
+    def quantities(self, session: Session, user_id: int) -> Dict[int, int]:
+        return dict(session.exec(
+            select(CartItem.product_id, CartItem.quantity)
+            .join(Cart, Cart.id == CartItem.cart_id)
+            .where(Cart.user_id == user_id, Cart.is_active == True)
+        ).all())
+
+    def set_quantities(self, session: Session, user_id: int, quantities: Dict[int, int]) -> None:
+        """
+        Holds stock for the new quantities, then writes the lines; existing
+        lines, product stock and holds are each read with one query and
+        written back in batches, all in a single commit.
+        """
+        cart = self._cart(session, user_id)
+        if cart is None:
+            if not any(quantities.values()):
+                return
+            # Flushed, not committed: the cart is saved with its first line
+            cart = Cart(user_id=user_id)
+            session.add(cart)
+            session.flush()
+
+        try:
+            set_holds(session, cart.id, quantities)
+        except StockShortage:
+            session.rollback()
+            raise
+
+        lines = {
+            item.product_id: item
+            for item in session.exec(
+                select(CartItem).where(CartItem.cart_id == cart.id, CartItem.product_id.in_(quantities))
+            ).all()
+        }
+        removed = [lines[pid].id for pid, quantity in quantities.items() if quantity == 0 and pid in lines]
+        changed = [
+            {"id": lines[pid].id, "quantity": quantity}
+            for pid, quantity in quantities.items()
+            if quantity > 0 and pid in lines and lines[pid].quantity != quantity
+        ]
+        added = [
+            {"cart_id": cart.id, "product_id": pid, "quantity": quantity}
+            for pid, quantity in quantities.items() if quantity > 0 and pid not in lines
+        ]
+        if removed:
+            session.exec(delete(CartItem).where(CartItem.id.in_(removed)))
+        if changed:
+            session.exec(update(CartItem), params=changed)
+        if added:
+            session.exec(insert(CartItem), params=added)
+        session.commit()
+
+    def summary(self, session: Session, user_id: int) -> CartSummary:
+        """
+        Reads the cart with its products in a single query; the cart total
+        is a window aggregate over the same rows.
+        """
+        line_total = Product.price * CartItem.quantity
+        rows = session.exec(
+            select(
+                CartItem.id.label("item_id"),
+                CartItem.product_id,
+                Product.name.label("product_name"),
+                Product.price.label("unit_price"),
+                CartItem.quantity,
+                line_total.label("line_total"),
+                Product.stock,
+                # Units this cart holds count as available to it
+                (Product.stock - Product.reserved + func.coalesce(Reservation.quantity, 0) >= CartItem.quantity).label("in_stock"),
+                func.sum(line_total).over().label("cart_total"),
+                func.sum(CartItem.quantity).over().label("item_count"),
+            )
+            .join(Cart, Cart.id == CartItem.cart_id)
+            .join(Product, Product.id == CartItem.product_id)
+            .outerjoin(
+                Reservation,
+                (Reservation.cart_id == CartItem.cart_id) & (Reservation.product_id == CartItem.product_id)
+            )
+            .where(Cart.user_id == user_id, Cart.is_active == True)
+            .order_by(CartItem.id)
+        ).all()
+
+        items = [CartLineSummary.model_validate(row._mapping) for row in rows]
+        return CartSummary(
+            items=items,
+            item_count=rows[0].item_count if rows else 0,
+            cart_total=rows[0].cart_total if rows else 0.0,
+            all_in_stock=all(item.in_stock for item in items)
+        )
+
+    def clear(self, session: Session, user_id: int, cart_id: int) -> None:
+        session.exec(delete(CartItem).where(CartItem.cart_id == cart_id))
+        result = session.exec(delete(Cart).where(Cart.id == cart_id, Cart.user_id == user_id, Cart.is_active == True))
+        if result.rowcount != 1:
+            raise CheckoutConflict(cart_id)
+
+
+class MemoryCart:
+    __slots__ = ("id", "user_id", "lines", "dirty", "persisted", "closed")
+
+    def __init__(self, cart_id: int, user_id: int, lines: Dict[int, CartItem], persisted: bool = False):
+        self.id = cart_id
+        self.user_id = user_id
+        # product id -> line
+        self.lines = lines
+        # Changed since it was last written to the tables
+        self.dirty = False
+        # Has cart/cartitem rows
+        self.persisted = persisted
+        # Being checked out; the flusher must not write it back
+        self.closed = False
+
+
+class MemoryCartStore(CartStore):
+    """
+    Active carts in process memory, keyed by user id.
+
+    Adding to a cart reads product stock once and commits nothing; carts
+    reach the database only as orders at checkout, or, with a flush
+    interval, when the flusher writes changed carts behind. Carts idle for
+    `ttl` seconds are dropped (with any rows written for them), and past
+    `max_entries` the least recently used are evicted.
+
+    Stock is checked when items are added and taken at checkout, but not
+    held in between: holds are database writes, which is what this store
+    avoids. Carts live in one process, so with several workers each user
+    must keep reaching the same one.
+    """
+
+    def __init__(
+        self,
+        ttl: float = CART_TTL,
+        max_entries: int = CART_MAX_ENTRIES,
+        write_behind: bool = CART_FLUSH_INTERVAL > 0,
+        bind: Engine = engine,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.write_behind = write_behind
+        self.bind = bind
+        # user id -> cart, least recently used first
+        self._carts: "OrderedDict[int, MemoryCart]" = OrderedDict()
+        self._touched: Dict[int, float] = {}
+        # Changed carts evicted before the flusher got to them
+        self._evicted: Dict[int, MemoryCart] = {}
+        # Ids of dropped carts whose rows must be deleted
+        self._deleted: List[int] = []
+        self._cart_ids: Optional[Iterator[int]] = None
+        self._item_ids: Optional[Iterator[int]] = None
+        self._lock = threading.RLock()
+
+    def _start_ids(self, session: Session) -> None:
+        # New ids continue after the tables' so carts written behind (and
+        # reservations left by the SQLite store) never collide
+        if self._cart_ids is None:
+            last_cart = session.exec(select(func.max(Cart.id))).one() or 0
+            last_item = session.exec(select(func.max(CartItem.id))).one() or 0
+            with self._lock:
+                if self._cart_ids is None:
+                    self._item_ids = itertools.count(last_item + 1)
+                    self._cart_ids = itertools.count(last_cart + 1)
+
+    def _load(self, session: Session, user_id: int) -> Optional[MemoryCart]:
+        cart = session.exec(select(Cart).where(Cart.user_id == user_id, Cart.is_active == True)).first()
+        if cart is None:
+            return None
+        lines = session.exec(select(CartItem).where(CartItem.cart_id == cart.id)).all()
+        return MemoryCart(
+            cart.id, user_id,
+            {line.product_id: CartItem(id=line.id, cart_id=cart.id, product_id=line.product_id, quantity=line.quantity) for line in lines},
+            persisted=True
+        )
+
+    def _get(self, session: Session, user_id: int, create: bool = False) -> Optional[MemoryCart]:
+        with self._lock:
+            cart = self._carts.get(user_id)
+            if cart is not None:
+                self._carts.move_to_end(user_id)
+                self._touched[user_id] = time.monotonic()
+                return cart
+            cart = self._evicted.pop(user_id, None)
+
+        # A cart written behind before a restart or eviction
+        if cart is None and self.write_behind:
+            cart = self._load(session, user_id)
+        if cart is None:
+            if not create:
+                return None
+            self._start_ids(session)
+
+        with self._lock:
+            if user_id in self._carts:  # Another request got there first
+                self._touched[user_id] = time.monotonic()
+                return self._carts[user_id]
+            if cart is None:
+                cart = MemoryCart(next(self._cart_ids), user_id, {})
+            self._carts[user_id] = cart
+            self._touched[user_id] = time.monotonic()
+            while len(self._carts) > self.max_entries:
+                evicted_user, evicted = self._carts.popitem(last=False)
+                del self._touched[evicted_user]
+                if evicted.dirty and self.write_behind:
+                    self._evicted[evicted_user] = evicted
+            return cart
+
+    def items(self, session: Session, user_id: int) -> List[CartItem]:
+        cart = self._get(session, user_id)
+        if cart is None:
+            return []
+        with self._lock:
+            return sorted((line.model_copy() for line in cart.lines.values()), key=lambda line: line.id)
+
+    def item(self, session: Session, user_id: int, item_id: int) -> Optional[CartItem]:
+        return next((line for line in self.items(session, user_id) if line.id == item_id), None)
+
+    def quantities(self, session: Session, user_id: int) -> Dict[int, int]:
+        cart = self._get(session, user_id)
+        if cart is None:
+            return {}
+        with self._lock:
+            return {product_id: line.quantity for product_id, line in cart.lines.items()}
+
+    def set_quantities(self, session: Session, user_id: int, quantities: Dict[int, int]) -> None:
+        cart = self._get(session, user_id, create=any(quantities.values()))
+        if cart is None:
+            return
+        with self._lock:
+            current = {product_id: line.quantity for product_id, line in cart.lines.items()}
+
+        increases = [pid for pid, quantity in quantities.items() if quantity > current.get(pid, 0)]
+        if increases:
+            available = dict(session.exec(
+                select(Product.id, Product.stock - Product.reserved).where(Product.id.in_(increases))
+            ).all())
+            for product_id in sorted(increases):
+                if product_id not in available:
+                    raise StockShortage(product_id, quantities[product_id], None)
+                if available[product_id] < quantities[product_id]:
+                    raise StockShortage(product_id, quantities[product_id], available[product_id])
+            self._start_ids(session)
+
+        with self._lock:
+            for product_id, quantity in quantities.items():
+                line = cart.lines.get(product_id)
+                if quantity <= 0:
+                    cart.lines.pop(product_id, None)
+                elif line is not None:
+                    line.quantity = quantity
+                else:
+                    cart.lines[product_id] = CartItem(
+                        id=next(self._item_ids), cart_id=cart.id, product_id=product_id, quantity=quantity
+                    )
+            cart.dirty = True
+
+    def summary(self, session: Session, user_id: int) -> CartSummary:
+        lines = self.items(session, user_id)
+        products = {
+            product.id: product
+            for product in session.exec(select(Product).where(Product.id.in_([line.product_id for line in lines]))).all()
+        } if lines else {}
+        items = [
+            CartLineSummary(
+                item_id=line.id,
+                product_id=line.product_id,
+                product_name=products[line.product_id].name,
+                unit_price=products[line.product_id].price,
+                quantity=line.quantity,
+                line_total=products[line.product_id].price * line.quantity,
+                stock=products[line.product_id].stock,
+                in_stock=products[line.product_id].stock - products[line.product_id].reserved >= line.quantity,
+            )
+            for line in lines if line.product_id in products
+        ]
+        return CartSummary(
+            items=items,
+            item_count=sum(item.quantity for item in items),
+            cart_total=sum(item.line_total for item in items),
+            all_in_stock=all(item.in_stock for item in items)
+        )
+
+    def clear(self, session: Session, user_id: int, cart_id: int) -> None:
+        """
+        Marks the cart closed so the flusher skips it, deletes any rows
+        written for it in the checkout transaction, and drops it from memory
+        once that commits (or reopens it on rollback). A cart another
+        checkout has closed or already dropped is a CheckoutConflict.
+        """
+        with self._lock:
+            cart = self._carts.get(user_id)
+            if cart is None or cart.id != cart_id or cart.closed:
+                raise CheckoutConflict(cart_id)
+            cart.closed = True
+        if cart.persisted:
+            session.exec(delete(CartItem).where(CartItem.cart_id == cart.id))
+            session.exec(delete(Cart).where(Cart.id == cart.id))
+
+        def drop(_session):
+            with self._lock:
+                if self._carts.get(user_id) is cart:
+                    del self._carts[user_id]
+                    del self._touched[user_id]
+
+        def reopen(_session):
+            cart.closed = False
+
+        event.listen(session, "after_commit", drop, once=True)
+        event.listen(session, "after_rollback", reopen, once=True)
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Drops carts idle for longer than the TTL and returns how many."""
+        cutoff = (now if now is not None else time.monotonic()) - self.ttl
+        expired = 0
+        with self._lock:
+            # Least recently used first, so stop at the first live cart
+            for user_id in list(self._carts):
+                if self._touched[user_id] > cutoff:
+                    break
+                cart = self._carts.pop(user_id)
+                del self._touched[user_id]
+                if cart.persisted:
+                    self._deleted.append(cart.id)
+                expired += 1
+        return expired
+
+    def flush(self) -> int:
+        """
+        Drops expired carts and, with write-behind, writes every changed cart
+        (lines replaced wholesale) in one transaction.
+        """
+        self.expire()
+        with self._lock:
+            deleted, self._deleted = self._deleted, []
+            evicted, self._evicted = self._evicted, {}
+            pending = [cart for cart in self._carts.values() if cart.dirty] + list(evicted.values())
+            if not self.write_behind:
+                pending = []
+            for cart in pending:
+                cart.dirty = False
+        if not deleted and not pending:
+            return 0
+
+        try:
+            with Session(self.bind) as session:
+                # A write first, making this SQLite's writer: any checkout
+                # has either committed (after closing its cart) or waits
+                session.exec(delete(CartItem).where(CartItem.cart_id.in_(deleted)))
+                session.exec(delete(Cart).where(Cart.id.in_(deleted)))
+                with self._lock:
+                    pending = [cart for cart in pending if not cart.closed]
+                    carts = [{"id": cart.id, "user_id": cart.user_id, "is_active": True} for cart in pending]
+                    lines = [
+                        {"id": line.id, "cart_id": cart.id, "product_id": line.product_id, "quantity": line.quantity}
+                        for cart in pending for line in cart.lines.values()
+                    ]
+                if carts:
+                    session.connection().execute(insert(Cart.__table__).prefix_with("OR IGNORE"), carts)
+                    session.exec(delete(CartItem).where(CartItem.cart_id.in_([cart["id"] for cart in carts])))
+                if lines:
+                    session.connection().execute(insert(CartItem.__table__), lines)
+                session.commit()
+        except Exception:
+            with self._lock:
+                self._deleted.extend(deleted)
+                for cart in pending:
+                    cart.dirty = True
+            raise
+
+        with self._lock:
+            for cart in pending:
+                cart.persisted = True
+        return len(pending)
+
+
+def create_cart_store(kind: str = CART_STORE) -> CartStore:
+    if kind == "sqlite":
+        return SQLCartStore()
+    if kind == "memory":
+        return MemoryCartStore()
+    raise ValueError(f"Unknown CART_STORE {kind!r}; expected 'sqlite' or 'memory'")
+
+
+cart_store = create_cart_store()
+
+
+async def run_flusher() -> None:
+    """Background task, started from the app lifespan, that flushes and expires carts."""
+    interval = CART_FLUSH_INTERVAL or CART_SWEEP_INTERVAL
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            written = await asyncio.to_thread(cart_store.flush)
+            if written:
+                print(f"{Fore.CYAN}INFO: Wrote {written} carts behind.{Style.RESET_ALL}")
+        except Exception as e:
+            print(f"{Fore.RED}ERROR: Cart flush failed: {e}{Style.RESET_ALL}")
+
@@ -1,5 +1,8 @@
 from sqlmodel import create_engine, Session, SQLModel
 
+from app.rollups import backfill_rollups
+from app.search import create_search_index
+
 # Define the database file name
 sqlite_file_name = "e_commerce.db"
 # Create the SQLAlchemy engine for SQLite
@@ -11,6 +14,27 @@ engine = create_engine(sqlite_url, echo=True, connect_args={"check_same_thread":
 def create_db_and_tables():
     """Creates all database tables defined in the models."""
     SQLModel.metadata.create_all(engine)
+    # create_all skips tables that already exist, and with them any index added since
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+    create_search_index(engine)
+    migrate_product_reserved()
+    drop_obsolete_indexes()
+    backfill_rollups(engine)
+
+def migrate_product_reserved():
+    """Adds the `product.reserved` counter to databases created before reservations."""
+    with engine.begin() as conn:
+        columns = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(product)")]
+        if "reserved" not in columns:
+            conn.exec_driver_sql("ALTER TABLE product ADD COLUMN reserved INTEGER NOT NULL DEFAULT 0")
+
+def drop_obsolete_indexes():
+    """Drops the product indexes that ix_product_price_listing / ix_product_name_listing replace."""
+    with engine.begin() as conn:
+        for name in ("ix_product_name", "ix_product_price_id", "ix_product_name_id"):
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
 
 def get_session():
     """Dependency to get a database session."""
@@ -0,0 +1,303 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from colorama import Fore, Style
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_, or_
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, delete, select, update
+
+from app.database import engine
+from app.models import IdempotencyRecord
+from app.security import SECRET_KEY
+
+# How long a key's stored response is replayed
+IDEMPOTENCY_TTL = timedelta(seconds=int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 60 * 60))))
+# How often the background task deletes expired records
+CLEANUP_INTERVAL = float(os.getenv("IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS", "600"))
+CLEANUP_BATCH_SIZE = 1000
+
+RecordKey = Tuple[str, str]
+
+
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    status_code: Optional[int]
+    body: Any
+    expires_at: datetime
+
+    @property
+    def in_progress(self) -> bool:
+        return self.status_code is None
+
+
+def request_fingerprint(*parts: Any) -> str:
+    """
+    Keyed hash of the request data, used to reject a key reused for a
+    different request. Keyed so that request bodies containing passwords
+    cannot be recovered from the table.
+    """
+    payload = json.dumps(jsonable_encoder(parts), sort_keys=True, separators=(",", ":")).encode()
+    return hmac.new(SECRET_KEY.encode(), payload, hashlib.sha256).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Makes mutating endpoints safe to retry with an `Idempotency-Key` header.
+
+    The first request with a key claims it by inserting an in-progress row
+    (INSERT ... ON CONFLICT DO NOTHING, so exactly one request wins even
+    across workers), runs, and stores its status code and body. Retries
+    with the same key get the stored response back instead of running
+    again; a retry that arrives while the first request is still running
+    waits for it. Completed responses are also kept in an in-process LRU
+    so replays usually skip the database.
+
+    Responses with a 5xx status, or that raise unexpectedly, are not
+    stored and free the key for another attempt. An in-progress claim
+    whose owner died is taken over once `lock_timeout` passes.
+    """
+
+    def __init__(
+        self,
+        ttl: timedelta = IDEMPOTENCY_TTL,
+        lock_timeout: timedelta = timedelta(seconds=60),
+        wait_timeout: float = 30.0,
+        poll_interval: float = 0.05,
+        cache_size: int = 10_000,
+    ):
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[RecordKey, StoredResponse]" = OrderedDict()
+        self._inflight: Dict[RecordKey, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def run(
+        self,
+        key: Optional[str],
+        scope: str,
+        fingerprint: str,
+        status_code: int,
+        handler: Callable[[], Any],
+        replay_body: Any = None,
+    ) -> Any:
+        """
+        Runs `handler` at most once per (scope, key) and returns its result,
+        or a JSONResponse replaying the stored outcome. Without a key the
+        handler just runs.
+
+        `replay_body`, when given, is not stored: a replayed success returns
+        it instead. It is for responses that only echo the request (and may
+        hold secrets that should not be written to the table).
+        """
+        if key is None:
+            return handler()
+
+        record_key = (scope, key)
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            stored = self._lookup(record_key)
+            if stored is not None and stored.fingerprint != fingerprint:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="This Idempotency-Key was already used for a different request."
+                )
+            if stored is not None and not stored.in_progress:
+                body = stored.body if stored.body is not None else jsonable_encoder(replay_body)
+                return JSONResponse(content=body, status_code=stored.status_code, headers={"Idempotent-Replayed": "true"})
+
+            if stored is None:
+                claimed = self._claim(record_key, fingerprint)
+                if claimed is None:
+                    continue
+                # Registered only once the key is ours, so a request that loses
+                # the claim never replaces the owner's event
+                event = threading.Event()
+                with self._lock:
+                    self._inflight[record_key] = event
+                return self._execute(record_key, claimed, status_code, handler, replay_body is not None, event)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is still being processed."
+                )
+            with self._lock:
+                event = self._inflight.get(record_key)
+            # Same process: wake up as soon as the first request finishes;
+            # otherwise the owner is another worker, so poll the table
+            if event is not None:
+                event.wait(remaining)
+            else:
+                time.sleep(min(self.poll_interval, remaining))
+
+    def _execute(
+        self,
+        record_key: RecordKey,
+        claimed: StoredResponse,
+        status_code: int,
+        handler: Callable[[], Any],
+        echo: bool,
+        event: threading.Event,
+    ) -> Any:
+        try:
+            try:
+                result = handler()
+            except HTTPException as e:
+                if e.status_code < 500:
+                    self._complete(record_key, claimed, e.status_code, {"detail": e.detail})
+                else:
+                    self._release(record_key)
+                raise
+            except BaseException:
+                self._release(record_key)
+                raise
+            self._complete(record_key, claimed, status_code, None if echo else jsonable_encoder(result))
+            return result
+        finally:
+            with self._lock:
+                if self._inflight.get(record_key) is event:
+                    del self._inflight[record_key]
+            event.set()
+
+    def _lookup(self, record_key: RecordKey) -> Optional[StoredResponse]:
+        now = datetime.utcnow()
+        with self._lock:
+            cached = self._cache.get(record_key)
+            if cached is not None:
+                if cached.expires_at > now:
+                    self._cache.move_to_end(record_key)
+                    return cached
+                del self._cache[record_key]
+
+        scope, key = record_key
+        with Session(engine) as session:
+            record = session.exec(
+                select(IdempotencyRecord).where(IdempotencyRecord.scope == scope, IdempotencyRecord.key == key)
+            ).first()
+        if record is None or record.expires_at <= now:
+            return None
+        if record.status_code is None:
+            if record.locked_until is not None and record.locked_until <= now:
+                return None  # Abandoned claim; _claim() will take it over
+            return StoredResponse(record.fingerprint, None, None, record.expires_at)
+
+        body = json.loads(record.response_body) if record.response_body is not None else None
+        stored = StoredResponse(record.fingerprint, record.status_code, body, record.expires_at)
+        self._remember(record_key, stored)
+        return stored
+
+    def _claim(self, record_key: RecordKey, fingerprint: str) -> Optional[StoredResponse]:
+        """Claims the key for this request; returns the in-progress record, or None if another request holds it."""
+        scope, key = record_key
+        now = datetime.utcnow()
+        values = {
+            "fingerprint": fingerprint,
+            "status_code": None,
+            "response_body": None,
+            "locked_until": now + self.lock_timeout,
+            "expires_at": now + self.ttl,
+        }
+        with Session(engine) as session:
+            result = session.exec(
+                insert(IdempotencyRecord).values(scope=scope, key=key, **values).on_conflict_do_nothing()
+            )
+            if result.rowcount != 1:
+                # Reuse an expired record, or one whose owner never finished
+                result = session.exec(
+                    update(IdempotencyRecord)
+                    .where(
+                        IdempotencyRecord.scope == scope,
+                        IdempotencyRecord.key == key,
+                        or_(
+                            IdempotencyRecord.expires_at <= now,
+                            and_(IdempotencyRecord.status_code == None, IdempotencyRecord.locked_until <= now)
+                        )
+                    )
+                    .values(**values)
+                )
+            session.commit()
+        if result.rowcount != 1:
+            return None
+        return StoredResponse(fingerprint, None, None, values["expires_at"])
+
+    def _complete(self, record_key: RecordKey, claimed: StoredResponse, status_code: int, body: Any) -> None:
+        scope, key = record_key
+        with Session(engine) as session:
+            session.exec(
+                update(IdempotencyRecord)
+                .where(IdempotencyRecord.scope == scope, IdempotencyRecord.key == key)
+                .values(status_code=status_code, response_body=json.dumps(body) if body is not None else None, locked_until=None)
+            )
+            session.commit()
+        self._remember(record_key, claimed._replace(status_code=status_code, body=body))
+
+    def _release(self, record_key: RecordKey) -> None:
+        scope, key = record_key
+        with Session(engine) as session:
+            session.exec(
+                delete(IdempotencyRecord).where(
+                    IdempotencyRecord.scope == scope,
+                    IdempotencyRecord.key == key,
+                    IdempotencyRecord.status_code == None
+                )
+            )
+            session.commit()
+
+    def _remember(self, record_key: RecordKey, stored: StoredResponse) -> None:
+        with self._lock:
+            self._cache[record_key] = stored
+            self._cache.move_to_end(record_key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def clear(self) -> None:
+        """Forgets the cached responses; the table is left alone."""
+        with self._lock:
+            self._cache.clear()
+
+    def delete_expired(self, batch_size: int = CLEANUP_BATCH_SIZE) -> int:
+        """Deletes expired records, batch by batch, and returns how many."""
+        total = 0
+        while True:
+            now = datetime.utcnow()
+            with Session(engine) as session:
+                expired = select(IdempotencyRecord.id).where(IdempotencyRecord.expires_at <= now).limit(batch_size)
+                result = session.exec(delete(IdempotencyRecord).where(IdempotencyRecord.id.in_(expired)))
+                session.commit()
+            total += result.rowcount
+            if result.rowcount < batch_size:
+                break
+        with self._lock:
+            for record_key in [k for k, v in self._cache.items() if v.expires_at <= now]:
+                del self._cache[record_key]
+        return total
+
+
+idempotency_store = IdempotencyStore()
+
+
+async def run_cleanup(interval: float = CLEANUP_INTERVAL) -> None:
+    """Background task, started from the app lifespan, that deletes expired records."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            deleted = await asyncio.to_thread(idempotency_store.delete_expired)
+            if deleted:
+                print(f"{Fore.CYAN}INFO: Removed {deleted} expired idempotency records.{Style.RESET_ALL}")
+        except Exception as e:
+            print(f"{Fore.RED}ERROR: Idempotency cleanup failed: {e}{Style.RESET_ALL}")
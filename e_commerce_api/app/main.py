@@ -1,13 +1,20 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from colorama import Fore, Style, init
 from sqlmodel import Session
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.database import create_db_and_tables, get_session
-from app.routers import products, users, cart
-from app.middleware.timing import TimingMiddleware
+from app.routers import products, users, cart, orders, reports
+from app.middleware.metrics import MetricsMiddleware, request_metrics
 from app.security import create_initial_admin_user
+from app.reservations import run_sweeper
+from app.idempotency import run_cleanup
+from app.recommendations import run_reloader
+from app.cart_store import cart_store, run_flusher
+from app.stock_stream import run_broadcaster
 
 init(autoreset=True)
 
@@ -18,7 +25,19 @@ async def lifespan(app: FastAPI):
     with next(get_session()) as session:
         print(f"{Fore.MAGENTA}INFO: Ensuring initial admin user exists...{Style.RESET_ALL}")
         create_initial_admin_user(session)
+    sweeper = asyncio.create_task(run_sweeper())
+    idempotency_cleanup = asyncio.create_task(run_cleanup())
+    related_reloader = asyncio.create_task(run_reloader())
+    cart_flusher = asyncio.create_task(run_flusher())
+    stock_stream = asyncio.create_task(run_broadcaster())
     yield
+    sweeper.cancel()
+    idempotency_cleanup.cancel()
+    related_reloader.cancel()
+    cart_flusher.cancel()
+    stock_stream.cancel()
+    # Write-behind carts changed since the last flush
+    cart_store.flush()
     print(f"{Fore.MAGENTA}INFO: Application shutdown complete.{Style.RESET_ALL}")
 
 app = FastAPI(
@@ -42,14 +61,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Timing Middleware
-app.add_middleware(TimingMiddleware)
+# Latency metrics and Server-Timing header (pure ASGI, safe for streaming responses)
+app.add_middleware(MetricsMiddleware, metrics=request_metrics)
 
-# Include both routers
+# Include the routers
 app.include_router(products.router)
 app.include_router(users.router)
 app.include_router(cart.router)
+app.include_router(orders.router)
+app.include_router(orders.admin_router)
+app.include_router(reports.router)
 
 @app.get("/")
 def read_root():
-    return {"message": "Welcome to the E-Commerce API"}
\ No newline at end of file
+    return {"message": "Welcome to the E-Commerce API"}
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    """Request latency histograms in Prometheus text format."""
+    return PlainTextResponse(request_metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
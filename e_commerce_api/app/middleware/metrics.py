@@ -0,0 +1,161 @@
+from time import perf_counter_ns
+from typing import Dict, List, Optional, Tuple
+
+# Log-linear buckets (as in HDR histograms): every power of two is split
+# into 2**SUB_BUCKET_BITS linear sub-buckets, so a recorded value is off by
+# at most 1/8 (12.5%) whatever its magnitude, with a fixed bucket count.
+SUB_BUCKET_BITS = 3
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# Values up to 2**41 ns (~36 minutes); anything longer lands in the last bucket
+MAX_VALUE_BITS = 41
+BUCKET_COUNT = SUB_BUCKETS * (MAX_VALUE_BITS - SUB_BUCKET_BITS) + SUB_BUCKETS
+
+# `le` boundaries (seconds) exported to Prometheus
+EXPORT_BOUNDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Label used for requests that matched no route, so stray paths cannot
+# create unbounded series
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def bucket_index(value: int) -> int:
+    """Maps a non-negative integer to its log-linear bucket."""
+    if value < 2 * SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return min(SUB_BUCKETS * shift + (value >> shift), BUCKET_COUNT - 1)
+
+
+def bucket_upper_bound(index: int) -> int:
+    """Largest value that falls into bucket `index`."""
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift, top = divmod(index, SUB_BUCKETS)
+    shift -= 1
+    return ((top + SUB_BUCKETS + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """Fixed-size log-linear histogram of nanosecond durations."""
+
+    __slots__ = ("counts", "count", "total_ns")
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total_ns = 0
+
+    def record(self, value_ns: int) -> None:
+        # bucket_index() inlined: this runs once per request
+        if value_ns < 2 * SUB_BUCKETS:
+            index = value_ns
+        else:
+            shift = value_ns.bit_length() - SUB_BUCKET_BITS - 1
+            index = SUB_BUCKETS * shift + (value_ns >> shift)
+            if index >= BUCKET_COUNT:
+                index = BUCKET_COUNT - 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ns += value_ns
+
+    def percentile(self, p: float) -> int:
+        """Upper bound (ns) of the bucket holding the p-th percentile, 0 <= p <= 100."""
+        if not self.count:
+            return 0
+        rank = max(1, round(self.count * p / 100))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bucket_upper_bound(index)
+        return bucket_upper_bound(BUCKET_COUNT - 1)
+
+    def cumulative_counts(self, bounds_ns: List[int]) -> List[int]:
+        """Counts of values in buckets lying entirely at or below each bound."""
+        result = []
+        seen = 0
+        index = 0
+        for bound in bounds_ns:
+            while index < BUCKET_COUNT and bucket_upper_bound(index) <= bound:
+                seen += self.counts[index]
+                index += 1
+            result.append(seen)
+        return result
+
+
+SeriesKey = Tuple[str, str, int]
+
+
+class RequestMetrics:
+    """Latency histograms keyed by (method, route template, status)."""
+
+    def __init__(self):
+        self.histograms: Dict[SeriesKey, LatencyHistogram] = {}
+
+    def render_prometheus(self) -> str:
+        """Renders all series as a Prometheus text-format histogram."""
+        bounds_ns = [int(bound * 1_000_000_000) for bound in EXPORT_BOUNDS]
+        lines = [
+            "# HELP http_request_duration_seconds HTTP request latency by method, route and status.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        # Copied first: requests keep adding series while this runs in a worker thread
+        for (method, route, status), histogram in sorted(list(self.histograms.items())):
+            labels = f'method="{method}",route="{escape_label(route)}",status="{status}"'
+            for bound, cumulative in zip(EXPORT_BOUNDS, histogram.cumulative_counts(bounds_ns)):
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {histogram.total_ns / 1e9:.9f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware that times every HTTP request.
+
+    The duration (perf_counter_ns, from receiving the request to sending
+    the last body chunk, so streamed responses are timed in full) goes into
+    one histogram per (method, route template, status). Time to the
+    response headers is reported back in a `Server-Timing` header. Unlike
+    BaseHTTPMiddleware it does not wrap the response body in a stream or
+    spawn a task, so streaming responses pass straight through.
+    """
+
+    def __init__(self, app, metrics: Optional[RequestMetrics] = None):
+        self.app = app
+        self.histograms = (metrics if metrics is not None else request_metrics).histograms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter_ns()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed_ms = (perf_counter_ns() - start) / 1_000_000
+                message["headers"] = [*message.get("headers", ()), (b"server-timing", b"app;dur=%.3f" % elapsed_ms)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            route = scope.get("route")
+            key = (scope["method"], route.path if route is not None else UNMATCHED_ROUTE, status)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram()
+            histogram.record(perf_counter_ns() - start)
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+request_metrics = RequestMetrics()
+
@@ -1,6 +1,7 @@
 from typing import Optional, Dict, Any, List
 from sqlmodel import Field, SQLModel, Relationship
-from datetime import datetime
+from sqlalchemy import Index, UniqueConstraint
+from datetime import date, datetime
 
 # Existing Models
 class User(SQLModel, table=True):
@@ -13,15 +14,37 @@ class User(SQLModel, table=True):
     orders: List["Order"] = Relationship(back_populates="user")
     
 class Product(SQLModel, table=True):
+    # Back the keyset-paginated listing in routers/products.py: (sort column,
+    # id) for the order, then every other column the listing filters on, so
+    # rows are filtered inside the index and the table is read only for the
+    # rows returned
+    __table_args__ = (
+        Index("ix_product_price_listing", "price", "id", "stock", "reserved", "name"),
+        Index("ix_product_name_listing", "name", "id", "stock", "reserved", "price"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    name: str = Field(index=True)
+    name: str  # Indexed by ix_product_name_listing
     description: Optional[str] = None
     price: float
     stock: int
+    # Units held by active cart reservations; available stock is stock - reserved.
+    # Maintained by app/reservations.py and never serialized.
+    reserved: int = Field(default=0, exclude=True)
 
     cart_items: List["CartItem"] = Relationship(back_populates="product")
     order_items: List["OrderItem"] = Relationship(back_populates="product")
 
+class ProductSearchHit(SQLModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    price: float
+    stock: int
+    highlighted_name: str
+    snippet: Optional[str] = None
+    score: float
+
 class UserCreate(SQLModel):
     username: str
     password: str
@@ -32,7 +55,7 @@ class Token(SQLModel):
 
 class Cart(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: Optional[int] = Field(default=None, foreign_key="user.id")
+    user_id: Optional[int] = Field(default=None, foreign_key="user.id", index=True)
     is_active: bool = True
 
     user: Optional[User] = Relationship(back_populates="cart")
@@ -47,6 +70,45 @@ class CartItem(SQLModel, table=True):
     cart: Optional[Cart] = Relationship(back_populates="items")
     product: Optional[Product] = Relationship(back_populates="cart_items")
 
+class Reservation(SQLModel, table=True):
+    """A time-limited hold on stock for one product in one cart."""
+    __table_args__ = (UniqueConstraint("cart_id", "product_id"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    cart_id: int = Field(foreign_key="cart.id")
+    product_id: int = Field(foreign_key="product.id", index=True)
+    quantity: int = Field(gt=0)
+    expires_at: datetime = Field(index=True)
+
+class IdempotencyRecord(SQLModel, table=True):
+    """The stored outcome of a request sent with an Idempotency-Key."""
+    __table_args__ = (UniqueConstraint("scope", "key"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    scope: str
+    key: str
+    fingerprint: str
+    # Both None while the first request is still running
+    status_code: Optional[int] = None
+    response_body: Optional[str] = None
+    locked_until: Optional[datetime] = None
+    expires_at: datetime = Field(index=True)
+
+class ProductAvailability(SQLModel):
+    product_id: int
+    stock: int
+    reserved: int
+    available: int
+
+class RelatedProduct(SQLModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    price: float
+    stock: int
+    # Orders that contained both this product and the one asked about
+    co_purchases: int
+
 class CartItemCreate(SQLModel):
     product_id: int
     quantity: int
@@ -54,8 +116,30 @@ class CartItemCreate(SQLModel):
 class CartUpdate(SQLModel):
     items: List[CartItemCreate]
 
+class CartLineSummary(SQLModel):
+    item_id: int
+    product_id: int
+    product_name: str
+    unit_price: float
+    quantity: int
+    line_total: float
+    stock: int
+    in_stock: bool
+
+class CartSummary(SQLModel):
+    items: List[CartLineSummary]
+    item_count: int
+    cart_total: float
+    all_in_stock: bool
+
 # New Models for Orders
 class Order(SQLModel, table=True):
+    # (created_at, id) keysets for order history; user_id leads for customers' own orders
+    __table_args__ = (
+        Index("ix_order_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_order_created_at_id", "created_at", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     total_price: float
@@ -66,10 +150,60 @@ class Order(SQLModel, table=True):
 
 class OrderItem(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    order_id: int = Field(foreign_key="order.id")
+    order_id: int = Field(foreign_key="order.id", index=True)
     product_id: int = Field(foreign_key="product.id")
     quantity: int
     price: float
 
     order: Optional["Order"] = Relationship(back_populates="items")
-    product: Optional["Product"] = Relationship(back_populates="order_items")
\ No newline at end of file
+    product: Optional["Product"] = Relationship(back_populates="order_items")
+
+class DailySales(SQLModel, table=True):
+    """Orders, units and revenue per UTC day, kept current by checkout (see app/rollups.py)."""
+    day: date = Field(primary_key=True)
+    orders: int = 0
+    units: int = 0
+    revenue: float = 0
+
+class DailyProductSales(SQLModel, table=True):
+    """Units and revenue per product per UTC day, kept current by checkout."""
+    day: date = Field(primary_key=True)
+    product_id: int = Field(primary_key=True, foreign_key="product.id")
+    units: int = 0
+    revenue: float = 0
+
+class CoPurchase(SQLModel, table=True):
+    """How many orders contained both products; stored in both directions (see app/recommendations.py)."""
+    product_id: int = Field(primary_key=True, foreign_key="product.id")
+    related_id: int = Field(primary_key=True, foreign_key="product.id")
+    orders: int = 0
+
+class OrderItemRead(SQLModel):
+    product_id: int
+    quantity: int
+    price: float
+
+class OrderRead(SQLModel):
+    id: int
+    user_id: int
+    total_price: float
+    created_at: datetime
+    items: List[OrderItemRead]
+
+class SalesReportRow(SQLModel):
+    # First day of the period for day/week/month grouping; product fields for group_by=product
+    period: Optional[date] = None
+    product_id: Optional[int] = None
+    product_name: Optional[str] = None
+    orders: Optional[int] = None
+    units: int
+    revenue: float
+
+class SalesReport(SQLModel):
+    date_from: date
+    date_to: date
+    group_by: str
+    orders: int
+    units: int
+    revenue: float
+    rows: List[SalesReportRow]
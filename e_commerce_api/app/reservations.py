@@ -0,0 +1,217 @@
+import asyncio
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from colorama import Fore, Style
+from sqlalchemy import bindparam, event, insert
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, delete, select, update
+
+from app.catalog_cache import catalog_cache
+from app.database import engine
+from app.models import Product, Reservation
+
+# How long an untouched cart keeps its stock; any change to the line renews it
+RESERVATION_TTL = timedelta(seconds=int(os.getenv("RESERVATION_TTL_SECONDS", "900")))
+# How often the background sweeper releases expired holds
+SWEEP_INTERVAL = float(os.getenv("RESERVATION_SWEEP_INTERVAL_SECONDS", "30"))
+# Expired holds released per sweeper transaction
+SWEEP_BATCH_SIZE = 500
+
+# Core statement so it can run as an executemany over (product, delta) pairs
+adjust_reserved = (
+    update(Product.__table__)
+    .where(Product.__table__.c.id == bindparam("product_id"))
+    .values(reserved=Product.__table__.c.reserved + bindparam("delta"))
+)
+
+
+def mark_availability_changed(session: Session, before: Dict[int, int], deltas: Dict[int, int]) -> None:
+    """
+    Flags the transaction if a hold change takes a product's available units
+    (stock - reserved) to zero or back above it, which changes in-stock
+    catalog listings; the catalog cache is bumped once it commits.
+    """
+    if any((before[product_id] > 0) != (before[product_id] - delta > 0) for product_id, delta in deltas.items()):
+        session.info["availability_changed"] = True
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _bump_catalog_on_availability_change(session) -> None:
+    if session.info.pop("availability_changed", False):
+        catalog_cache.bump()
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _forget_availability_change(session) -> None:
+    session.info.pop("availability_changed", None)
+
+
+class StockShortage(Exception):
+    """Raised when a hold asks for more units than the cart can get."""
+
+    def __init__(self, product_id: int, requested: int, available: Optional[int]):
+        super().__init__(f"Product {product_id}: requested {requested}, available {available}")
+        self.product_id = product_id
+        self.requested = requested
+        # None when the product does not exist
+        self.available = available
+
+
+def set_holds(session: Session, cart_id: int, quantities: Dict[int, int], now: Optional[datetime] = None) -> None:
+    """
+    Sets the cart's holds to exactly `quantities` (product id -> units; 0
+    releases the hold) and renews the expiry of every hold in the cart.
+    Raises StockShortage if any product lacks the extra units, in which
+    case the caller must roll back; otherwise the caller commits.
+
+    The first statement is a write, which makes this transaction SQLite's
+    only writer until it ends: stock read afterwards cannot change under
+    it and the sweeper cannot release the cart's holds, so the checks and
+    the batched updates that follow need no per-row conditions.
+    """
+    expires_at = (now or datetime.utcnow()) + RESERVATION_TTL
+    session.exec(update(Reservation).where(Reservation.cart_id == cart_id).values(expires_at=expires_at))
+
+    holds = {
+        hold.product_id: hold
+        for hold in session.exec(
+            select(Reservation).where(Reservation.cart_id == cart_id, Reservation.product_id.in_(quantities))
+        ).all()
+    }
+    held = {product_id: hold.quantity for product_id, hold in holds.items()}
+    deltas = {
+        product_id: quantity - held.get(product_id, 0)
+        for product_id, quantity in quantities.items()
+        if quantity != held.get(product_id, 0)
+    }
+    if not deltas:
+        return
+
+    available = dict(session.exec(
+        select(Product.id, Product.stock - Product.reserved).where(Product.id.in_(deltas))
+    ).all())
+    for product_id, delta in sorted(deltas.items()):
+        if delta <= 0:
+            continue
+        if product_id not in available:
+            raise StockShortage(product_id, quantities[product_id], None)
+        if available[product_id] < delta:
+            raise StockShortage(product_id, quantities[product_id], available[product_id] + held.get(product_id, 0))
+
+    session.connection().execute(
+        adjust_reserved,
+        [{"product_id": product_id, "delta": delta} for product_id, delta in deltas.items() if product_id in available]
+    )
+    mark_availability_changed(
+        session, available, {product_id: delta for product_id, delta in deltas.items() if product_id in available}
+    )
+
+    released = [holds[product_id].id for product_id in deltas if quantities[product_id] == 0 and product_id in holds]
+    changed = [
+        {"id": holds[product_id].id, "quantity": quantities[product_id]}
+        for product_id in deltas if quantities[product_id] > 0 and product_id in holds
+    ]
+    created = [
+        {"cart_id": cart_id, "product_id": product_id, "quantity": quantities[product_id], "expires_at": expires_at}
+        for product_id in deltas if quantities[product_id] > 0 and product_id not in holds
+    ]
+    if released:
+        session.exec(delete(Reservation).where(Reservation.id.in_(released)))
+    if changed:
+        session.exec(update(Reservation), params=changed)
+    if created:
+        session.exec(insert(Reservation), params=created)
+
+
+def set_hold(session: Session, cart_id: int, product_id: int, quantity: int, now: Optional[datetime] = None) -> bool:
+    """
+    Single-product `set_holds`. Returns False if the units are not
+    available, in which case the caller must roll back.
+    """
+    try:
+        set_holds(session, cart_id, {product_id: quantity}, now)
+    except StockShortage:
+        return False
+    return True
+
+
+def take_stock(session: Session, cart_id: int, quantities: Dict[int, int]) -> Optional[int]:
+    """
+    Decrements stock for a checkout, consuming the cart's holds.
+
+    Each product is taken with a conditional UPDATE that counts the cart's
+    own hold as available, so held units can always be bought and unheld
+    ones only if nobody else holds them. Returns the id of the first
+    product that falls short (the caller must roll back), or None. The
+    caller commits.
+    """
+    # Claiming the holds first makes this transaction the SQLite writer, so
+    # the sweeper cannot release them underneath us
+    held = dict(session.exec(
+        delete(Reservation).where(Reservation.cart_id == cart_id).returning(Reservation.product_id, Reservation.quantity)
+    ).all())
+
+    for product_id, quantity in sorted(quantities.items()):
+        held_quantity = held.get(product_id, 0)
+        result = session.exec(
+            update(Product)
+            .where(Product.id == product_id, Product.stock - Product.reserved + held_quantity >= quantity)
+            .values(stock=Product.stock - quantity, reserved=Product.reserved - held_quantity)
+        )
+        if result.rowcount != 1:
+            return product_id
+    return None
+
+
+def release_expired(session: Session, now: Optional[datetime] = None, batch_size: int = SWEEP_BATCH_SIZE) -> int:
+    """
+    Releases up to `batch_size` expired holds in one transaction and returns
+    how many were released. The holds are deleted and returned by a single
+    statement, so a hold renewed concurrently is never released.
+    """
+    now = now or datetime.utcnow()
+    expired = select(Reservation.id).where(Reservation.expires_at < now).limit(batch_size)
+    rows = session.exec(
+        delete(Reservation).where(Reservation.id.in_(expired)).returning(Reservation.product_id, Reservation.quantity)
+    ).all()
+
+    released: Dict[int, int] = defaultdict(int)
+    for product_id, quantity in rows:
+        released[product_id] += quantity
+    if released:
+        available = dict(session.exec(
+            select(Product.id, Product.stock - Product.reserved).where(Product.id.in_(released))
+        ).all())
+        session.connection().execute(
+            adjust_reserved, [{"product_id": pid, "delta": -units} for pid, units in released.items()]
+        )
+        mark_availability_changed(session, available, {pid: -units for pid, units in released.items() if pid in available})
+    session.commit()
+    return len(rows)
+
+
+def sweep_expired() -> int:
+    """Releases every expired hold, batch by batch."""
+    total = 0
+    with Session(engine) as session:
+        while True:
+            released = release_expired(session)
+            total += released
+            if released < SWEEP_BATCH_SIZE:
+                return total
+
+
+async def run_sweeper(interval: float = SWEEP_INTERVAL) -> None:
+    """Background task, started from the app lifespan, that releases expired holds."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            released = await asyncio.to_thread(sweep_expired)
+            if released:
+                print(f"{Fore.CYAN}INFO: Released {released} expired stock reservations.{Style.RESET_ALL}")
+        except Exception as e:
+            print(f"{Fore.RED}ERROR: Reservation sweep failed: {e}{Style.RESET_ALL}")
+
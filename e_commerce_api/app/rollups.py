@@ -0,0 +1,143 @@
+from collections import defaultdict
+from typing import Dict, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, delete
+
+from app.models import DailyProductSales, DailySales, Order
+
+# Orders aggregated per statement when rebuilding
+REBUILD_BATCH_SIZE = 50_000
+
+# Core upserts so a checkout adds its totals in one statement per table
+# (an executemany for the product lines)
+_days = DailySales.__table__
+_insert_day = insert(_days)
+upsert_day = _insert_day.on_conflict_do_update(
+    index_elements=[_days.c.day],
+    set_={
+        "orders": _days.c.orders + _insert_day.excluded.orders,
+        "units": _days.c.units + _insert_day.excluded.units,
+        "revenue": _days.c.revenue + _insert_day.excluded.revenue,
+    }
+)
+
+_product_days = DailyProductSales.__table__
+_insert_product_day = insert(_product_days)
+upsert_product_day = _insert_product_day.on_conflict_do_update(
+    index_elements=[_product_days.c.day, _product_days.c.product_id],
+    set_={
+        "units": _product_days.c.units + _insert_product_day.excluded.units,
+        "revenue": _product_days.c.revenue + _insert_product_day.excluded.revenue,
+    }
+)
+
+# Rebuild statements: aggregate one range of order ids in SQL and add it to
+# the rollups, so no order rows pass through Python
+REBUILD_DAYS_SQL = text("""
+    INSERT INTO dailysales (day, orders, units, revenue)
+    SELECT date(o.created_at), count(DISTINCT o.id), sum(oi.quantity), sum(oi.quantity * oi.price)
+    FROM "order" AS o
+    JOIN orderitem AS oi ON oi.order_id = o.id
+    WHERE o.id > :lo AND o.id <= :hi
+    GROUP BY date(o.created_at)
+    ON CONFLICT (day) DO UPDATE SET
+        orders = orders + excluded.orders,
+        units = units + excluded.units,
+        revenue = revenue + excluded.revenue
+""")
+
+REBUILD_PRODUCT_DAYS_SQL = text("""
+    INSERT INTO dailyproductsales (day, product_id, units, revenue)
+    SELECT date(o.created_at), oi.product_id, sum(oi.quantity), sum(oi.quantity * oi.price)
+    FROM "order" AS o
+    JOIN orderitem AS oi ON oi.order_id = o.id
+    WHERE o.id > :lo AND o.id <= :hi
+    GROUP BY date(o.created_at), oi.product_id
+    ON CONFLICT (day, product_id) DO UPDATE SET
+        units = units + excluded.units,
+        revenue = revenue + excluded.revenue
+""")
+
+
+def record_order(session: Session, order: Order) -> None:
+    """
+    Adds an order to the daily rollups. Called by checkout inside its own
+    transaction, so the rollups commit (or roll back) with the order.
+    """
+    day = order.created_at.date()
+    lines: Dict[int, Tuple[int, float]] = defaultdict(lambda: (0, 0.0))
+    for item in order.items:
+        units, revenue = lines[item.product_id]
+        lines[item.product_id] = (units + item.quantity, revenue + item.quantity * item.price)
+
+    connection = session.connection()
+    connection.execute(upsert_day, {
+        "day": day,
+        "orders": 1,
+        "units": sum(units for units, _ in lines.values()),
+        "revenue": sum(revenue for _, revenue in lines.values()),
+    })
+    connection.execute(upsert_product_day, [
+        {"day": day, "product_id": product_id, "units": units, "revenue": revenue}
+        for product_id, (units, revenue) in lines.items()
+    ])
+
+
+def rebuild_rollups(engine: Engine, batch_size: int = REBUILD_BATCH_SIZE) -> int:
+    """
+    Recomputes the rollups from Order/OrderItem and returns the number of
+    orders covered.
+
+    The rollups are cleared and the newest order id read in one
+    transaction; the DELETE makes it SQLite's writer, so no checkout can
+    commit in between. Orders up to that id are then added back in id-range
+    batches, each its own short transaction, while checkouts keep adding
+    newer orders through `record_order`. Both paths only add, so every
+    order is counted exactly once and checkouts are never blocked for long.
+    Reports read low totals until the rebuild finishes.
+    """
+    with engine.begin() as conn:
+        conn.execute(delete(DailySales))
+        conn.execute(delete(DailyProductSales))
+        last_id = conn.execute(select(func.max(Order.id))).scalar() or 0
+
+    lo = 0
+    while lo < last_id:
+        hi = min(lo + batch_size, last_id)
+        with engine.begin() as conn:
+            conn.execute(REBUILD_DAYS_SQL, {"lo": lo, "hi": hi})
+            conn.execute(REBUILD_PRODUCT_DAYS_SQL, {"lo": lo, "hi": hi})
+        lo = hi
+    return last_id
+
+
+def backfill_rollups(engine: Engine) -> None:
+    """Fills the rollups on first start against a database that already has orders."""
+    with Session(engine) as session:
+        has_orders = session.exec(select(Order.id).limit(1)).first() is not None
+        has_rollups = session.exec(select(DailySales.day).limit(1)).first() is not None
+    if has_orders and not has_rollups:
+        rebuild_rollups(engine)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from sqlmodel import SQLModel
+
+    from app.database import engine
+
+    parser = argparse.ArgumentParser(description="Rebuild the sales rollups.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = subparsers.add_parser("rebuild", help="Recompute the rollups of the application database")
+    rebuild_parser.add_argument("--batch-size", type=int, default=REBUILD_BATCH_SIZE)
+    args = parser.parse_args()
+
+    SQLModel.metadata.create_all(engine)
+    started = time.perf_counter()
+    orders = rebuild_rollups(engine, args.batch_size)
+    print(f"Rebuilt rollups for {orders} orders in {time.perf_counter() - started:.1f}s")
@@ -1,57 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from collections import defaultdict
 from sqlmodel import Session, select
-from typing import List
+from typing import Dict, List, Optional
 
+from app.cart_store import CheckoutConflict, cart_store
+from app.catalog_cache import catalog_cache
 from app.database import get_session
-from app.models import User, Product, Cart, CartItem, CartItemCreate, CartUpdate, Order, OrderItem
+from app.idempotency import idempotency_store, request_fingerprint
+from app.recommendations import record_co_purchases, related_index
+from app.rollups import record_order
+from app.reservations import StockShortage, take_stock
+from app.models import User, Product, CartItem, CartItemCreate, CartUpdate, Order, OrderItem, CartSummary
 from app.security import get_current_user
+from app.stock_stream import stock_broadcaster
 
 router = APIRouter(prefix="/cart", tags=["cart"])
 
-def get_or_create_cart(user_id: int, session: Session) -> Cart:
-    """Helper function to get or create an active cart for a user."""
-    cart = session.exec(
-        select(Cart).where(Cart.user_id == user_id, Cart.is_active == True)
-    ).first()
-    if not cart:
-        cart = Cart(user_id=user_id)
-        session.add(cart)
-        session.commit()
-        session.refresh(cart)
-    return cart
-
 @router.post("/add-item", status_code=status.HTTP_201_CREATED)
 def add_item_to_cart(
     item_in: CartItemCreate, 
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_session),
+    idempotency_key: Optional[str] = Header(None, max_length=255)
 ):
-    """Adds a product to the user's shopping cart."""
+    """
+    Adds a product to the user's shopping cart, holding the stock for it
+    until the reservation expires. A retry with the same `Idempotency-Key`
+    returns the first response instead of adding the item again.
+    """
+    return idempotency_store.run(
+        idempotency_key, f"cart.add-item:{current_user.id}", request_fingerprint(item_in),
+        status.HTTP_201_CREATED, lambda: add_item(session, current_user, item_in)
+    )
+
+def add_item(session: Session, current_user: User, item_in: CartItemCreate) -> dict:
     product = session.get(Product, item_in.product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    if product.stock < item_in.quantity:
-        raise HTTPException(status_code=400, detail="Not enough stock available.")
-
-    cart = get_or_create_cart(current_user.id, session)
 
-    existing_item = session.exec(
-        select(CartItem).where(
-            CartItem.cart_id == cart.id, CartItem.product_id == item_in.product_id
-        )
-    ).first()
-
-    if existing_item:
-        existing_item.quantity += item_in.quantity
-        session.add(existing_item)
-    else:
-        new_item = CartItem(
-            cart_id=cart.id, product_id=item_in.product_id, quantity=item_in.quantity
-        )
-        session.add(new_item)
-
-    session.commit()
-    session.refresh(cart)
+    quantity = item_in.quantity + cart_store.quantities(session, current_user.id).get(item_in.product_id, 0)
+    try:
+        cart_store.set_quantities(session, current_user.id, {item_in.product_id: quantity})
+    except StockShortage:
+        raise HTTPException(status_code=400, detail="Not enough stock available.")
     return {"message": "Item added to cart successfully."}
 
 @router.get("/", response_model=List[CartItem])
@@ -60,13 +51,75 @@ def get_cart_items(
     session: Session = Depends(get_session)
 ):
     """Retrieves the current user's active shopping cart items."""
-    cart = session.exec(
-        select(Cart).where(Cart.user_id == current_user.id, Cart.is_active == True)
-    ).first()
-    if not cart:
-        return []
+    return cart_store.items(session, current_user.id)
+
+def apply_cart_quantities(session: Session, user_id: int, quantities: Dict[int, int]) -> None:
+    """
+    Sets the cart's lines to `quantities` (product id -> units; 0 removes
+    the line) through the cart store, as one change.
+    """
+    try:
+        cart_store.set_quantities(session, user_id, quantities)
+    except StockShortage as e:
+        if e.available is None:
+            raise HTTPException(status_code=404, detail=f"Product {e.product_id} not found")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Not enough stock for product {e.product_id}. Available: {e.available}, Requested: {e.requested}"
+        )
+
+@router.get("/summary", response_model=CartSummary)
+def get_cart_summary(
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """Retrieves the current user's cart with product details and totals."""
+    return cart_store.summary(session, current_user.id)
+
+@router.put("/", response_model=CartSummary)
+def replace_cart(
+    cart_in: CartUpdate,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """
+    Replaces the whole cart with the given items (an empty list clears it).
+    Repeated products are summed.
+    """
+    quantities: Dict[int, int] = defaultdict(int)
+    for item in cart_in.items:
+        if item.quantity <= 0:
+            raise HTTPException(status_code=400, detail="Quantity must be greater than zero.")
+        quantities[item.product_id] += item.quantity
+
+    for product_id in cart_store.quantities(session, current_user.id):
+        quantities.setdefault(product_id, 0)
 
-    return cart.items
+    apply_cart_quantities(session, current_user.id, quantities)
+    return cart_store.summary(session, current_user.id)
+
+@router.patch("/", response_model=CartSummary)
+def patch_cart(
+    cart_in: CartUpdate,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """
+    Applies quantity deltas to the cart: positive adds units, negative
+    removes them, and a line that reaches zero or below is removed.
+    """
+    deltas: Dict[int, int] = defaultdict(int)
+    for item in cart_in.items:
+        deltas[item.product_id] += item.quantity
+
+    current = cart_store.quantities(session, current_user.id)
+    quantities = {
+        product_id: max(current.get(product_id, 0) + delta, 0)
+        for product_id, delta in deltas.items()
+    }
+
+    apply_cart_quantities(session, current_user.id, quantities)
+    return cart_store.summary(session, current_user.id)
 
 @router.delete("/remove-item/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
 def remove_item_from_cart(
@@ -75,16 +128,11 @@ def remove_item_from_cart(
     session: Session = Depends(get_session)
 ):
     """Removes a specific item from the user's shopping cart."""
-    cart = get_or_create_cart(current_user.id, session)
-    cart_item = session.exec(
-        select(CartItem).where(CartItem.id == item_id, CartItem.cart_id == cart.id)
-    ).first()
-
+    cart_item = cart_store.item(session, current_user.id, item_id)
     if not cart_item:
         raise HTTPException(status_code=404, detail="Item not found in cart.")
 
-    session.delete(cart_item)
-    session.commit()
+    cart_store.set_quantities(session, current_user.id, {cart_item.product_id: 0})
     return None
 
 @router.put("/update-item/{item_id}")
@@ -98,98 +146,95 @@ def update_item_in_cart(
     if quantity <= 0:
         raise HTTPException(status_code=400, detail="Quantity must be greater than zero.")
     
-    cart = get_or_create_cart(current_user.id, session)
-    cart_item = session.exec(
-        select(CartItem).where(CartItem.id == item_id, CartItem.cart_id == cart.id)
-    ).first()
-
+    cart_item = cart_store.item(session, current_user.id, item_id)
     if not cart_item:
         raise HTTPException(status_code=404, detail="Item not found in cart.")
 
-    product = session.get(Product, cart_item.product_id)
-    if product.stock < quantity:
+    try:
+        cart_store.set_quantities(session, current_user.id, {cart_item.product_id: quantity})
+    except StockShortage:
         raise HTTPException(status_code=400, detail="Not enough stock available for this quantity.")
-        
-    cart_item.quantity = quantity
-    session.add(cart_item)
-    session.commit()
-    session.refresh(cart_item)
-    return cart_item
+    return cart_store.item(session, current_user.id, item_id)
 
 @router.post("/checkout", status_code=status.HTTP_201_CREATED)
 def checkout(
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_session),
+    idempotency_key: Optional[str] = Header(None, max_length=255)
 ):
     """
     Processes the checkout for the current user's active cart.
     This creates an order, updates product stock, and clears the cart.
+
+    With an `Idempotency-Key`, a retried checkout (say after a timeout)
+    gets the original order back instead of a "cart is empty" error, and a
+    retry sent while the first is still running waits for its result.
     """
-    cart = session.exec(
-        select(Cart).where(Cart.user_id == current_user.id, Cart.is_active == True)
-    ).first()
+    return idempotency_store.run(
+        idempotency_key, f"cart.checkout:{current_user.id}", request_fingerprint(),
+        status.HTTP_201_CREATED, lambda: process_checkout(session, current_user)
+    )
 
-    if not cart or not cart.items:
+def process_checkout(session: Session, current_user: User) -> dict:
+    """
+    Everything happens in one transaction: products are loaded in a single
+    query and stock is taken with conditional UPDATEs that consume the
+    cart's reservations (see `take_stock`), so two concurrent checkouts can
+    never both claim the last units. Any shortfall rolls the whole order back,
+    as does losing the cart to a concurrent checkout of it (409).
+    """
+    cart_items = sorted(cart_store.items(session, current_user.id), key=lambda item: item.product_id)
+    if not cart_items:
         raise HTTPException(status_code=400, detail="Your cart is empty.")
 
-    # Validate stock for all items in the cart
-    cart_items = session.exec(
-        select(CartItem).where(CartItem.cart_id == cart.id)
-    ).all()
+    product_ids = [item.product_id for item in cart_items]
+    products = {
+        product.id: product
+        for product in session.exec(select(Product).where(Product.id.in_(product_ids))).all()
+    }
 
     total_price = 0
     order_items = []
-    
     for item in cart_items:
-        product = session.get(Product, item.product_id)
-        if product.stock < item.quantity:
+        product = products.get(item.product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail=f"Product {item.product_id} no longer exists.")
+        total_price += product.price * item.quantity
+        order_items.append(OrderItem(product_id=product.id, quantity=item.quantity, price=product.price))
+
+    try:
+        quantities = {item.product_id: item.quantity for item in cart_items}
+        short_product_id = take_stock(session, cart_items[0].cart_id, quantities)
+        if short_product_id is not None:
+            session.rollback()
+            product = products[short_product_id]
+            available = session.exec(
+                select(Product.stock - Product.reserved).where(Product.id == product.id)
+            ).first()
             raise HTTPException(
                 status_code=400,
-                detail=f"Not enough stock for {product.name}. Available: {product.stock}, Requested: {item.quantity}"
+                detail=f"Not enough stock for {product.name}. Available: {available}, Requested: {quantities[product.id]}"
             )
-        
-        # Calculate price for this item and add to total
-        total_price += product.price * item.quantity
-        
-        # Create a new order item for the final record
-        order_item = OrderItem(
-            product_id=product.id,
-            quantity=item.quantity,
-            price=product.price
-        )
-        order_items.append(order_item)
 
-    # All checks passed, proceed with the transaction
-    try:
-        # Create a new order
-        order = Order(user_id=current_user.id, total_price=total_price)
+        order = Order(user_id=current_user.id, total_price=total_price, items=order_items)
         session.add(order)
+        record_order(session, order)
+        co_purchases = record_co_purchases(session, quantities)
+        cart_store.clear(session, current_user.id, cart_items[0].cart_id)
         session.commit()
-        session.refresh(order)
-
-        # Add all order items to the session and link to the new order
-        for item in order_items:
-            item.order_id = order.id
-            session.add(item)
-            
-        session.commit()
-        session.refresh(order)
-
-        # Update product stock and clear the cart
-        for item in cart_items:
-            product = session.get(Product, item.product_id)
-            product.stock -= item.quantity
-            session.add(product)
-            session.delete(item)
-            
-        session.delete(cart)
-        session.commit()
-
-        return {"message": "Checkout successful!", "order_id": order.id, "total_price": total_price}
-
+        related_index.merge(co_purchases)
+        catalog_cache.bump()
+    except HTTPException:
+        raise
+    except CheckoutConflict:
+        session.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="This cart was already checked out by another request.")
     except Exception as e:
         session.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An error occurred during checkout: {e}"
-        )
\ No newline at end of file
+        )
+
+    stock_broadcaster.publish_products(session, quantities)
+    return {"message": "Checkout successful!", "order_id": order.id, "total_price": total_price}
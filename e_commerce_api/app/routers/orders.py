@@ -0,0 +1,139 @@
+import base64
+import binascii
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from typing import Iterator, List, Literal, Optional, Tuple
+from sqlalchemy import literal, tuple_
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+
+from app.database import engine, get_session
+from app.models import Order, OrderRead, User
+from app.security import get_current_admin_user, get_current_user
+
+router = APIRouter(prefix="/orders", tags=["orders"])
+admin_router = APIRouter(prefix="/admin/orders", tags=["orders"])
+
+# Rows fetched per round trip by the export's server-side cursor
+EXPORT_BATCH_SIZE = 500
+
+CSV_COLUMNS = ["order_id", "user_id", "created_at", "total_price", "product_id", "quantity", "price"]
+
+def encode_cursor(order: Order) -> str:
+    payload = json.dumps([order.created_at.isoformat(), order.id]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(last_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor.")
+
+def order_page(session: Session, response: Response, user_id: Optional[int], limit: int, after: Optional[str]) -> List[Order]:
+    """
+    Returns one page of orders, newest first, keyset-paginated on
+    (created_at, id) with every order's items loaded in one batched query.
+    Sets `X-Next-Cursor` when there may be another page.
+    """
+    query = select(Order).options(selectinload(Order.items))
+    if user_id is not None:
+        query = query.where(Order.user_id == user_id)
+    if after:
+        created_at, last_id = decode_cursor(after)
+        query = query.where(
+            tuple_(Order.created_at, Order.id) < tuple_(literal(created_at, Order.created_at.type), last_id)
+        )
+    orders = session.exec(query.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit)).all()
+
+    if len(orders) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(orders[-1])
+    return orders
+
+def as_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Order times are stored as naive UTC; aware query bounds are converted to match."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def stream_orders(fmt: str, user_id: Optional[int], since: Optional[datetime], until: Optional[datetime]) -> Iterator[bytes]:
+    """
+    Yields orders oldest first as NDJSON (one order with its items per
+    line) or CSV (one row per order item), batch by batch.
+
+    Rows come from a server-side cursor (yield_per) and each batch is
+    dropped once serialized, so memory stays flat however many orders are
+    exported. The generator owns its session because it outlives the
+    request dependency.
+    """
+    query = select(Order).options(selectinload(Order.items)).order_by(Order.created_at, Order.id)
+    if user_id is not None:
+        query = query.where(Order.user_id == user_id)
+    if since is not None:
+        query = query.where(Order.created_at >= since)
+    if until is not None:
+        query = query.where(Order.created_at < until)
+
+    with Session(engine) as session:
+        result = session.exec(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        if fmt == "csv":
+            yield (",".join(CSV_COLUMNS) + "\r\n").encode()
+        for batch in result.partitions():
+            if fmt == "ndjson":
+                yield "".join(OrderRead.model_validate(order).model_dump_json() + "\n" for order in batch).encode()
+            else:
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for order in batch:
+                    for item in order.items:
+                        writer.writerow([
+                            order.id, order.user_id, order.created_at.isoformat(), order.total_price,
+                            item.product_id, item.quantity, item.price
+                        ])
+                yield buffer.getvalue().encode()
+
+@router.get("/", response_model=List[OrderRead])
+def get_my_orders(
+    *,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page")
+):
+    """Retrieves the current user's order history, newest first."""
+    return order_page(session, response, current_user.id, limit, after)
+
+@admin_router.get("/", response_model=List[OrderRead])
+def get_all_orders(
+    *,
+    session: Session = Depends(get_session),
+    admin_user: User = Depends(get_current_admin_user),
+    response: Response,
+    user_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page")
+):
+    """Retrieves all orders, optionally for one user, newest first (Admin only)."""
+    return order_page(session, response, user_id, limit, after)
+
+@admin_router.get("/export", summary="Stream orders as NDJSON or CSV (Admin only)")
+def export_orders(
+    admin_user: User = Depends(get_current_admin_user),
+    format: Literal["ndjson", "csv"] = "ndjson",
+    user_id: Optional[int] = None,
+    since: Optional[datetime] = Query(None, description="Only orders created at or after this time (UTC)"),
+    until: Optional[datetime] = Query(None, description="Only orders created before this time (UTC)")
+):
+    """Streams every matching order, oldest first, without loading them all into memory."""
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"orders.{'csv' if format == 'csv' else 'ndjson'}"
+    return StreamingResponse(
+        stream_orders(format, user_id, as_utc_naive(since), as_utc_naive(until)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
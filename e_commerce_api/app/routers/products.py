@@ -1,13 +1,128 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+import base64
+import binascii
+import json
+import math
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from typing import Any, Callable, Dict, Hashable, List, Literal, Optional, Tuple
+from pydantic import TypeAdapter
+from sqlalchemy import tuple_
 from sqlmodel import Session, select
 
+from app.catalog_cache import catalog_cache, etag_matches
 from app.database import get_session
-from app.models import Product, User
+from app.models import Product, ProductAvailability, ProductSearchHit, RelatedProduct, User
+from app.recommendations import RELATED_K, related_index, top_related
+from app.search import MAX_OFFSET, search_products
 from app.security import get_current_admin_user
+from app.stock_stream import stock_broadcaster
 
 router = APIRouter(prefix="/products", tags=["products"])
 
+product_list_adapter = TypeAdapter(List[Product])
+search_hits_adapter = TypeAdapter(List[ProductSearchHit])
+related_products_adapter = TypeAdapter(List[RelatedProduct])
+
+# Columns the listing can be sorted by; each has a (column, id) index
+SORT_COLUMNS = {"id": Product.id, "price": Product.price, "name": Product.name}
+# What each sort column's cursor value may decode to; a price written as 10 reads back as an int
+CURSOR_VALUE_TYPES = {"id": (int,), "price": (int, float), "name": (str,)}
+
+def encode_cursor(product: Product, sort: str) -> str:
+    payload = json.dumps([getattr(product, sort), product.id]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+def is_cursor_scalar(value: Any, types: Tuple[type, ...]) -> bool:
+    # bool is an int to isinstance, and JSON also decodes NaN and Infinity
+    if isinstance(value, bool) or not isinstance(value, types):
+        return False
+    return not isinstance(value, float) or math.isfinite(value)
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, int]:
+    """
+    Reads a cursor made by `encode_cursor` for the same sort. Anything but a
+    [value, id] pair whose value has the sort column's type is a 400, so a
+    tampered cursor never reaches the row-value comparison.
+    """
+    try:
+        value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError, TypeError):
+        value = last_id = None
+    if not is_cursor_scalar(value, CURSOR_VALUE_TYPES[sort]) or not is_cursor_scalar(last_id, (int,)):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor.")
+    return value, last_id
+
+def product_listing_query(
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock_only: bool = False,
+    name_prefix: Optional[str] = None,
+    sort: str = "id",
+    descending: bool = False,
+    after: Optional[Tuple[Any, int]] = None,
+    limit: int = 100
+):
+    """
+    Builds the filtered, keyset-paginated listing query.
+
+    Filters are written as plain ranges (the name prefix as
+    `name >= p AND name < p || U+10FFFF` instead of LIKE) so SQLite can
+    drive them from ix_product_price_listing / ix_product_name_listing, and
+    the keyset condition is a (sort column, id) row-value comparison
+    matching those indexes. Both indexes carry every filtered column, so
+    only rows on the page are read from the table. A range on one column
+    with a sort on another sorts that range's matches.
+    """
+    column = SORT_COLUMNS[sort]
+    query = select(Product)
+
+    if min_price is not None:
+        query = query.where(Product.price >= min_price)
+    if max_price is not None:
+        query = query.where(Product.price <= max_price)
+    if in_stock_only:
+        # Units held in carts cannot be bought
+        query = query.where(Product.stock > Product.reserved)
+    if name_prefix:
+        query = query.where(Product.name >= name_prefix, Product.name < name_prefix + "\U0010ffff")
+
+    if after is not None:
+        value, last_id = after
+        if sort == "id":
+            query = query.where(Product.id < last_id if descending else Product.id > last_id)
+        elif descending:
+            query = query.where(tuple_(column, Product.id) < tuple_(value, last_id))
+        else:
+            query = query.where(tuple_(column, Product.id) > tuple_(value, last_id))
+
+    if sort == "id":
+        order_by = [Product.id.desc() if descending else Product.id]
+    else:
+        order_by = [column.desc(), Product.id.desc()] if descending else [column, Product.id]
+    return query.order_by(*order_by).limit(limit)
+
+def cached_catalog_response(
+    request: Request,
+    key: Hashable,
+    load: Callable[[], Tuple[bytes, Dict[str, str]]]
+) -> Response:
+    """
+    Serves a catalog read from the version-tagged cache, calling `load` to
+    query and serialize on a miss. `load` returns the body and any extra
+    headers to cache with it. A matching If-None-Match gets a 304.
+    """
+    entry = catalog_cache.get(key)
+    if entry is None:
+        version = catalog_cache.version
+        body, extra_headers = load()
+        entry = catalog_cache.put(key, version, body, extra_headers)
+
+    headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        catalog_cache.record_not_modified()
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
 @router.post("/", response_model=Product, status_code=status.HTTP_201_CREATED)
 def create_product(
     product: Product, 
@@ -15,24 +130,138 @@ def create_product(
     admin_user: User = Depends(get_current_admin_user) # Protect this endpoint
 ):
     """Creates a new product (Admin only)."""
+    product.reserved = 0
     session.add(product)
     session.commit()
+    catalog_cache.bump()
     session.refresh(product)
     return product
 
 @router.get("/", response_model=List[Product])
-def get_products(session: Session = Depends(get_session)):
-    """Retrieves all products (Public access)."""
-    products = session.exec(select(Product)).all()
-    return products
+def get_products(
+    request: Request,
+    session: Session = Depends(get_session),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    in_stock_only: bool = Query(False, description="Only products with unreserved stock"),
+    name_prefix: Optional[str] = Query(None, min_length=1, description="Case-sensitive name prefix"),
+    sort: Literal["id", "price", "name"] = "id",
+    descending: bool = False,
+    limit: int = Query(100, ge=1, le=500),
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page")
+):
+    """
+    Retrieves products, filtered, sorted and keyset-paginated (Public access).
+    The next page's cursor is returned in the `X-Next-Cursor` header.
+    """
+    def load() -> Tuple[bytes, Dict[str, str]]:
+        cursor = decode_cursor(after, sort) if after else None
+        query = product_listing_query(
+            min_price, max_price, in_stock_only, name_prefix, sort, descending, cursor, limit
+        )
+        products = session.exec(query).all()
+        headers = {}
+        if len(products) == limit:
+            headers["X-Next-Cursor"] = encode_cursor(products[-1], sort)
+        return product_list_adapter.dump_json(products), headers
+
+    key = ("list", min_price, max_price, in_stock_only, name_prefix, sort, descending, limit, after)
+    return cached_catalog_response(request, key, load)
+
+@router.get("/search", response_model=List[ProductSearchHit])
+def search_catalog(
+    request: Request,
+    session: Session = Depends(get_session),
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=MAX_OFFSET),
+    prefix: bool = Query(True, description="Treat the last word as a prefix (search-as-you-type)")
+):
+    """
+    Full-text search over product names and descriptions (Public access).
+    Matches are highlighted with <mark> tags in `highlighted_name` and `snippet`.
+    """
+    def load() -> Tuple[bytes, Dict[str, str]]:
+        hits = search_products(session, q, limit, offset, prefix)
+        return search_hits_adapter.dump_json(hits), {}
+
+    return cached_catalog_response(request, ("search", q, limit, offset, prefix), load)
+
+@router.get("/cache/stats", summary="Catalog cache metrics (Admin only)")
+def get_catalog_cache_stats(admin_user: User = Depends(get_current_admin_user)):
+    """Returns hit ratio, 304 and invalidation counters of the catalog cache."""
+    return catalog_cache.stats()
+
+@router.get("/stream", summary="Live stock and price changes (Server-Sent Events)")
+async def stream_stock_changes(last_event_id: Optional[str] = Header(None, max_length=64)):
+    """
+    Streams stock and price changes as Server-Sent Events (Public access).
+
+    Each `stock` event carries a JSON list of changed products, e.g.
+    `[{"id": 3, "stock": 7}, {"id": 9, "deleted": true}]`, with changes made
+    within one tick coalesced. Reconnecting with Last-Event-ID resumes where
+    the client left off; a `reset` event means it missed too much and
+    should reload the catalog.
+    """
+    return StreamingResponse(
+        stock_broadcaster.stream(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/{product_id}", response_model=Product)
-def get_product(product_id: int, session: Session = Depends(get_session)):
+def get_product(product_id: int, request: Request, session: Session = Depends(get_session)):
     """Retrieves a single product by its ID (Public access)."""
+    def load() -> Tuple[bytes, Dict[str, str]]:
+        product = session.get(Product, product_id)
+        if not product:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+        return product.model_dump_json().encode(), {}
+
+    return cached_catalog_response(request, ("product", product_id), load)
+
+@router.get("/{product_id}/availability", response_model=ProductAvailability)
+def get_product_availability(product_id: int, session: Session = Depends(get_session)):
+    """
+    Retrieves live stock for a product (Public access): units on hand,
+    units held in carts and what is left to add to a cart. Not cached.
+    """
     product = session.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
-    return product
+    return ProductAvailability(
+        product_id=product.id,
+        stock=product.stock,
+        reserved=product.reserved,
+        available=max(product.stock - product.reserved, 0)
+    )
+
+@router.get("/{product_id}/related", response_model=List[RelatedProduct])
+def get_related_products(
+    product_id: int,
+    request: Request,
+    session: Session = Depends(get_session),
+    limit: int = Query(10, ge=1, le=RELATED_K)
+):
+    """
+    Products most often bought in the same order as this one, most
+    co-purchases first (Public access). Served from the in-memory
+    co-purchase index; see app/recommendations.py.
+    """
+    def load() -> Tuple[bytes, Dict[str, str]]:
+        pairs = related_index.top(product_id) if related_index.loaded else top_related(session, product_id)
+        ids = [product_id] + [related_id for related_id, _ in pairs]
+        products = {product.id: product for product in session.exec(select(Product).where(Product.id.in_(ids))).all()}
+        if product_id not in products:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+        # Pairs can outlive a deleted product; skip those
+        related = [
+            RelatedProduct.model_validate(products[related_id], update={"co_purchases": orders})
+            for related_id, orders in pairs if related_id in products
+        ][:limit]
+        return related_products_adapter.dump_json(related), {}
+
+    return cached_catalog_response(request, ("related", product_id, limit), load)
 
 @router.put("/{product_id}", response_model=Product)
 def update_product(
@@ -45,7 +274,11 @@ def update_product(
     product = session.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
-    
+
+    changes = {
+        field: getattr(product_data, field)
+        for field in ("stock", "price") if getattr(product_data, field) != getattr(product, field)
+    }
     product.name = product_data.name
     product.description = product_data.description
     product.price = product_data.price
@@ -53,6 +286,9 @@ def update_product(
     
     session.add(product)
     session.commit()
+    catalog_cache.bump()
+    if changes:
+        stock_broadcaster.publish({product_id: changes})
     session.refresh(product)
     return product
 
@@ -69,4 +305,6 @@ def delete_product(
     
     session.delete(product)
     session.commit()
+    catalog_cache.bump()
+    stock_broadcaster.publish({product_id: {"deleted": True}})
     return None
\ No newline at end of file
@@ -0,0 +1,94 @@
+from datetime import date, datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import Literal, Optional
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.database import get_session
+from app.models import DailyProductSales, DailySales, Product, SalesReport, SalesReportRow, User
+from app.security import get_current_admin_user
+
+router = APIRouter(prefix="/admin/reports", tags=["reports"])
+
+# Longest range one report may cover; rows read grow with days, not orders
+MAX_REPORT_DAYS = 3660
+
+# First day of the period a rollup day belongs to (weeks start on Monday)
+PERIOD_STARTS = {
+    "day": lambda day: day,
+    "week": lambda day: func.date(day, "weekday 0", "-6 days"),
+    "month": lambda day: func.date(day, "start of month"),
+}
+
+def sales_report(session: Session, date_from: date, date_to: date, group_by: str, limit: Optional[int] = None) -> SalesReport:
+    """
+    Builds a sales report for [date_from, date_to] (UTC days, inclusive)
+    from the daily rollups alone, so its cost depends on the number of days
+    (and, per product, products sold) in the range, never on order volume.
+    """
+    in_range = (DailySales.day >= date_from, DailySales.day <= date_to)
+    orders, units, revenue = session.exec(
+        select(
+            func.coalesce(func.sum(DailySales.orders), 0),
+            func.coalesce(func.sum(DailySales.units), 0),
+            func.coalesce(func.sum(DailySales.revenue), 0.0),
+        ).where(*in_range)
+    ).one()
+
+    if group_by == "product":
+        product_units = func.sum(DailyProductSales.units).label("units")
+        product_revenue = func.sum(DailyProductSales.revenue).label("revenue")
+        query = (
+            select(DailyProductSales.product_id, Product.name, product_units, product_revenue)
+            .join(Product, Product.id == DailyProductSales.product_id, isouter=True)
+            .where(DailyProductSales.day >= date_from, DailyProductSales.day <= date_to)
+            .group_by(DailyProductSales.product_id)
+            .order_by(product_revenue.desc(), DailyProductSales.product_id)
+            .limit(limit)
+        )
+        rows = [
+            SalesReportRow(product_id=product_id, product_name=name, units=units, revenue=round(revenue, 2))
+            for product_id, name, units, revenue in session.exec(query).all()
+        ]
+    else:
+        period = PERIOD_STARTS[group_by](DailySales.day).label("period")
+        query = (
+            select(period, func.sum(DailySales.orders), func.sum(DailySales.units), func.sum(DailySales.revenue))
+            .where(*in_range)
+            .group_by(period)
+            .order_by(period)
+        )
+        rows = [
+            SalesReportRow(period=period, orders=orders, units=units, revenue=round(revenue, 2))
+            for period, orders, units, revenue in session.exec(query).all()
+        ]
+
+    return SalesReport(
+        date_from=date_from, date_to=date_to, group_by=group_by,
+        orders=orders, units=units, revenue=round(revenue, 2), rows=rows
+    )
+
+@router.get("/sales", response_model=SalesReport)
+def get_sales_report(
+    *,
+    session: Session = Depends(get_session),
+    admin_user: User = Depends(get_current_admin_user),
+    date_from: Optional[date] = Query(None, alias="from", description="First UTC day (default: 29 days before `to`)"),
+    date_to: Optional[date] = Query(None, alias="to", description="Last UTC day, inclusive (default: today)"),
+    group_by: Literal["day", "week", "month", "product"] = "day",
+    limit: int = Query(50, ge=1, le=1000, description="Products returned for group_by=product, best-selling first")
+):
+    """
+    Revenue, orders and units sold over a date range, per day, week or month,
+    or per product ranked by revenue (Admin only).
+    """
+    date_to = date_to or datetime.utcnow().date()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="`from` must not be after `to`.")
+    if (date_to - date_from).days >= MAX_REPORT_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A report may cover at most {MAX_REPORT_DAYS} days."
+        )
+    return sales_report(session, date_from, date_to, group_by, limit if group_by == "product" else None)
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlmodel import Session, select
 from datetime import timedelta
+from typing import Optional
 
 from app.database import get_session
+from app.idempotency import idempotency_store, request_fingerprint
 from app.models import User, UserCreate, Token
 from app.security import (
     hash_password, 
@@ -16,8 +18,23 @@ from app.security import (
 router = APIRouter(prefix="/users", tags=["users"])
 
 @router.post("/register", response_model=UserCreate, status_code=status.HTTP_201_CREATED)
-def register_user(user_in: UserCreate, session: Session = Depends(get_session)):
-    """Registers a new user (customer by default)."""
+def register_user(
+    user_in: UserCreate,
+    session: Session = Depends(get_session),
+    idempotency_key: Optional[str] = Header(None, max_length=255)
+):
+    """
+    Registers a new user (customer by default). A retry with the same
+    `Idempotency-Key` and body gets the original 201 instead of a 409.
+    """
+    # The response echoes the password, so it is rebuilt from the retried
+    # request rather than written to the idempotency table
+    return idempotency_store.run(
+        idempotency_key, "users.register", request_fingerprint(user_in),
+        status.HTTP_201_CREATED, lambda: create_user(session, user_in), replay_body=user_in
+    )
+
+def create_user(session: Session, user_in: UserCreate) -> UserCreate:
     existing_user = session.exec(select(User).where(User.username == user_in.username)).first()
     if existing_user:
         raise HTTPException(status_code=409, detail="Username already registered")
@@ -0,0 +1,127 @@
+import re
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from app.models import ProductSearchHit
+
+# External-content FTS5 index over product(name, description). The text
+# lives only in the product table; product_fts stores the inverted index,
+# and the triggers below keep it in step with every INSERT/UPDATE/DELETE,
+# whichever code path issues them.
+SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5(
+        name, description,
+        content='product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3 4'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_ai AFTER INSERT ON product BEGIN
+        INSERT INTO product_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_ad AFTER DELETE ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_au AFTER UPDATE OF name, description ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO product_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+
+# Column weights for bm25(): a hit in the name counts ten times one in the description
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+# Deepest result offered through offset paging
+MAX_OFFSET = 2_000
+
+# Every match is ranked: with ORDER BY rank, FTS5 scores each match once
+# (rank is bm25 with the weights configured below) and keeps only the
+# requested page, working on rowids alone. highlight() and snippet() need
+# a MATCH cursor, so the page is re-read in one pass over its rowid range
+# (rather than one MATCH per hit, which re-expands prefix terms every
+# time) and they are computed only for rows on the requested page.
+SEARCH_SQL = text("""
+    WITH top AS (
+        SELECT rowid AS id, rank AS score
+        FROM product_fts
+        WHERE product_fts MATCH :match
+        ORDER BY rank
+        LIMIT :limit OFFSET :offset
+    )
+    SELECT p.id, p.name, p.description, p.price, p.stock,
+           highlight(product_fts, 0, '<mark>', '</mark>') AS highlighted_name,
+           snippet(product_fts, 1, '<mark>', '</mark>', '…', 12) AS snippet,
+           top.score AS score
+    FROM product_fts
+    CROSS JOIN top
+    CROSS JOIN product AS p
+    WHERE product_fts MATCH :match
+      AND product_fts.rowid BETWEEN (SELECT min(id) FROM top) AND (SELECT max(id) FROM top)
+      AND top.id = +product_fts.rowid
+      AND p.id = top.id
+    ORDER BY top.score, top.id
+""")
+
+# unicode61 treats letters and digits as token characters; "_" separates
+TERM_PATTERN = re.compile(r"[^\W_]+\*?")
+
+
+def create_search_index(engine: Engine) -> None:
+    """
+    Creates the FTS table and its sync triggers if they are missing. When the
+    table is new, it is filled from the existing products in one pass.
+    """
+    with engine.begin() as conn:
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_fts'"
+        ).first()
+        for statement in SEARCH_DDL:
+            conn.exec_driver_sql(statement)
+        conn.exec_driver_sql(
+            f"INSERT INTO product_fts(product_fts, rank) VALUES ('rank', 'bm25({NAME_WEIGHT}, {DESCRIPTION_WEIGHT})')"
+        )
+        if not exists:
+            conn.exec_driver_sql("INSERT INTO product_fts(product_fts) VALUES ('rebuild')")
+
+
+def match_expression(q: str, prefix: bool = True) -> Optional[str]:
+    """
+    Turns free text into a safe FTS5 MATCH expression, or None if `q` has
+    no words.
+
+    Every word is quoted, so FTS5 operators in user input are treated as
+    plain text, and all words must match. A trailing `*` on a word makes it
+    a prefix query; with `prefix` the last word is one too, which suits
+    search-as-you-type.
+    """
+    terms = TERM_PATTERN.findall(q)
+    if not terms:
+        return None
+    phrases = []
+    for i, term in enumerate(terms):
+        phrase = f'"{term.rstrip("*")}"'
+        if term.endswith("*") or (prefix and i == len(terms) - 1):
+            phrase += "*"
+        phrases.append(phrase)
+    return " ".join(phrases)
+
+
+def search_products(session: Session, q: str, limit: int = 20, offset: int = 0, prefix: bool = True) -> List[ProductSearchHit]:
+    """Returns products matching every word of `q`, best BM25 match first."""
+    match = match_expression(q, prefix)
+    if match is None:
+        return []
+    rows = session.connection().execute(SEARCH_SQL, {"match": match, "limit": limit, "offset": offset})
+    return [ProductSearchHit.model_validate(row._mapping) for row in rows]
+
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from colorama import Fore, Style
+from sqlmodel import Session, select
+
+from app.models import Product
+
+# How often pending changes are sent, as one event per tick
+STREAM_TICK = float(os.getenv("STOCK_STREAM_TICK_SECONDS", "0.5"))
+# Events kept for Last-Event-ID resume
+STREAM_BUFFER = int(os.getenv("STOCK_STREAM_BUFFER", "1000"))
+# Events a subscriber may fall behind before it is disconnected
+SUBSCRIBER_QUEUE = int(os.getenv("STOCK_STREAM_QUEUE", "100"))
+# Comment line sent on idle streams so proxies keep them open
+KEEPALIVE_INTERVAL = 15.0
+
+
+class Subscriber:
+    __slots__ = ("queue", "dropped")
+
+    def __init__(self, max_events: int):
+        self.queue: "asyncio.Queue[bytes]" = asyncio.Queue(max_events)
+        # Fell behind; the stream ends once the queue is drained
+        self.dropped = False
+
+
+class StockBroadcaster:
+    """
+    In-process pub/sub for product stock and price changes.
+
+    Writers call `publish` from any thread after they commit. Changes are
+    coalesced per product (the latest value of each field wins) and sent
+    once per tick as a single SSE event listing every changed product, so
+    a burst of checkouts costs subscribers one event, not one per order.
+
+    Each event is also kept in a ring buffer so a client reconnecting with
+    Last-Event-ID gets what it missed; one that has fallen out of the
+    buffer, or comes from an earlier process, gets a `reset` event telling
+    it to reload the catalog. A subscriber whose queue fills up is
+    disconnected rather than slowing the others; it resumes the same way.
+
+    Changes are published by the worker that committed them and buffered
+    in its memory, so with several workers a subscriber hears only about
+    checkouts and edits its own worker served, and a reconnect should be
+    routed back to that worker to resume rather than reset.
+    """
+
+    def __init__(self, buffer_size: int = STREAM_BUFFER, queue_size: int = SUBSCRIBER_QUEUE):
+        self.queue_size = queue_size
+        # Event ids are "<epoch>-<seq>"; the epoch tells ids from a previous run apart
+        self.epoch = str(int(time.time()))
+        self.seq = 0
+        self.events_sent = 0
+        self.subscribers_dropped = 0
+        self._buffer: Deque[Tuple[int, bytes]] = deque(maxlen=buffer_size)
+        self._pending: Dict[int, dict] = {}
+        self._subscribers: Set[Subscriber] = set()
+        self._lock = threading.Lock()
+
+    def publish(self, changes: Dict[int, dict]) -> None:
+        """Queues changed fields per product id, e.g. {3: {"stock": 7}} or {3: {"deleted": True}}."""
+        with self._lock:
+            for product_id, fields in changes.items():
+                self._pending.setdefault(product_id, {}).update(fields)
+
+    def publish_products(self, session: Session, product_ids: Iterable[int]) -> None:
+        """Publishes the current stock and price of the given products."""
+        rows = session.exec(
+            select(Product.id, Product.stock, Product.price).where(Product.id.in_(list(product_ids)))
+        ).all()
+        self.publish({product_id: {"stock": stock, "price": price} for product_id, stock, price in rows})
+
+    def tick(self) -> int:
+        """Sends pending changes as one event; returns how many products it covered. Event loop only."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        self.seq += 1
+        data = json.dumps(
+            [{"id": product_id, **fields} for product_id, fields in sorted(pending.items())],
+            separators=(",", ":")
+        )
+        event = f"id: {self.epoch}-{self.seq}\nevent: stock\ndata: {data}\n\n".encode()
+        self._buffer.append((self.seq, event))
+        self.events_sent += 1
+
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscriber.dropped = True
+                self._subscribers.discard(subscriber)
+                self.subscribers_dropped += 1
+        return len(pending)
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Tuple[Subscriber, List[bytes]]:
+        """
+        Registers a subscriber and returns it with the events to send first:
+        those after `last_event_id`, or a reset if they are no longer held.
+        Event loop only.
+        """
+        subscriber = Subscriber(self.queue_size)
+        self._subscribers.add(subscriber)
+        if last_event_id is None:
+            return subscriber, []
+
+        epoch, _, seq = last_event_id.partition("-")
+        oldest = self._buffer[0][0] if self._buffer else self.seq + 1
+        if epoch != self.epoch or not seq.isdigit() or not oldest - 1 <= int(seq) <= self.seq:
+            return subscriber, [f"id: {self.epoch}-{self.seq}\nevent: reset\ndata: {{}}\n\n".encode()]
+        return subscriber, [event for event_seq, event in self._buffer if event_seq > int(seq)]
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    async def stream(self, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """The body of one SSE response."""
+        subscriber, backlog = self.subscribe(last_event_id)
+        try:
+            yield b"retry: 3000\n\n"
+            for event in backlog:
+                yield event
+            while not (subscriber.dropped and subscriber.queue.empty()):
+                try:
+                    yield await asyncio.wait_for(subscriber.queue.get(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "events_sent": self.events_sent,
+            "subscribers_dropped": self.subscribers_dropped,
+            "buffered_events": len(self._buffer),
+        }
+
+
+stock_broadcaster = StockBroadcaster()
+
+
+async def run_broadcaster(interval: float = STREAM_TICK) -> None:
+    """Background task, started from the app lifespan, that sends coalesced changes every tick."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            stock_broadcaster.tick()
+        except Exception as e:
+            print(f"{Fore.RED}ERROR: Stock stream tick failed: {e}{Style.RESET_ALL}")
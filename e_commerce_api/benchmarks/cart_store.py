@@ -0,0 +1,81 @@
+"""
+Add-to-cart throughput of the SQLite and memory cart stores.
+
+    python benchmarks/cart_store.py [--adds 5000] [--users 1000] [--products 1000] [--threads 1 8]
+
+Each run uses a fresh database in a scratch directory.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--adds", type=int, default=5_000, help="Items added per run")
+parser.add_argument("--users", type=int, default=1_000)
+parser.add_argument("--products", type=int, default=1_000)
+parser.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+args = parser.parse_args()
+
+scratch = tempfile.TemporaryDirectory(prefix="cart_store_benchmark_")
+os.chdir(scratch.name)
+
+from sqlmodel import Session, SQLModel, create_engine  # noqa: E402
+
+from app.cart_store import MemoryCartStore, SQLCartStore  # noqa: E402
+from app.models import Product  # noqa: E402
+
+
+def run(kind: str, threads: int) -> None:
+    db = f"cart_{kind}_{threads}.db"
+    engine = create_engine(f"sqlite:///{db}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO user (id, username, hashed_password, role) VALUES (?, ?, '', 'customer')",
+            [(i, f"user{i}") for i in range(1, args.users + 1)]
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO product (id, name, description, price, stock, reserved) VALUES (?, ?, '', 9.99, 1000000, 0)",
+            [(i, f"Product {i}") for i in range(1, args.products + 1)]
+        )
+    store = SQLCartStore() if kind == "sqlite" else MemoryCartStore(write_behind=False, bind=engine)
+
+    rng = random.Random(7)
+    # Each thread owns a slice of the users, as sticky sessions would
+    adds = [(rng.randint(1, args.users), rng.randint(1, args.products)) for _ in range(args.adds)]
+    slices = [[add for add in adds if add[0] % threads == t] for t in range(threads)]
+
+    def worker(work) -> None:
+        for user_id, product_id in work:
+            with Session(engine) as session:
+                # The add-item endpoint's work: product check, read, change
+                session.get(Product, product_id)
+                quantity = store.quantities(session, user_id).get(product_id, 0) + 1
+                store.set_quantities(session, user_id, {product_id: quantity})
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(worker, slices))
+    elapsed = time.perf_counter() - started
+
+    with engine.connect() as conn:
+        carts = conn.exec_driver_sql("SELECT count(*) FROM cart").scalar()
+        lines = conn.exec_driver_sql("SELECT count(*) FROM cartitem").scalar()
+    engine.dispose()
+    print(
+        f"{kind:>6}, {threads} thread(s): {args.adds / elapsed:8.0f} adds/s "
+        f"({elapsed * 1e6 / args.adds:6.0f} µs each) | rows left: {carts} carts, {lines} lines"
+    )
+
+
+for threads in args.threads:
+    for kind in ("sqlite", "memory"):
+        run(kind, threads)
+
+os.chdir(os.path.dirname(scratch.name))
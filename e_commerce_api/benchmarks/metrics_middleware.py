@@ -0,0 +1,65 @@
+"""
+Per-request overhead of MetricsMiddleware.
+
+    python benchmarks/metrics_middleware.py [--requests 200000] [--rounds 5]
+
+A trivial ASGI app is called directly and through the middleware, with no
+server or network in between.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+from time import perf_counter_ns
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--requests", type=int, default=200_000)
+parser.add_argument("--rounds", type=int, default=5)
+args = parser.parse_args()
+
+from app.middleware.metrics import MetricsMiddleware, RequestMetrics  # noqa: E402
+
+
+class Route:
+    path = "/products/{product_id}"
+
+
+async def endpoint(scope, receive, send):
+    scope["route"] = Route
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def run(app, n: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/products/1"}
+    start = perf_counter_ns()
+    for _ in range(n):
+        await app(dict(scope), receive, send)
+    return (perf_counter_ns() - start) / n
+
+
+async def main():
+    middleware = MetricsMiddleware(endpoint, RequestMetrics())
+    await run(endpoint, args.requests // 10)
+    await run(middleware, args.requests // 10)
+    bare, wrapped = [], []
+    for _ in range(args.rounds):
+        bare.append(await run(endpoint, args.requests))
+        wrapped.append(await run(middleware, args.requests))
+    overhead = statistics.median(wrapped) - statistics.median(bare)
+    print(f"bare app: {statistics.median(bare):.0f} ns/request, with MetricsMiddleware: {statistics.median(wrapped):.0f} ns/request")
+    print(f"middleware overhead: {overhead / 1000:.2f} µs/request")
+
+
+asyncio.run(main())
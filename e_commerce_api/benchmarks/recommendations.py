@@ -0,0 +1,135 @@
+"""
+Build time, memory and lookup latency of the related-products index over a synthetic order history.
+
+    python benchmarks/recommendations.py [--products 100000] [--lines 10000000] [--lookups 100000] [--db PATH]
+
+The order history is generated in a scratch directory unless --db names a
+file; an existing file is reused, which saves regenerating it per run.
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--db", help="Order history database to build, or reuse if it exists")
+parser.add_argument("--products", type=int, default=100_000)
+parser.add_argument("--lines", type=int, default=10_000_000, help="Order lines to generate")
+parser.add_argument("--lookups", type=int, default=100_000)
+args = parser.parse_args()
+
+scratch = tempfile.TemporaryDirectory(prefix="recommendations_benchmark_")
+if args.db is None:
+    args.db = os.path.join(scratch.name, "related_benchmark.db")
+else:
+    args.db = os.path.abspath(args.db)
+# app.database names its file relative to the working directory
+os.chdir(scratch.name)
+
+from sqlmodel import Session, SQLModel, create_engine, select  # noqa: E402
+
+from app.models import Product  # noqa: E402
+from app.recommendations import RelatedIndex, rebuild_co_purchases, record_co_purchases  # noqa: E402
+
+rng = random.Random(11)
+engine = create_engine(f"sqlite:///{args.db}")
+if not os.path.exists(args.db):
+    SQLModel.metadata.create_all(engine)
+    print(f"Generating {args.lines} order lines over {args.products} products...")
+    started = time.perf_counter()
+    # Popularity is Zipf-like, and most baskets stay within one
+    # "category" (a block of 50 consecutive ids) of their first item
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, args.products + 1)))
+    popular = list(range(1, args.products + 1))
+    rng.shuffle(popular)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO user (id, username, hashed_password, role) VALUES (1, 'bench', '', 'customer')")
+        conn.exec_driver_sql(
+            "INSERT INTO product (id, name, description, price, stock, reserved) VALUES (?, ?, '', 10.0, 0, 0)",
+            [(i, f"Product {i}") for i in range(1, args.products + 1)]
+        )
+        lines, order_id, orders, items = 0, 0, [], []
+        while lines < args.lines:
+            order_id += 1
+            size = min(rng.randint(1, 7), args.lines - lines)
+            first = popular[rng.choices(range(args.products), cum_weights=cum_weights)[0]]
+            basket = {first}
+            block = (first - 1) // 50 * 50
+            while len(basket) < size:
+                if rng.random() < 0.7:
+                    basket.add(block + 1 + min(int(rng.expovariate(0.15)), 49))
+                else:
+                    basket.add(popular[rng.choices(range(args.products), cum_weights=cum_weights)[0]])
+            orders.append((order_id, 1, 0.0))
+            items.extend((order_id, product_id, 1, 10.0) for product_id in basket if product_id <= args.products)
+            lines += size
+            if len(items) >= 200_000 or lines >= args.lines:
+                conn.exec_driver_sql('INSERT INTO "order" (id, user_id, total_price, created_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP)', orders)
+                conn.exec_driver_sql("INSERT INTO orderitem (order_id, product_id, quantity, price) VALUES (?, ?, ?, ?)", items)
+                orders, items = [], []
+    print(f"Generated in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    order_count = rebuild_co_purchases(engine)
+    print(f"Rebuilt co-purchases for {order_count} orders in {time.perf_counter() - started:.1f}s")
+
+with engine.connect() as conn:
+    pair_rows = conn.exec_driver_sql("SELECT count(*) FROM copurchase").scalar()
+index = RelatedIndex()
+started = time.perf_counter()
+index.load(engine)
+load_seconds = time.perf_counter() - started
+# Loaded again under tracemalloc, which slows allocation too much to time it
+tracemalloc.start()
+RelatedIndex().load(engine)
+_, peak = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+print(
+    f"{pair_rows} co-purchase pairs | index load {load_seconds:.1f}s, "
+    f"{index.memory_bytes() / 2**20:.1f} MiB resident (k={index.k}), peak while loading {peak / 2**20:.1f} MiB"
+)
+
+product_ids = [rng.randint(1, args.products) for _ in range(args.lookups)]
+timings = []
+for product_id in product_ids:
+    started = time.perf_counter_ns()
+    index.top(product_id, 10)
+    timings.append(time.perf_counter_ns() - started)
+timings.sort()
+print(
+    f"index.top(k=10): mean {statistics.mean(timings) / 1000:.2f} µs | "
+    f"p99 {timings[int(len(timings) * 0.99)] / 1000:.2f} µs"
+)
+
+timings = []
+with Session(engine) as session:
+    for product_id in product_ids[:5_000]:
+        started = time.perf_counter_ns()
+        ids = [product_id] + [related_id for related_id, _ in index.top(product_id, 10)]
+        session.exec(select(Product).where(Product.id.in_(ids))).all()
+        timings.append(time.perf_counter_ns() - started)
+timings.sort()
+print(
+    f"lookup + product rows (uncached endpoint work): mean {statistics.mean(timings) / 1e6:.3f} ms | "
+    f"p99 {timings[int(len(timings) * 0.99)] / 1e6:.3f} ms"
+)
+
+timings = []
+with Session(engine) as session:
+    for _ in range(1_000):
+        basket = rng.sample(range(1, args.products + 1), 4)
+        started = time.perf_counter_ns()
+        pairs = record_co_purchases(session, basket)
+        index.merge(pairs)
+        timings.append(time.perf_counter_ns() - started)
+    session.rollback()
+print(f"checkout update (4 items, 12 pairs): mean {statistics.mean(timings) / 1e6:.3f} ms")
+engine.dispose()
+os.chdir(os.path.dirname(scratch.name))
@@ -0,0 +1,111 @@
+"""
+A flash sale: checkout success rate and latency with and without stock reservations.
+
+    python benchmarks/reservations.py [--shoppers 1000] [--stock 100] [--concurrency 200] [--think-time 1.0]
+
+Each run uses a fresh database in a scratch directory.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--shoppers", type=int, default=1000)
+parser.add_argument("--stock", type=int, default=100)
+parser.add_argument("--concurrency", type=int, default=200)
+parser.add_argument("--think-time", type=float, default=1.0, help="Max seconds between add-to-cart and checkout")
+args = parser.parse_args()
+
+scratch = tempfile.TemporaryDirectory(prefix="reservations_benchmark_")
+os.chdir(scratch.name)
+
+from sqlmodel import Session, SQLModel, create_engine  # noqa: E402
+
+from app.models import Cart, Product  # noqa: E402
+from app.reservations import set_hold, take_stock  # noqa: E402
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else 0.0
+
+
+def simulate(use_reservations: bool) -> None:
+    db = f"reservations_{'on' if use_reservations else 'off'}.db"
+    engine = create_engine(f"sqlite:///{db}", connect_args={"check_same_thread": False, "timeout": 60})
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(Product(name="Flash sale item", price=10.0, stock=args.stock))
+        session.add_all(Cart() for _ in range(args.shoppers))
+        session.commit()
+
+    lock = threading.Lock()
+    stats = {"rejected_at_add": 0, "checkouts": 0, "succeeded": 0, "wasted_think_time": 0.0}
+    add_latency, checkout_latency = [], []
+    rng = random.Random(7)
+    think_times = [rng.uniform(0, args.think_time) for _ in range(args.shoppers)]
+
+    def shopper(cart_id: int) -> None:
+        with Session(engine) as session:
+            started = time.perf_counter()
+            if use_reservations:
+                added = set_hold(session, cart_id, 1, 1)
+                session.commit() if added else session.rollback()
+            else:
+                product = session.get(Product, 1)
+                added = product.stock >= 1
+            with lock:
+                add_latency.append(time.perf_counter() - started)
+            if not added:
+                with lock:
+                    stats["rejected_at_add"] += 1
+                return
+
+            # The client fills in shipping and payment details
+            think = think_times[cart_id - 1]
+            time.sleep(think)
+
+            started = time.perf_counter()
+            succeeded = take_stock(session, cart_id, {1: 1}) is None
+            session.commit() if succeeded else session.rollback()
+            with lock:
+                checkout_latency.append(time.perf_counter() - started)
+                stats["checkouts"] += 1
+                stats["succeeded"] += succeeded
+                if not succeeded:
+                    stats["wasted_think_time"] += think
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(shopper, range(1, args.shoppers + 1)))
+    elapsed = time.perf_counter() - started
+
+    with Session(engine) as session:
+        product = session.get(Product, 1)
+    engine.dispose()
+
+    checkouts = stats["checkouts"]
+    label = "with reservations" if use_reservations else "stock check at add only"
+    print(f"{label}:")
+    print(f"  rejected at add-to-cart: {stats['rejected_at_add']}")
+    print(
+        f"  checkouts: {checkouts}, succeeded: {stats['succeeded']} "
+        f"({stats['succeeded'] / checkouts * 100 if checkouts else 0:.1f}%), "
+        f"shopper time wasted on failed checkouts: {stats['wasted_think_time']:.1f}s"
+    )
+    print(f"  add-to-cart latency: p50 {percentile(add_latency, 0.5):.2f} ms | p99 {percentile(add_latency, 0.99):.2f} ms")
+    print(f"  checkout latency: p50 {percentile(checkout_latency, 0.5):.2f} ms | p99 {percentile(checkout_latency, 0.99):.2f} ms")
+    print(f"  final stock: {product.stock}, reserved: {product.reserved}, wall time {elapsed:.1f}s")
+
+
+print(f"{args.shoppers} shoppers, {args.stock} units, concurrency {args.concurrency}")
+simulate(use_reservations=False)
+simulate(use_reservations=True)
+os.chdir(os.path.dirname(scratch.name))
@@ -0,0 +1,92 @@
+"""
+A 30-day sales report from the rollups against a scan of the order tables.
+
+    python benchmarks/rollups.py [--orders 10000 100000 1000000] [--products 1000] [--days 365]
+
+Each order count gets a fresh synthetic order history in a scratch directory.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--orders", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+parser.add_argument("--products", type=int, default=1_000)
+parser.add_argument("--days", type=int, default=365)
+args = parser.parse_args()
+
+scratch = tempfile.TemporaryDirectory(prefix="rollups_benchmark_")
+os.chdir(scratch.name)
+
+from sqlalchemy import text  # noqa: E402
+from sqlmodel import Session, SQLModel, create_engine  # noqa: E402
+
+from app.rollups import rebuild_rollups  # noqa: E402
+from app.routers.reports import sales_report  # noqa: E402
+
+RAW_DAYS_SQL = text("""
+    SELECT date(o.created_at) AS day, count(DISTINCT o.id), sum(oi.quantity), sum(oi.quantity * oi.price)
+    FROM "order" AS o JOIN orderitem AS oi ON oi.order_id = o.id
+    WHERE o.created_at >= :start AND o.created_at < :end
+    GROUP BY day
+""")
+
+
+def timed(fn, runs: int = 20) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+rng = random.Random(3)
+first_day = date(2024, 1, 1)
+for order_count in args.orders:
+    engine = create_engine(f"sqlite:///rollups_{order_count}.db")
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO user (id, username, hashed_password, role) VALUES (1, 'bench', '', 'customer')")
+        conn.exec_driver_sql(
+            "INSERT INTO product (id, name, description, price, stock, reserved) VALUES (?, ?, '', ?, 0, 0)",
+            [(i, f"Product {i}", round(rng.uniform(1, 200), 2)) for i in range(1, args.products + 1)]
+        )
+        start = datetime.combine(first_day, datetime.min.time())
+        span = args.days * 86_400
+        times = sorted(start + timedelta(seconds=rng.uniform(0, span)) for _ in range(order_count))
+        orders, items = [], []
+        for order_id, created_at in enumerate(times, 1):
+            orders.append((order_id, 1, 0.0, created_at.isoformat(sep=" ")))
+            for _ in range(rng.randint(1, 5)):
+                items.append((order_id, rng.randint(1, args.products), rng.randint(1, 3), round(rng.uniform(1, 200), 2)))
+        conn.exec_driver_sql('INSERT INTO "order" (id, user_id, total_price, created_at) VALUES (?, ?, ?, ?)', orders)
+        conn.exec_driver_sql("INSERT INTO orderitem (order_id, product_id, quantity, price) VALUES (?, ?, ?, ?)", items)
+
+    started = time.perf_counter()
+    rebuild_rollups(engine)
+    rebuild_seconds = time.perf_counter() - started
+
+    date_to = first_day + timedelta(days=args.days - 1)
+    date_from = date_to - timedelta(days=29)
+    with Session(engine) as session:
+        raw_ms = timed(lambda: session.connection().execute(RAW_DAYS_SQL, {
+            "start": date_from.isoformat(), "end": (date_to + timedelta(days=1)).isoformat()
+        }).all())
+        rollup_ms = timed(lambda: sales_report(session, date_from, date_to, "day"))
+        products_ms = timed(lambda: sales_report(session, date_from, date_to, "product", 10))
+    engine.dispose()
+
+    print(
+        f"{order_count:>9} orders: rebuild {rebuild_seconds:.1f}s | 30-day report by day: "
+        f"scan {raw_ms:.2f} ms, rollups {rollup_ms:.2f} ms | top 10 products: {products_ms:.2f} ms"
+    )
+
+os.chdir(os.path.dirname(scratch.name))
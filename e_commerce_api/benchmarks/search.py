@@ -0,0 +1,96 @@
+"""
+Latency of product search queries against a synthetic catalog.
+
+    python benchmarks/search.py [--products 1000000] [--queries 2000] [--limit 20] [--db PATH]
+
+The catalog is built in a scratch directory unless --db names a file; an
+existing file is reused, which saves rebuilding a large catalog per run.
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--db", help="Catalog database to build, or reuse if it exists")
+parser.add_argument("--products", type=int, default=1_000_000)
+parser.add_argument("--queries", type=int, default=2_000)
+parser.add_argument("--limit", type=int, default=20)
+args = parser.parse_args()
+
+from sqlmodel import Session, SQLModel, create_engine  # noqa: E402
+
+from app.search import create_search_index, search_products  # noqa: E402
+
+scratch = None
+if args.db is None:
+    scratch = tempfile.TemporaryDirectory(prefix="search_benchmark_")
+    args.db = os.path.join(scratch.name, "search_benchmark.db")
+
+rng = random.Random(42)
+words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9))) for _ in range(20_000)]
+# A Zipf-ish vocabulary: a few very common words, a long tail of rare
+# ones, and (as in real text) the common words are the short ones
+words.sort(key=len)
+cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+
+engine = create_engine(f"sqlite:///{args.db}")
+if not os.path.exists(args.db):
+    SQLModel.metadata.create_all(engine)
+    print(f"Inserting {args.products} products...")
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        batch = []
+        for i in range(args.products):
+            name = " ".join(rng.choices(words, cum_weights=cum_weights, k=3))
+            description = " ".join(rng.choices(words, cum_weights=cum_weights, k=25))
+            batch.append((name, description, round(rng.uniform(1, 500), 2), rng.randint(0, 100)))
+            if len(batch) == 10_000 or i == args.products - 1:
+                conn.exec_driver_sql(
+                    "INSERT INTO product (name, description, price, stock, reserved) VALUES (?, ?, ?, ?, 0)", batch
+                )
+                batch = []
+    print("Building search index...")
+    create_search_index(engine)
+    print(f"Loaded in {time.perf_counter() - started:.1f}s")
+
+queries = []
+for _ in range(args.queries):
+    kind = rng.random()
+    if kind < 0.4:
+        queries.append(("word", rng.choices(words, cum_weights=cum_weights)[0]))
+    elif kind < 0.8:
+        queries.append(("two words", " ".join(rng.choices(words, cum_weights=cum_weights, k=2))))
+    else:
+        # Search-as-you-type: a partial word
+        word = rng.choices(words, cum_weights=cum_weights)[0]
+        queries.append(("partial word", word[:rng.randint(2, len(word))]))
+
+timings = {}
+with Session(engine) as session:
+    for _, q in queries[:50]:
+        search_products(session, q, args.limit)
+    for kind, q in queries:
+        started = time.perf_counter()
+        search_products(session, q, args.limit)
+        timings.setdefault(kind, []).append((time.perf_counter() - started) * 1000)
+timings["all"] = [t for kind_timings in timings.values() for t in kind_timings]
+engine.dispose()
+
+print(f"{args.queries} queries over {args.products} products (limit {args.limit})")
+for kind, kind_timings in timings.items():
+    kind_timings.sort()
+
+    def pct(p: float) -> float:
+        return kind_timings[min(len(kind_timings) - 1, int(len(kind_timings) * p))]
+
+    print(
+        f"{kind:>12}: n={len(kind_timings)} mean {statistics.mean(kind_timings):.2f} ms | p50 {pct(0.50):.2f} ms"
+        f" | p95 {pct(0.95):.2f} ms | p99 {pct(0.99):.2f} ms | max {kind_timings[-1]:.2f} ms"
+    )
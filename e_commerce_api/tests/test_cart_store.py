@@ -0,0 +1,169 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlmodel import Session, func, select
+
+from app.cart_store import CartStore, CheckoutConflict, SQLCartStore, create_cart_store
+from app.database import engine
+from app.models import Order, Product, User
+from conftest import create_product, create_users
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def store(request, client, monkeypatch):
+    cart_store = create_cart_store(request.param)
+    monkeypatch.setattr("app.routers.cart.cart_store", cart_store)
+    return cart_store
+
+
+def user_id(username: str) -> int:
+    with Session(engine) as session:
+        return session.exec(select(User.id).where(User.username == username)).one()
+
+
+def orders_and_stock(product_id: int) -> tuple:
+    with Session(engine) as session:
+        orders = session.exec(select(func.count()).select_from(Order)).one()
+        stock, reserved = session.exec(select(Product.stock, Product.reserved).where(Product.id == product_id)).one()
+    return orders, stock, reserved
+
+
+def test_cart_store_is_abstract():
+    with pytest.raises(TypeError):
+        CartStore()
+
+
+def test_concurrent_checkouts_of_one_cart_place_one_order(client, store):
+    product = create_product(stock=10)
+    [headers] = create_users(1)
+    assert client.post("/cart/add-item", json={"product_id": product.id, "quantity": 2}, headers=headers).status_code == 201
+
+    requests = 8
+    barrier = threading.Barrier(requests)
+
+    def checkout(_):
+        barrier.wait()
+        return client.post("/cart/checkout", headers=headers)
+
+    with ThreadPoolExecutor(requests) as pool:
+        responses = list(pool.map(checkout, range(requests)))
+
+    codes = [response.status_code for response in responses]
+    assert codes.count(201) == 1
+    # The rest either lost the cart mid-checkout or found it gone
+    assert set(codes) <= {201, 400, 409}, [response.text for response in responses]
+    assert orders_and_stock(product.id) == (1, 8, 0)
+
+
+def test_clearing_a_cart_checked_out_meanwhile_conflicts(client, store):
+    product = create_product(stock=10)
+    create_users(1)
+    customer = user_id("customer0")
+    with Session(engine) as session:
+        store.set_quantities(session, customer, {product.id: 1})
+
+    with Session(engine) as first, Session(engine) as second:
+        [item] = store.items(first, customer)
+        store.clear(second, customer, item.cart_id)
+        second.commit()
+        with pytest.raises(CheckoutConflict):
+            store.clear(first, customer, item.cart_id)
+
+
+def test_checkout_of_a_cart_being_checked_out_is_409(client, monkeypatch):
+    store = create_cart_store("memory")
+    monkeypatch.setattr("app.routers.cart.cart_store", store)
+    product = create_product(stock=10)
+    [headers] = create_users(1)
+    assert client.post("/cart/add-item", json={"product_id": product.id, "quantity": 2}, headers=headers).status_code == 201
+    # As if another checkout of this cart were still running
+    store._carts[user_id("customer0")].closed = True
+
+    response = client.post("/cart/checkout", headers=headers)
+
+    assert response.status_code == 409, response.text
+    assert orders_and_stock(product.id) == (0, 10, 0)
+
+
+def cart_lines(client, headers: dict) -> dict:
+    summary = client.get("/cart/summary", headers=headers).json()
+    return {line["product_id"]: line["quantity"] for line in summary["items"]}
+
+
+def reserved(*product_ids: int) -> list:
+    with Session(engine) as session:
+        return [session.get(Product, product_id).reserved for product_id in product_ids]
+
+
+def test_put_replaces_the_whole_cart(client, store):
+    a, b, c = (create_product(name=name) for name in "abc")
+    [headers] = create_users(1)
+    client.post("/cart/add-item", json={"product_id": a.id, "quantity": 1}, headers=headers)
+    client.post("/cart/add-item", json={"product_id": b.id, "quantity": 2}, headers=headers)
+
+    # Lines missing from the body go; repeated products are summed
+    body = {"items": [{"product_id": b.id, "quantity": 3}, {"product_id": c.id, "quantity": 1}, {"product_id": c.id, "quantity": 1}]}
+    response = client.put("/cart/", json=body, headers=headers)
+
+    assert response.status_code == 200, response.text
+    assert {line["product_id"]: line["quantity"] for line in response.json()["items"]} == {b.id: 3, c.id: 2}
+    assert cart_lines(client, headers) == {b.id: 3, c.id: 2}
+    if isinstance(store, SQLCartStore):
+        assert reserved(a.id, b.id, c.id) == [0, 3, 2]
+
+    assert client.put("/cart/", json={"items": [{"product_id": b.id, "quantity": 0}]}, headers=headers).status_code == 400
+    assert client.put("/cart/", json={"items": []}, headers=headers).json()["items"] == []
+    assert cart_lines(client, headers) == {}
+
+
+def test_patch_removes_lines_taken_to_zero_or_below(client, store):
+    a, b, c = (create_product(name=name) for name in "abc")
+    [headers] = create_users(1)
+    client.post("/cart/add-item", json={"product_id": a.id, "quantity": 2}, headers=headers)
+    client.post("/cart/add-item", json={"product_id": b.id, "quantity": 1}, headers=headers)
+
+    body = {"items": [{"product_id": a.id, "quantity": -2}, {"product_id": b.id, "quantity": 3}, {"product_id": c.id, "quantity": 1}]}
+    response = client.patch("/cart/", json=body, headers=headers)
+
+    assert response.status_code == 200, response.text
+    assert cart_lines(client, headers) == {b.id: 4, c.id: 1}
+
+    response = client.patch("/cart/", json={"items": [{"product_id": b.id, "quantity": -10}]}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert cart_lines(client, headers) == {c.id: 1}
+
+
+def test_batch_updates_of_an_unknown_product_are_404(client, store):
+    product = create_product()
+    [headers] = create_users(1)
+    client.post("/cart/add-item", json={"product_id": product.id, "quantity": 1}, headers=headers)
+    body = {"items": [{"product_id": product.id, "quantity": 2}, {"product_id": 999, "quantity": 1}]}
+
+    for method in (client.put, client.patch):
+        response = method("/cart/", json=body, headers=headers)
+        assert response.status_code == 404
+        assert response.json() == {"detail": "Product 999 not found"}
+    assert cart_lines(client, headers) == {product.id: 1}
+
+
+def test_batch_updates_short_of_stock_are_400_and_change_nothing(client, store):
+    plenty = create_product(name="Plenty", stock=10)
+    scarce = create_product(name="Scarce", stock=1)
+    [headers] = create_users(1)
+    client.post("/cart/add-item", json={"product_id": plenty.id, "quantity": 1}, headers=headers)
+    before = reserved(plenty.id, scarce.id)
+
+    response = client.put(
+        "/cart/", json={"items": [{"product_id": plenty.id, "quantity": 5}, {"product_id": scarce.id, "quantity": 2}]}, headers=headers
+    )
+    assert response.status_code == 400
+    assert response.json() == {"detail": f"Not enough stock for product {scarce.id}. Available: 1, Requested: 2"}
+
+    response = client.patch(
+        "/cart/", json={"items": [{"product_id": plenty.id, "quantity": 1}, {"product_id": scarce.id, "quantity": 2}]}, headers=headers
+    )
+    assert response.status_code == 400
+
+    assert cart_lines(client, headers) == {plenty.id: 1}
+    assert reserved(plenty.id, scarce.id) == before
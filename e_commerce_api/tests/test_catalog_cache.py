@@ -0,0 +1,111 @@
+from app.catalog_cache import CatalogCache, catalog_cache, make_etag
+from conftest import auth_headers, create_product, create_users
+
+ADMIN = auth_headers("admin")
+
+
+def test_catalog_reads_carry_a_strong_etag_and_revalidate_with_304(client):
+    product = create_product()
+
+    first = client.get(f"/products/{product.id}")
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert not etag.startswith("W/")
+    assert etag == make_etag(first.content)
+    assert first.headers["cache-control"] == "no-cache"
+
+    before = catalog_cache.stats()
+    revalidated = client.get(f"/products/{product.id}", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["etag"] == etag
+    # Weak comparison: the W/ form of the tag matches too
+    assert client.get(f"/products/{product.id}", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    assert client.get(f"/products/{product.id}", headers={"If-None-Match": '"other"'}).status_code == 200
+
+    stats = catalog_cache.stats()
+    assert stats["hits"] - before["hits"] == 3
+    assert stats["misses"] == before["misses"]
+    assert stats["not_modified"] - before["not_modified"] == 2
+
+
+def test_product_writes_invalidate_cached_pages(client):
+    product = create_product(name="Widget")
+    listing = client.get("/products/")
+    etag = listing.headers["etag"]
+
+    def changed_since(etag: str):
+        response = client.get("/products/", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        return response
+
+    version = catalog_cache.version
+    response = client.post("/products/", json={"name": "Gadget", "price": 5.0, "stock": 3}, headers=ADMIN)
+    assert response.status_code == 201, response.text
+    assert catalog_cache.version == version + 1
+    listing = changed_since(etag)
+    assert [item["name"] for item in listing.json()] == ["Widget", "Gadget"]
+
+    response = client.put(f"/products/{product.id}", json={"name": "Widget", "price": 12.0, "stock": 10}, headers=ADMIN)
+    assert response.status_code == 200, response.text
+    assert catalog_cache.version == version + 2
+    listing = changed_since(listing.headers["etag"])
+    assert listing.json()[0]["price"] == 12.0
+    assert client.get(f"/products/{product.id}").json()["price"] == 12.0
+
+    assert client.delete(f"/products/{product.id}", headers=ADMIN).status_code == 204
+    assert catalog_cache.version == version + 3
+    listing = changed_since(listing.headers["etag"])
+    assert [item["name"] for item in listing.json()] == ["Gadget"]
+    assert client.get(f"/products/{product.id}").status_code == 404
+
+
+def test_checkout_invalidates_cached_stock(client):
+    product = create_product(stock=10)
+    [customer] = create_users(1)
+    assert client.post("/cart/add-item", json={"product_id": product.id, "quantity": 2}, headers=customer).status_code == 201
+    cached = client.get(f"/products/{product.id}")
+    assert cached.json()["stock"] == 10
+
+    version = catalog_cache.version
+    assert client.post("/cart/checkout", headers=customer).status_code == 201
+
+    assert catalog_cache.version > version
+    response = client.get(f"/products/{product.id}", headers={"If-None-Match": cached.headers["etag"]})
+    assert response.status_code == 200
+    assert response.json()["stock"] == 8
+
+
+def test_stats_endpoint_is_admin_only(client):
+    [customer] = create_users(1)
+    product = create_product()
+    client.get(f"/products/{product.id}")
+    client.get(f"/products/{product.id}")
+
+    assert client.get("/products/cache/stats", headers=customer).status_code == 403
+    response = client.get("/products/cache/stats", headers=ADMIN)
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats == catalog_cache.stats()
+    assert stats["entries"] == 1
+    assert stats["hits"] >= 1
+    assert set(stats) == {
+        "version", "entries", "max_entries", "hits", "misses", "hit_ratio", "not_modified", "invalidations", "evictions"
+    }
+
+
+def test_pages_read_before_a_write_are_not_cached():
+    cache = CatalogCache(max_entries=2)
+    version = cache.version
+    cache.bump()  # A write lands while the page is being read
+
+    entry = cache.put("key", version, b"[]")
+
+    assert entry.etag == make_etag(b"[]")
+    assert cache.get("key") is None
+
+    for key in ("a", "b", "c"):
+        cache.put(key, cache.version, key.encode())
+    assert cache.get("a") is None
+    assert cache.get("c").body == b"c"
+    assert cache.stats()["evictions"] == 1
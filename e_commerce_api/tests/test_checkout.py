@@ -0,0 +1,80 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+from sqlmodel import Session, func, select
+
+from app.database import engine
+from app.models import Order, OrderItem, Product
+from conftest import create_product, create_users
+
+CUSTOMERS = 20
+
+
+def fill_carts(client, customers: list, product_id: int, quantity: int = 1) -> None:
+    for headers in customers:
+        response = client.post("/cart/add-item", json={"product_id": product_id, "quantity": quantity}, headers=headers)
+        assert response.status_code == 201, response.text
+
+
+def checkout_all(client, customers: list) -> tuple:
+    """Checks out every customer's cart at once; returns the status codes and the commits issued."""
+    commits = []
+
+    def count_commit(conn):
+        commits.append(conn)
+
+    barrier = threading.Barrier(len(customers))
+
+    def checkout(headers):
+        barrier.wait()
+        return client.post("/cart/checkout", headers=headers)
+
+    event.listen(engine, "commit", count_commit)
+    try:
+        with ThreadPoolExecutor(len(customers)) as pool:
+            responses = list(pool.map(checkout, customers))
+    finally:
+        event.remove(engine, "commit", count_commit)
+    for response in responses:
+        assert response.status_code in (201, 400), response.text
+    return [response.status_code for response in responses], commits
+
+
+def product_state(product_id: int) -> tuple:
+    with Session(engine) as session:
+        stock, reserved = session.exec(select(Product.stock, Product.reserved).where(Product.id == product_id)).one()
+        orders = session.exec(select(func.count()).select_from(Order)).one()
+        units = session.exec(select(func.coalesce(func.sum(OrderItem.quantity), 0))).one()
+    return stock, reserved, orders, units
+
+
+def test_concurrent_checkouts_never_oversell(client):
+    stock = 5
+    product = create_product(stock=CUSTOMERS)
+    customers = create_users(CUSTOMERS)
+    fill_carts(client, customers, product.id)
+    # The holds lapse and stock is cut: every cart now competes for the last units
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM reservation")
+        conn.exec_driver_sql("UPDATE product SET stock = ?, reserved = 0 WHERE id = ?", (stock, product.id))
+
+    codes, commits = checkout_all(client, customers)
+
+    assert codes.count(201) == stock
+    assert codes.count(400) == CUSTOMERS - stock
+    assert product_state(product.id) == (0, 0, stock, stock)
+    # One commit per order, none for the checkouts that fell short
+    assert len(commits) == stock
+
+
+def test_concurrent_checkouts_of_held_stock_all_succeed(client):
+    product = create_product(stock=CUSTOMERS * 2)
+    customers = create_users(CUSTOMERS)
+    fill_carts(client, customers, product.id, quantity=2)
+
+    codes, commits = checkout_all(client, customers)
+
+    assert codes == [201] * CUSTOMERS
+    assert product_state(product.id) == (0, 0, CUSTOMERS, CUSTOMERS * 2)
+    assert len(commits) == CUSTOMERS
@@ -0,0 +1,205 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlmodel import Session, func, select
+
+from app.database import engine
+from app.idempotency import IdempotencyStore
+from app.models import IdempotencyRecord
+from conftest import create_product, create_users
+
+KEY = ("test", "key-1")
+
+
+def run_in_thread(fn) -> tuple:
+    """Starts `fn` in a thread; returns the thread and a list that receives its result."""
+    results = []
+    thread = threading.Thread(target=lambda: results.append(fn()))
+    thread.start()
+    return thread, results
+
+
+def records() -> list:
+    with Session(engine) as session:
+        return session.exec(select(IdempotencyRecord).order_by(IdempotencyRecord.id)).all()
+
+
+def test_a_concurrent_duplicate_waits_for_the_first_result(client):
+    # Polling would take 10s: only the owner's event wakes the duplicates in time
+    store = IdempotencyStore(poll_interval=10, wait_timeout=5)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def first():
+        calls.append("first")
+        started.set()
+        release.wait(5)
+        return {"order_id": 1}
+
+    def duplicate():
+        calls.append("duplicate")
+        return {"order_id": 2}
+
+    owner, owner_result = run_in_thread(lambda: store.run("key-1", "test", "same", 201, first))
+    assert started.wait(5)
+    owner_event = store._inflight[KEY]
+
+    # The second duplicate finds nothing stored yet and loses the claim to the
+    # owner; that must leave the owner's event registered for the others
+    claim, lookup = store._claim, store._lookup
+    lost_claim = []
+
+    def lookup_misses_once(record_key):
+        if not lost_claim:
+            return None
+        return lookup(record_key)
+
+    def claim_and_check(record_key, fingerprint):
+        claimed = claim(record_key, fingerprint)
+        lost_claim.append((claimed, store._inflight.get(KEY)))
+        return claimed
+
+    waiter, waiter_result = run_in_thread(lambda: store.run("key-1", "test", "same", 201, duplicate))
+    time.sleep(0.2)
+    store._lookup, store._claim = lookup_misses_once, claim_and_check
+    loser, loser_result = run_in_thread(lambda: store.run("key-1", "test", "same", 201, duplicate))
+    while not lost_claim:
+        time.sleep(0.01)
+    store._lookup, store._claim = lookup, claim
+
+    started_waiting = time.monotonic()
+    release.set()
+    for thread in (owner, waiter, loser):
+        thread.join(5)
+
+    assert lost_claim == [(None, owner_event)]
+    assert time.monotonic() - started_waiting < 2
+    assert calls == ["first"]
+    assert owner_result == [{"order_id": 1}]
+    for [replay] in (waiter_result, loser_result):
+        assert replay.status_code == 201
+        assert replay.body == b'{"order_id":1}'
+        assert replay.headers["idempotent-replayed"] == "true"
+    assert store._inflight == {}
+
+
+def test_retries_replay_the_first_response(client):
+    product = create_product(stock=10)
+    [headers] = create_users(1)
+    headers = {**headers, "Idempotency-Key": "add-1"}
+
+    first = client.post("/cart/add-item", json={"product_id": product.id, "quantity": 2}, headers=headers)
+    retry = client.post("/cart/add-item", json={"product_id": product.id, "quantity": 2}, headers=headers)
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert "idempotent-replayed" not in first.headers
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert [item["quantity"] for item in client.get("/cart/", headers=headers).json()] == [2]
+
+
+def test_registration_replays_the_echo_without_storing_the_password(client):
+    headers = {"Idempotency-Key": "register-1"}
+    body = {"username": "alice", "password": "secret-password"}
+
+    first = client.post("/users/register", json=body, headers=headers)
+    retry = client.post("/users/register", json=body, headers=headers)
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    [record] = records()
+    assert record.response_body is None
+    assert "secret-password" not in record.fingerprint
+
+
+def test_a_key_reused_for_a_different_request_is_422(client):
+    product = create_product(stock=10)
+    [headers] = create_users(1)
+    headers = {**headers, "Idempotency-Key": "add-1"}
+    assert client.post("/cart/add-item", json={"product_id": product.id, "quantity": 1}, headers=headers).status_code == 201
+
+    response = client.post("/cart/add-item", json={"product_id": product.id, "quantity": 3}, headers=headers)
+
+    assert response.status_code == 422
+    assert response.json() == {"detail": "This Idempotency-Key was already used for a different request."}
+    assert [item["quantity"] for item in client.get("/cart/", headers=headers).json()] == [1]
+
+
+@pytest.mark.parametrize("error", [HTTPException(status_code=503, detail="Try later"), RuntimeError("boom")])
+def test_failed_requests_release_the_key_for_a_retry(client, error):
+    store = IdempotencyStore()
+
+    def fail():
+        raise error
+
+    with pytest.raises(type(error)):
+        store.run("key-1", "test", "same", 201, fail)
+    assert records() == []
+
+    assert store.run("key-1", "test", "same", 201, lambda: {"ok": True}) == {"ok": True}
+    assert [record.status_code for record in records()] == [201]
+
+
+def test_client_errors_are_stored_and_replayed(client):
+    store = IdempotencyStore()
+
+    def reject():
+        raise HTTPException(status_code=400, detail="Cart is empty")
+
+    with pytest.raises(HTTPException):
+        store.run("key-1", "test", "same", 201, reject)
+    replay = store.run("key-1", "test", "same", 201, lambda: {"ok": True})
+
+    assert replay.status_code == 400
+    assert replay.body == b'{"detail":"Cart is empty"}'
+
+
+def test_an_abandoned_claim_is_taken_over(client):
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        # The owner died mid-request; its lock has run out
+        session.add(IdempotencyRecord(
+            scope="test", key="key-1", fingerprint="same", locked_until=now - timedelta(seconds=1), expires_at=now + timedelta(hours=1)
+        ))
+        # This one is still held
+        session.add(IdempotencyRecord(
+            scope="test", key="key-2", fingerprint="same", locked_until=now + timedelta(minutes=1), expires_at=now + timedelta(hours=1)
+        ))
+        session.commit()
+    store = IdempotencyStore(wait_timeout=0.2, poll_interval=0.05)
+
+    assert store.run("key-1", "test", "same", 201, lambda: {"ok": True}) == {"ok": True}
+    with pytest.raises(HTTPException) as e:
+        store.run("key-2", "test", "same", 201, lambda: {"ok": True})
+    assert e.value.status_code == 409
+    taken_over, held = records()
+    assert (taken_over.status_code, taken_over.locked_until) == (201, None)
+    assert held.status_code is None and held.locked_until > now
+
+
+def test_expired_records_are_deleted_in_batches(client):
+    store = IdempotencyStore(ttl=timedelta(hours=1))
+    for i in range(5):
+        store.run(f"old-{i}", "test", "same", 201, lambda: {"ok": True})
+    store.run("fresh", "test", "same", 201, lambda: {"ok": True})
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "UPDATE idempotencyrecord SET expires_at = ? WHERE key LIKE 'old-%'", (datetime.utcnow() - timedelta(seconds=1),)
+        )
+    # Expire the cached copies too, as the clock would have
+    for record_key, stored in list(store._cache.items()):
+        if record_key[1].startswith("old-"):
+            store._cache[record_key] = stored._replace(expires_at=datetime.utcnow() - timedelta(seconds=1))
+
+    assert store.delete_expired(batch_size=2) == 5
+
+    assert [record.key for record in records()] == ["fresh"]
+    assert list(store._cache) == [("test", "fresh")]
+    # An expired key is free again
+    assert store.run("old-0", "test", "different", 201, lambda: {"again": True}) == {"again": True}
+    with Session(engine) as session:
+        assert session.exec(select(func.count()).select_from(IdempotencyRecord)).one() == 2
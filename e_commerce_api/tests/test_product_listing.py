@@ -0,0 +1,130 @@
+import base64
+import itertools
+import json
+
+import pytest
+from sqlalchemy.dialects import sqlite
+
+from app.database import create_db_and_tables, engine
+from app.routers.products import product_listing_query
+from conftest import create_product, create_users, remove_database
+
+LISTING_INDEXES = {"price": "ix_product_price_listing", "name": "ix_product_name_listing"}
+
+COMBINATIONS = list(itertools.product(
+    ["id", "price", "name"],  # sort
+    [False, True],  # descending
+    [False, True],  # price range
+    [False, True],  # in_stock_only
+    [False, True],  # name prefix
+    [False, True],  # after cursor
+))
+
+
+@pytest.fixture(scope="module")
+def schema():
+    """Plans depend only on the schema, so the plan tests share one database."""
+    remove_database()
+    create_db_and_tables()
+
+
+def query_plan(sort, descending, price_range, in_stock_only, name_prefix, after) -> list:
+    query = product_listing_query(
+        min_price=10 if price_range else None,
+        max_price=50 if price_range else None,
+        in_stock_only=in_stock_only,
+        name_prefix="Wid" if name_prefix else None,
+        sort=sort,
+        descending=descending,
+        after=("Widget" if sort == "name" else 20, 7) if after else None,
+    )
+    sql = str(query.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        return [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+@pytest.mark.parametrize("sort, descending, price_range, in_stock_only, name_prefix, after", COMBINATIONS)
+def test_listing_query_is_driven_by_an_index(schema, sort, descending, price_range, in_stock_only, name_prefix, after):
+    plan = query_plan(sort, descending, price_range, in_stock_only, name_prefix, after)
+    ranges = {column for column, used in (("price", price_range), ("name", name_prefix)) if used}
+
+    if not ranges or sort in ranges:
+        # Read in sort order straight off the index (the rowid for id) and stopped at the page size
+        assert not any("TEMP B-TREE" in step for step in plan), plan
+        if sort == "id":
+            # With no cursor, the first page is the start of the table in primary-key order
+            assert plan[0].startswith("SEARCH product USING INTEGER PRIMARY KEY") or (not after and plan == ["SCAN product"]), plan
+        else:
+            assert LISTING_INDEXES[sort] in plan[0], plan
+    else:
+        # A range on another column: that range's matches are found in its index, then sorted
+        assert plan[0].startswith("SEARCH product USING INDEX"), plan
+        assert any(LISTING_INDEXES[column] in plan[0] for column in ranges), plan
+        assert "USE TEMP B-TREE FOR ORDER BY" in plan, plan
+
+
+@pytest.mark.parametrize("sort", ["price", "name"])
+def test_listing_filters_inside_the_index(schema, sort):
+    # Every filtered column is in the sort index, so no row is read from the table only to be rejected
+    plan = query_plan(sort, False, sort == "price", True, sort == "name", True)
+    assert plan == [f"SEARCH product USING INDEX {LISTING_INDEXES[sort]} ({'price>? AND price<?' if sort == 'price' else 'name>? AND name<?'})"]
+
+
+def test_in_stock_only_excludes_products_held_in_carts(client):
+    held = create_product(name="Last one", stock=1)
+    other = create_product(name="Plenty", stock=5)
+    [customer] = create_users(1)
+
+    def in_stock() -> list:
+        return [product["id"] for product in client.get("/products/", params={"in_stock_only": True}).json()]
+
+    assert in_stock() == [held.id, other.id]
+
+    response = client.post("/cart/add-item", json={"product_id": held.id, "quantity": 1}, headers=customer)
+    assert response.status_code == 201
+    assert in_stock() == [other.id]
+
+    item_id = client.get("/cart/", headers=customer).json()[0]["id"]
+    assert client.delete(f"/cart/remove-item/{item_id}", headers=customer).status_code == 204
+    assert in_stock() == [held.id, other.id]
+
+
+def cursor(*payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(payload)).encode()).decode()
+
+
+def test_cursors_round_trip_for_every_sort(client):
+    for i in range(5):
+        create_product(name=f"Widget {i}", price=10.0 + i)
+    for sort in ("id", "price", "name"):
+        first = client.get("/products/", params={"sort": sort, "limit": 2})
+        second = client.get("/products/", params={"sort": sort, "limit": 2, "after": first.headers["x-next-cursor"]})
+        assert second.status_code == 200, second.text
+        assert [product["name"] for product in second.json()] == ["Widget 2", "Widget 3"]
+
+
+@pytest.mark.parametrize("sort, after", [
+    ("id", "not base64!"),
+    ("id", base64.urlsafe_b64encode(b"\xff\xfe").decode()),  # Not UTF-8
+    ("id", cursor(1)),  # Not a pair
+    ("id", cursor(1, 2, 3)),
+    ("id", base64.urlsafe_b64encode(b'{"a": 1, "b": 2}').decode()),
+    ("id", cursor(1, "2")),  # The id must be an integer
+    ("id", cursor(1, 2.5)),
+    ("id", cursor(1, True)),
+    ("id", cursor(1, None)),
+    ("price", cursor([10], 1)),  # The value must be a scalar
+    ("price", cursor({"$gt": 0}, 1)),
+    ("price", cursor("10", 1)),  # ...of the sort column's type
+    ("price", cursor(False, 1)),
+    ("price", base64.urlsafe_b64encode(b"[NaN, 1]").decode()),
+    ("name", cursor(10.0, 1)),
+    ("name", cursor(None, 1)),
+])
+def test_tampered_cursors_are_rejected(client, sort, after):
+    create_product()
+
+    response = client.get("/products/", params={"sort": sort, "after": after})
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid pagination cursor."}
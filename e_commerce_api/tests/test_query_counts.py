@@ -0,0 +1,101 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.models import Order, OrderItem, User
+from conftest import create_product, create_users
+
+
+@contextmanager
+def count_statements():
+    """Collects every SQL statement the engine runs inside the block."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def statements_for(client, url: str, headers: dict) -> list:
+    with count_statements() as statements:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.text
+    return statements
+
+
+def create_orders(username: str, product_id: int, orders: int, items_per_order: int) -> None:
+    with Session(engine) as session:
+        user_id = session.exec(select(User.id).where(User.username == username)).one()
+        session.add_all(
+            Order(
+                user_id=user_id, total_price=items_per_order * 10.0,
+                items=[OrderItem(product_id=product_id, quantity=1, price=10.0) for _ in range(items_per_order)]
+            )
+            for _ in range(orders)
+        )
+        session.commit()
+
+
+def test_cart_summary_runs_a_fixed_number_of_statements(client):
+    products = [create_product(name=f"Product {i}") for i in range(10)]
+    small_cart, large_cart = create_users(2)
+    client.post("/cart/add-item", json={"product_id": products[0].id, "quantity": 1}, headers=small_cart)
+    for product in products:
+        client.post("/cart/add-item", json={"product_id": product.id, "quantity": 2}, headers=large_cart)
+
+    small = statements_for(client, "/cart/summary", small_cart)
+    large = statements_for(client, "/cart/summary", large_cart)
+
+    assert len(client.get("/cart/summary", headers=large_cart).json()["items"]) == 10
+    # The user lookup for authentication, then the summary itself
+    assert len(small) == len(large) == 2
+
+
+def test_order_history_runs_a_fixed_number_of_statements(client):
+    product = create_product()
+    few, many = create_users(2)
+    create_orders("customer0", product.id, orders=1, items_per_order=1)
+    create_orders("customer1", product.id, orders=30, items_per_order=5)
+
+    small = statements_for(client, "/orders/?limit=50", few)
+    large = statements_for(client, "/orders/?limit=50", many)
+
+    orders = client.get("/orders/?limit=50", headers=many).json()
+    assert len(orders) == 30 and all(len(order["items"]) == 5 for order in orders)
+    # The user lookup, the page of orders, then every order's items in one batch
+    assert len(small) == len(large) == 3
+
+
+def test_cart_batch_updates_run_a_fixed_number_of_statements(client):
+    products = [create_product(name=f"Product {i}") for i in range(10)]
+    small_cart, large_cart = create_users(2)
+    client.post("/cart/add-item", json={"product_id": products[0].id, "quantity": 1}, headers=small_cart)
+    for product in products:
+        client.post("/cart/add-item", json={"product_id": product.id, "quantity": 1}, headers=large_cart)
+
+    def statements(method, headers: dict, products: list, quantity: int) -> list:
+        body = {"items": [{"product_id": product.id, "quantity": quantity} for product in products]}
+        with count_statements() as statements:
+            response = method("/cart/", json=body, headers=headers)
+        assert response.status_code == 200, response.text
+        return statements
+
+    small_put = statements(client.put, small_cart, products[:1], 3)
+    large_put = statements(client.put, large_cart, products, 3)
+    small_patch = statements(client.patch, small_cart, products[:1], -1)
+    large_patch = statements(client.patch, large_cart, products, -1)
+
+    assert [line["quantity"] for line in client.get("/cart/", headers=large_cart).json()] == [2] * 10
+    # The user lookup, the current lines and the cart; holds renewed, read
+    # and updated, stock read and reserved updated, lines read and updated,
+    # each in one statement whatever the cart's size; then the user reloaded
+    # after the commit, and the summary
+    assert len(small_put) == len(large_put) == 12
+    assert len(small_patch) == len(large_patch) == 12
@@ -0,0 +1,79 @@
+import random
+
+from sqlmodel import Session
+
+from app.catalog_cache import catalog_cache
+from app.database import engine
+from app.models import Order, OrderItem
+from app.recommendations import RELATED_K, RelatedIndex, rebuild_co_purchases, record_co_purchases, related_index, top_related
+from conftest import create_product, create_users
+
+
+def test_merged_checkouts_match_a_full_rebuild(client):
+    products = [create_product(name=f"Product {i}") for i in range(12)]
+    ids = [product.id for product in products]
+    rng = random.Random(7)
+    # Small k, so rows are cut off and ties at the cut are common
+    merged = RelatedIndex(k=3)
+
+    for _ in range(300):
+        # Skewed, so some products pair far more often than others
+        basket = set(rng.choices(ids, weights=range(len(ids), 0, -1), k=rng.randint(1, 4)))
+        with Session(engine) as session:
+            session.add(Order(
+                user_id=1, total_price=10.0 * len(basket),
+                items=[OrderItem(product_id=product_id, quantity=1, price=10.0) for product_id in basket]
+            ))
+            pairs = record_co_purchases(session, basket)
+            session.commit()
+        merged.merge(pairs)
+
+    rebuilt = RelatedIndex(k=3)
+    assert rebuild_co_purchases(engine, batch_size=50) == 300
+    rebuilt.load(engine)
+
+    with Session(engine) as session:
+        for product_id in ids:
+            expected = top_related(session, product_id, k=3)
+            assert merged.top(product_id) == rebuilt.top(product_id) == expected
+    assert any(len(merged.top(product_id)) == 3 for product_id in ids)
+
+
+def test_related_products_are_ranked_by_co_purchases(client, monkeypatch):
+    related_index.load(engine)
+    a, b, c, d, lonely = (create_product(name=name, stock=100) for name in ("A", "B", "C", "D", "Lonely"))
+    [headers] = create_users(1)
+    for basket in ([a, b], [a, b], [a, b], [a, c], [a, c], [a, d], [b, c]):
+        for product in basket:
+            assert client.post("/cart/add-item", json={"product_id": product.id, "quantity": 1}, headers=headers).status_code == 201
+        assert client.post("/cart/checkout", headers=headers).status_code == 201
+
+    def related(product, **params) -> list:
+        response = client.get(f"/products/{product.id}/related", params=params)
+        assert response.status_code == 200, response.text
+        return [(item["name"], item["co_purchases"]) for item in response.json()]
+
+    assert related(a) == [("B", 3), ("C", 2), ("D", 1)]
+    assert related(b) == [("A", 3), ("C", 1)]
+    assert related(a, limit=2) == [("B", 3), ("C", 2)]
+    assert related(lonely) == []
+
+    # Before the index has loaded, the table gives the same answer
+    monkeypatch.setattr(related_index, "loaded", False)
+    catalog_cache.bump()
+    assert related(a) == [("B", 3), ("C", 2), ("D", 1)]
+    assert related(a, limit=2) == [("B", 3), ("C", 2)]
+
+    # Pairs outlive a product removed from the table; it is left out
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM product WHERE id = ?", (c.id,))
+    catalog_cache.bump()
+    assert related(a) == [("B", 3), ("D", 1)]
+
+
+def test_related_products_check_the_product_and_limit(client):
+    product = create_product()
+
+    assert client.get("/products/999/related").status_code == 404
+    assert client.get(f"/products/{product.id}/related", params={"limit": 0}).status_code == 422
+    assert client.get(f"/products/{product.id}/related", params={"limit": RELATED_K + 1}).status_code == 422
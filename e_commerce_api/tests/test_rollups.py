@@ -0,0 +1,131 @@
+from datetime import date, datetime
+
+import pytest
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.models import DailyProductSales, DailySales, Order, OrderItem, User
+from app.rollups import rebuild_rollups, record_order
+from conftest import auth_headers, create_product, create_users
+
+ADMIN = auth_headers("admin")
+
+
+def place_order(created_at: datetime, lines: list) -> None:
+    """Saves an order of (product, quantity) lines and records it, as checkout does."""
+    with Session(engine) as session:
+        user_id = session.exec(select(User.id).where(User.username == "admin")).one()
+        order = Order(
+            user_id=user_id, created_at=created_at,
+            total_price=sum(product.price * quantity for product, quantity in lines),
+            items=[OrderItem(product_id=product.id, quantity=quantity, price=product.price) for product, quantity in lines]
+        )
+        session.add(order)
+        record_order(session, order)
+        session.commit()
+
+
+def rollups() -> tuple:
+    with Session(engine) as session:
+        days = [(row.day, row.orders, row.units, round(row.revenue, 2)) for row in session.exec(select(DailySales).order_by(DailySales.day))]
+        product_days = [
+            (row.day, row.product_id, row.units, round(row.revenue, 2))
+            for row in session.exec(select(DailyProductSales).order_by(DailyProductSales.day, DailyProductSales.product_id))
+        ]
+    return days, product_days
+
+
+def test_checkouts_keep_the_rollups_equal_to_a_full_recompute(client):
+    products = [create_product(name=f"Product {i}", price=1.25 + i, stock=100) for i in range(4)]
+    customers = create_users(5)
+    for i, headers in enumerate(customers):
+        for product in products[i % 3:i % 3 + 2]:
+            response = client.post("/cart/add-item", json={"product_id": product.id, "quantity": i + 1}, headers=headers)
+            assert response.status_code == 201, response.text
+        assert client.post("/cart/checkout", headers=headers).status_code == 201
+    # Earlier days, and an order repeating a product
+    place_order(datetime(2025, 3, 1, 23, 59), [(products[0], 2), (products[3], 1)])
+    place_order(datetime(2025, 3, 2, 0, 1), [(products[3], 4), (products[3], 1)])
+
+    incremental = rollups()
+    assert rebuild_rollups(engine, batch_size=2) == 7
+    recomputed = rollups()
+
+    assert incremental == recomputed
+    days, _ = incremental
+    assert [orders for _, orders, _, _ in days] == [1, 1, 5]
+
+
+@pytest.fixture
+def sales(client):
+    widget = create_product(name="Widget", price=10.0, stock=100)
+    gadget = create_product(name="Gadget", price=25.0, stock=100)
+    place_order(datetime(2025, 1, 6, 9), [(widget, 1)])  # Monday
+    place_order(datetime(2025, 1, 8, 9), [(widget, 2), (gadget, 1)])
+    place_order(datetime(2025, 1, 13, 9), [(gadget, 2)])  # The next Monday
+    place_order(datetime(2025, 2, 3, 9), [(widget, 5)])
+    return widget, gadget
+
+
+def report(client, **params) -> dict:
+    response = client.get("/admin/reports/sales", params=params, headers=ADMIN)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_sales_report_periods(client, sales):
+    by_day = report(client, **{"from": "2025-01-01", "to": "2025-01-31"})
+    assert (by_day["orders"], by_day["units"], by_day["revenue"]) == (3, 6, 105.0)
+    assert [(row["period"], row["orders"], row["revenue"]) for row in by_day["rows"]] == [
+        ("2025-01-06", 1, 10.0), ("2025-01-08", 1, 45.0), ("2025-01-13", 1, 50.0)
+    ]
+
+    by_week = report(client, **{"from": "2025-01-01", "to": "2025-02-28", "group_by": "week"})
+    assert [(row["period"], row["orders"], row["units"]) for row in by_week["rows"]] == [
+        ("2025-01-06", 2, 4), ("2025-01-13", 1, 2), ("2025-02-03", 1, 5)
+    ]
+
+    by_month = report(client, **{"from": "2025-01-01", "to": "2025-02-28", "group_by": "month"})
+    assert [(row["period"], row["orders"], row["revenue"]) for row in by_month["rows"]] == [
+        ("2025-01-01", 3, 105.0), ("2025-02-01", 1, 50.0)
+    ]
+
+    # Days outside the range are left out
+    one_day = report(client, **{"from": "2025-01-08", "to": "2025-01-08"})
+    assert (one_day["orders"], [row["period"] for row in one_day["rows"]]) == (1, ["2025-01-08"])
+
+
+def test_sales_report_by_product(client, sales):
+    widget, gadget = sales
+
+    by_product = report(client, **{"from": "2025-01-01", "to": "2025-02-28", "group_by": "product"})
+    # Best-selling by revenue first
+    assert [(row["product_id"], row["product_name"], row["units"], row["revenue"]) for row in by_product["rows"]] == [
+        (widget.id, "Widget", 8, 80.0), (gadget.id, "Gadget", 3, 75.0)
+    ]
+
+    top = report(client, **{"from": "2025-01-01", "to": "2025-01-31", "group_by": "product", "limit": 1})
+    assert [(row["product_name"], row["revenue"]) for row in top["rows"]] == [("Gadget", 75.0)]
+
+
+def test_sales_report_defaults_to_the_last_30_days(client, sales):
+    today = datetime.utcnow().date()
+
+    default = report(client)
+
+    assert date.fromisoformat(default["date_to"]) == today
+    assert (today - date.fromisoformat(default["date_from"])).days == 29
+    assert (default["orders"], default["rows"]) == (0, [])
+
+
+def test_sales_report_is_admin_only_and_checks_its_range(client):
+    [customer] = create_users(1)
+
+    assert client.get("/admin/reports/sales").status_code == 401
+    assert client.get("/admin/reports/sales", headers=customer).status_code == 403
+    response = client.get("/admin/reports/sales", params={"from": "2025-02-01", "to": "2025-01-01"}, headers=ADMIN)
+    assert response.status_code == 400
+    response = client.get("/admin/reports/sales", params={"from": "2000-01-01", "to": "2025-01-01"}, headers=ADMIN)
+    assert response.status_code == 400
+    response = client.get("/admin/reports/sales", params={"group_by": "year"}, headers=ADMIN)
+    assert response.status_code == 422
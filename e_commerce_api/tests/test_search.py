@@ -0,0 +1,44 @@
+from app.database import engine
+
+
+def insert_products(rows) -> None:
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO product (name, description, price, stock, reserved) VALUES (?, ?, 10, 5, 0)", rows)
+
+
+def search(client, q: str, **params) -> list:
+    response = client.get("/products/search", params={"q": q, **params})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_every_match_is_ranked(client):
+    # The best match is the oldest of thousands: ranking must not be limited to recent matches
+    insert_products([("Espresso grinder", "Burr grinder for espresso")])
+    insert_products([(f"Mug {i}", "Pairs well with an espresso") for i in range(3_000)])
+
+    hits = search(client, "espresso grinder", prefix=False)
+    assert hits[0]["name"] == "Espresso grinder"
+    assert hits[0]["highlighted_name"] == "<mark>Espresso</mark> <mark>grinder</mark>"
+
+    hits = search(client, "espresso", limit=5)
+    assert hits[0]["name"] == "Espresso grinder"
+    assert all(hit["score"] is not None for hit in hits)
+    assert [hit["score"] for hit in hits] == sorted(hit["score"] for hit in hits)
+
+
+def test_pages_follow_the_ranking(client):
+    insert_products([(f"Lamp {i}", "lamp " * (i % 7 + 1)) for i in range(60)])
+
+    ranked = [hit["id"] for hit in search(client, "lamp", limit=60)]
+    pages = [hit["id"] for offset in range(0, 60, 20) for hit in search(client, "lamp", limit=20, offset=offset)]
+    assert len(ranked) == 60
+    assert pages == ranked
+
+
+def test_query_syntax_is_treated_as_text(client):
+    insert_products([("Cable", 'A "braided" cable')])
+
+    assert [hit["name"] for hit in search(client, '"braided" NEAR(cable*')] == []
+    assert [hit["name"] for hit in search(client, '"braided" cable*')] == ["Cable"]
+    assert search(client, "?!") == []
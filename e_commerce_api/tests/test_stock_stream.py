@@ -0,0 +1,128 @@
+import asyncio
+import json
+
+from app.stock_stream import StockBroadcaster, stock_broadcaster
+from conftest import auth_headers, create_product, create_users
+
+
+def parse(chunk: bytes) -> tuple:
+    """(event id, event type, data) of one SSE event."""
+    fields = dict(line.split(": ", 1) for line in chunk.decode().strip().split("\n"))
+    return fields["id"], fields["event"], json.loads(fields["data"])
+
+
+def read_stream(broadcaster: StockBroadcaster, last_event_id, count: int) -> list:
+    """The first `count` chunks of a stream."""
+    async def read() -> list:
+        stream = broadcaster.stream(last_event_id)
+        try:
+            return [await stream.__anext__() for _ in range(count)]
+        finally:
+            await stream.aclose()
+
+    return asyncio.run(read())
+
+
+def test_changes_are_coalesced_into_one_event_per_tick():
+    broadcaster = StockBroadcaster()
+
+    async def run() -> list:
+        subscriber, _ = broadcaster.subscribe()
+        broadcaster.publish({1: {"stock": 9, "price": 2.0}})
+        broadcaster.publish({1: {"stock": 8}, 2: {"price": 5.0}})
+        broadcaster.publish({3: {"deleted": True}, 1: {"stock": 7}})
+        assert broadcaster.tick() == 3
+        assert broadcaster.tick() == 0
+        return [subscriber.queue.get_nowait() for _ in range(subscriber.queue.qsize())]
+
+    [event] = asyncio.run(run())
+
+    # The latest value of each field wins, products in id order
+    assert parse(event) == (f"{broadcaster.epoch}-1", "stock", [
+        {"id": 1, "stock": 7, "price": 2.0}, {"id": 2, "price": 5.0}, {"id": 3, "deleted": True}
+    ])
+    assert broadcaster.stats() == {"subscribers": 1, "events_sent": 1, "subscribers_dropped": 0, "buffered_events": 1}
+
+
+def test_last_event_id_resumes_from_the_buffer():
+    broadcaster = StockBroadcaster(buffer_size=3)
+    for product_id in range(1, 5):
+        broadcaster.publish({product_id: {"stock": 0}})
+        broadcaster.tick()
+    # Events 2-4 are buffered; 1 has fallen out
+    epoch = broadcaster.epoch
+
+    chunks = read_stream(broadcaster, f"{epoch}-2", 3)
+
+    assert chunks[0] == b"retry: 3000\n\n"
+    assert [parse(chunk)[:2] for chunk in chunks[1:]] == [(f"{epoch}-3", "stock"), (f"{epoch}-4", "stock")]
+    assert parse(chunks[2])[2] == [{"id": 4, "stock": 0}]
+    # Up to date, or just before the oldest buffered event: nothing is missed
+    assert broadcaster.subscribe(f"{epoch}-4")[1] == []
+    assert len(broadcaster.subscribe(f"{epoch}-1")[1]) == 3
+
+
+def test_unusable_last_event_id_gets_a_reset():
+    broadcaster = StockBroadcaster(buffer_size=3)
+    for product_id in range(1, 5):
+        broadcaster.publish({product_id: {"stock": 0}})
+        broadcaster.tick()
+    epoch = broadcaster.epoch
+    reset = (f"{epoch}-4", "reset", {})
+
+    # Fallen out of the buffer, from an earlier process, from the future, or garbage
+    for last_event_id in (f"{epoch}-0", f"{int(epoch) - 1}-3", f"{epoch}-5", f"{epoch}-x", "nonsense"):
+        [event] = broadcaster.subscribe(last_event_id)[1]
+        assert parse(event) == reset, last_event_id
+
+    assert parse(read_stream(broadcaster, "nonsense", 2)[1]) == reset
+
+
+def test_slow_subscriber_is_dropped_after_its_queue_drains():
+    broadcaster = StockBroadcaster(queue_size=2)
+
+    async def run() -> tuple:
+        fast, _ = broadcaster.subscribe()
+        slow = broadcaster.stream()
+        assert await slow.__anext__() == b"retry: 3000\n\n"
+        received = []
+        for product_id in range(1, 4):
+            broadcaster.publish({product_id: {"stock": 0}})
+            broadcaster.tick()
+            received.append(fast.queue.get_nowait())
+        # The slow stream sends what it has queued, then ends
+        backlog = [chunk async for chunk in slow]
+        return fast, received, backlog
+
+    fast, received, backlog = asyncio.run(run())
+
+    epoch = broadcaster.epoch
+    assert [parse(chunk)[0] for chunk in received] == [f"{epoch}-1", f"{epoch}-2", f"{epoch}-3"]
+    assert [parse(chunk)[0] for chunk in backlog] == [f"{epoch}-1", f"{epoch}-2"]
+    assert not fast.dropped
+    assert broadcaster.stats()["subscribers"] == 1
+    assert broadcaster.stats()["subscribers_dropped"] == 1
+    # It reconnects with the last id it got and picks up what it missed
+    assert [parse(event)[0] for event in broadcaster.subscribe(f"{epoch}-2")[1]] == [f"{epoch}-3"]
+
+
+def test_checkout_and_product_edits_publish_changes(client, monkeypatch):
+    published = []
+    monkeypatch.setattr(stock_broadcaster, "publish", published.append)
+    product = create_product(stock=10, price=4.0)
+    unsold = create_product()
+    [headers] = create_users(1)
+    admin = auth_headers("admin")
+
+    client.post("/cart/add-item", json={"product_id": product.id, "quantity": 3}, headers=headers)
+    assert client.post("/cart/checkout", headers=headers).status_code == 201
+    client.put(f"/products/{product.id}", json={"name": "Widget", "price": 5.0, "stock": 7}, headers=admin)
+    client.put(f"/products/{product.id}", json={"name": "Renamed", "price": 5.0, "stock": 7}, headers=admin)
+    client.delete(f"/products/{unsold.id}", headers=admin)
+
+    # A rename changes neither stock nor price, so it is not published
+    assert published == [
+        {product.id: {"stock": 7, "price": 4.0}},
+        {product.id: {"price": 5.0}},
+        {unsold.id: {"deleted": True}},
+    ]
@@ -0,0 +1,74 @@
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy import literal
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, select
+
+from app.models import BulkApplicationResult, JobApplication, JobListing
+from app.stats import record_applications
+
+
+def insert_applications(session: Session, user_id: int, listing_ids: List[int]) -> List[JobApplication]:
+    """
+    Applies the user to every listing in `listing_ids` that exists and they
+    have not applied to yet, with one INSERT ... SELECT ... ON CONFLICT DO
+    NOTHING RETURNING statement: the listing check, the duplicate check
+    (the unique index on user_id, listing_id) and the insert happen
+    atomically, so concurrent requests cannot create duplicates. The
+    dashboard counts are updated in the same transaction. Returns the
+    applications created; the caller commits.
+    """
+    statement = (
+        insert(JobApplication)
+        .from_select(
+            ["user_id", "listing_id", "status", "date_applied"],
+            select(literal(user_id), JobListing.id, literal("pending"), literal(date.today()))
+            .where(JobListing.id.in_(listing_ids))
+        )
+        .on_conflict_do_nothing(index_elements=["user_id", "listing_id"])
+        .returning(*JobApplication.__table__.columns)
+    )
+    created = [JobApplication.model_validate(row._mapping) for row in session.connection().execute(statement)]
+    record_applications(session, created)
+    return created
+
+
+def apply(session: Session, user_id: int, listing_id: int) -> Optional[JobApplication]:
+    """
+    Applies the user to one listing and commits. Returns None if nothing was
+    inserted; `listing_exists` tells a missing listing from a repeat.
+    """
+    created = insert_applications(session, user_id, [listing_id])
+    session.commit()
+    return created[0] if created else None
+
+
+def listing_exists(session: Session, listing_id: int) -> bool:
+    return session.get(JobListing, listing_id) is not None
+
+
+def apply_bulk(session: Session, user_id: int, listing_ids: List[int]) -> List[BulkApplicationResult]:
+    """
+    Applies the user to many listings in one transaction and reports what
+    happened to each, in request order (repeated ids are reported once).
+    """
+    listing_ids = list(dict.fromkeys(listing_ids))
+    created = {application.listing_id: application.id for application in insert_applications(session, user_id, listing_ids)}
+    missing = [listing_id for listing_id in listing_ids if listing_id not in created]
+    already_applied = set(session.exec(
+        select(JobApplication.listing_id)
+        .where(JobApplication.user_id == user_id, JobApplication.listing_id.in_(missing))
+    ).all()) if missing else set()
+    session.commit()
+
+    results = []
+    for listing_id in listing_ids:
+        if listing_id in created:
+            results.append(BulkApplicationResult(listing_id=listing_id, outcome="applied", application_id=created[listing_id]))
+        elif listing_id in already_applied:
+            results.append(BulkApplicationResult(listing_id=listing_id, outcome="already_applied"))
+        else:
+            results.append(BulkApplicationResult(listing_id=listing_id, outcome="not_found"))
+    return results
+
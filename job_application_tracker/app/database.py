@@ -1,12 +1,61 @@
+from colorama import Fore, Style
 from sqlmodel import create_engine, Session, SQLModel
 
+from app.search import create_search_index
+from app.stats import backfill_application_stats
+from app.workflow import create_event_log_guards
+
 sqlite_file_name = "job_tracker.db"
 sqlite_url = f"sqlite:///{sqlite_file_name}"
 engine = create_engine(sqlite_url, echo=True, connect_args={"check_same_thread": False})
+# Duplicate (user_id, listing_id) pairs listed in the startup warning
+MAX_LOGGED_PAIRS = 50
 
 def create_db_and_tables():
     """Creates all database tables defined in the models."""
     SQLModel.metadata.create_all(engine)
+    remove_duplicate_applications()
+    # create_all skips tables that already exist, and with them any index added since
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+    create_search_index(engine)
+    backfill_application_stats(engine)
+    create_event_log_guards(engine)
+
+def remove_duplicate_applications() -> int:
+    """
+    Keeps only the first (lowest id) application per user and listing, so
+    the unique index can be built on databases from before it existed.
+    Prints how many rows were removed and for which (user_id, listing_id)
+    pairs, and returns the count.
+    """
+    with engine.begin() as conn:
+        indexed = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ix_jobapplication_user_id_listing_id'"
+        ).first()
+        if indexed:
+            return 0
+        duplicates = conn.exec_driver_sql("""
+            SELECT user_id, listing_id, count(*) - 1 FROM jobapplication
+            GROUP BY user_id, listing_id HAVING count(*) > 1
+            ORDER BY user_id, listing_id
+        """).all()
+        if not duplicates:
+            return 0
+        removed = conn.exec_driver_sql("""
+            DELETE FROM jobapplication
+            WHERE id NOT IN (SELECT min(id) FROM jobapplication GROUP BY user_id, listing_id)
+        """).rowcount
+
+    pairs = ", ".join(f"({user_id}, {listing_id}) x{extra}" for user_id, listing_id, extra in duplicates[:MAX_LOGGED_PAIRS])
+    if len(duplicates) > MAX_LOGGED_PAIRS:
+        pairs += f" and {len(duplicates) - MAX_LOGGED_PAIRS} more"
+    print(
+        f"{Fore.YELLOW}WARNING: Removed {removed} duplicate applications before adding the unique "
+        f"(user_id, listing_id) index, keeping the first of each. Removed per pair: {pairs}{Style.RESET_ALL}"
+    )
+    return removed
 
 def get_session():
     """Dependency to get a database session."""
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+# How long a cached page is served; also bounds how stale another worker's
+# copy can be, since invalidation only reaches this process
+CACHE_TTL = float(os.getenv("LISTINGS_CACHE_TTL_SECONDS", "5"))
+CACHE_MAX_ENTRIES = int(os.getenv("LISTINGS_CACHE_MAX_ENTRIES", "2048"))
+
+
+class CachedPage(NamedTuple):
+    version: int
+    expires_at: float
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+
+
+class ListingCache:
+    """
+    In-process cache of serialized public listing pages.
+
+    Entries expire after `ttl` seconds and are all invalidated at once by
+    `bump()`, which the listing write endpoints call after they commit.
+    Concurrent misses on the same page are collapsed: one request loads it
+    while the others wait for its result, so a burst of anonymous traffic
+    on a cold or just-expired page costs one query.
+    """
+
+    def __init__(self, ttl: float = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[Hashable, CachedPage]" = OrderedDict()
+        self._loading: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def bump(self) -> None:
+        """Invalidates every cached page."""
+        with self._lock:
+            self.version += 1
+            self.invalidations += 1
+            self._entries.clear()
+
+    def _get(self, key: Hashable) -> Optional[CachedPage]:
+        entry = self._entries.get(key)
+        if entry is None or entry.version != self.version or entry.expires_at <= time.monotonic():
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get_or_load(self, key: Hashable, load: Callable[[], Tuple[bytes, Dict[str, str]]]) -> CachedPage:
+        """
+        Returns the cached page for `key`, calling `load` for the body and
+        any extra headers on a miss.
+        """
+        with self._lock:
+            entry = self._get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                # Loaded by the request we waited for
+                entry = self._get(key)
+                if entry is not None:
+                    self.hits += 1
+                    return entry
+                self.misses += 1
+                # Read before querying, so a page read concurrently with a
+                # write is never cached as current
+                version = self.version
+            try:
+                body, headers = load()
+            except BaseException:
+                with self._lock:
+                    self._loading.pop(key, None)
+                raise
+
+            entry = CachedPage(
+                version, time.monotonic() + self.ttl, body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"', headers
+            )
+            with self._lock:
+                if version == self.version:
+                    self._entries[key] = entry
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                self._loading.pop(key, None)
+            return entry
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "not_modified": self.not_modified,
+                "invalidations": self.invalidations,
+            }
+
+
+listing_cache = ListingCache()
@@ -46,6 +46,11 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Request gate (pure ASGI): required header, User-Agent deny list and exempt
+# paths come from GATE_* environment variables. Added before CORS, so CORS
+# wraps it and rejections still carry CORS headers browsers can read.
+app.add_middleware(UserAgentMiddleware)
+
 origins = [
     "http://localhost:3000",
     "http://127.0.0.1:5500",
@@ -60,9 +65,6 @@ app.add_middleware(
     allow_headers=["*"], # Allow all headers, including Authorization
 )
 
-# Add custom middleware
-app.add_middleware(UserAgentMiddleware)
-
 # Include routers
 app.include_router(users.router)
 app.include_router(listings.router) # Changed from 'applications' to 'listings'
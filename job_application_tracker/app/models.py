@@ -1,5 +1,6 @@
-from typing import Optional, List
-from datetime import date
+from typing import Dict, Literal, Optional, List
+from datetime import date, datetime
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel, Relationship
 
 # User model with a role
@@ -28,6 +29,15 @@ class JobListing(SQLModel, table=True):
 
 # Model for a user's specific application
 class JobApplication(SQLModel, table=True):
+    # One application per user and listing, enforced by the database
+    __table_args__ = (
+        Index("ix_jobapplication_user_id_listing_id", "user_id", "listing_id", unique=True),
+        # Admin filters; with the rowid (id) trailing both, each can be read
+        # newest first (date_applied, id descending) without a sort
+        Index("ix_jobapplication_listing_id_status", "listing_id", "status", "date_applied"),
+        Index("ix_jobapplication_date_applied", "date_applied"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     status: str = Field(default="pending")
     date_applied: date = Field(default_factory=date.today)
@@ -40,6 +50,42 @@ class JobApplication(SQLModel, table=True):
     listing_id: Optional[int] = Field(default=None, foreign_key="joblisting.id")
     listing: Optional["JobListing"] = Relationship(back_populates="applications")
 
+# Append-only history of status changes (see app/workflow.py); also the
+# replay log for the per-user event stream, so event ids are these ids
+class ApplicationEvent(SQLModel, table=True):
+    __table_args__ = (Index("ix_applicationevent_user_id_id", "user_id", "id"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    application_id: int = Field(foreign_key="jobapplication.id", index=True)
+    user_id: Optional[int] = Field(default=None, foreign_key="user.id")
+    # Not a foreign key: the history outlives a deleted listing
+    listing_id: Optional[int] = None
+    from_status: str
+    to_status: str
+    changed_by: Optional[int] = Field(default=None, foreign_key="user.id")
+    changed_at: datetime = Field(default_factory=datetime.utcnow)
+
+# Application counts kept up to date by every apply (see app/stats.py)
+class ListingStatusCount(SQLModel, table=True):
+    listing_id: int = Field(primary_key=True)
+    status: str = Field(primary_key=True)
+    applications: int = 0
+
+class ListingApplicationCount(SQLModel, table=True):
+    # Busiest listings first, read straight off the index
+    __table_args__ = (Index("ix_listingapplicationcount_applications_listing_id", "applications", "listing_id"),)
+
+    listing_id: int = Field(primary_key=True)
+    applications: int = 0
+
+class StatusApplicationCount(SQLModel, table=True):
+    status: str = Field(primary_key=True)
+    applications: int = 0
+
+class DailyApplications(SQLModel, table=True):
+    day: date = Field(primary_key=True)
+    applications: int = 0
+
 # Pydantic schemas for request/response validation
 class UserCreate(SQLModel):
     username: str
@@ -56,4 +102,47 @@ class JobListingCreate(SQLModel):
     description: Optional[str] = None
 
 class JobApplicationCreate(SQLModel):
-    listing_id: int
\ No newline at end of file
+    listing_id: int
+
+class BulkApplicationCreate(SQLModel):
+    listing_ids: List[int] = Field(min_length=1, max_length=100)
+
+class BulkApplicationResult(SQLModel):
+    listing_id: int
+    outcome: str  # "applied", "already_applied" or "not_found"
+    application_id: Optional[int] = None
+
+ApplicationStatus = Literal["pending", "reviewing", "interviewing", "offered", "hired", "rejected", "withdrawn"]
+
+class StatusTransition(SQLModel):
+    status: ApplicationStatus
+
+class BulkStatusTransition(SQLModel):
+    application_ids: List[int] = Field(min_length=1, max_length=1000)
+    status: ApplicationStatus
+
+class StatusTransitionResult(SQLModel):
+    application_id: int
+    outcome: str  # "updated", "unchanged", "invalid_transition", "conflict" or "not_found"
+    status: Optional[str] = None  # The application's status afterwards
+
+class StatusCount(SQLModel):
+    status: str
+    applications: int
+
+class ListingStats(SQLModel):
+    listing_id: int
+    company: Optional[str] = None
+    position: Optional[str] = None
+    applications: int
+    by_status: Dict[str, int]
+
+class DailyVolume(SQLModel):
+    day: date
+    applications: int
+
+class ApplicationStats(SQLModel):
+    total: int
+    by_status: List[StatusCount]
+    by_listing: List[ListingStats]
+    daily: List[DailyVolume]
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import os
+import threading
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
+
+from app.models import ApplicationEvent
+
+# Events a subscriber may fall behind before it is disconnected
+SUBSCRIBER_QUEUE = int(os.getenv("NOTIFICATIONS_QUEUE", "100"))
+# Most missed events replayed on reconnect; past that, a reset is sent
+MAX_REPLAY = int(os.getenv("NOTIFICATIONS_MAX_REPLAY", "500"))
+# Comment line sent on idle streams so proxies keep them open
+KEEPALIVE_INTERVAL = 15.0
+
+RESET_EVENT = b"event: reset\ndata: {}\n\n"
+
+
+def format_event(event: ApplicationEvent) -> bytes:
+    data = json.dumps({
+        "application_id": event.application_id,
+        "listing_id": event.listing_id,
+        "from_status": event.from_status,
+        "to_status": event.to_status,
+        "changed_at": event.changed_at.isoformat(),
+    }, separators=(",", ":"))
+    return f"id: {event.id}\nevent: status\ndata: {data}\n\n".encode()
+
+
+class Subscriber:
+    __slots__ = ("user_id", "queue", "dropped")
+
+    def __init__(self, user_id: int, max_events: int):
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[Tuple[int, bytes]]" = asyncio.Queue(max_events)
+        # Fell behind; the stream ends once the queue is drained
+        self.dropped = False
+
+
+class NotificationBroker:
+    """
+    In-process, per-user fan-out of application status changes.
+
+    Writers call `publish` from any thread after they commit; each event
+    goes only to the streams of the user whose application changed. Event
+    ids are ApplicationEvent ids, so a client reconnecting with
+    Last-Event-ID is sent what it missed straight from the event table,
+    even across restarts; one that missed more than MAX_REPLAY gets a
+    `reset` event telling it to reload its applications. A subscriber
+    whose queue fills up is disconnected rather than slowing the others.
+
+    Live delivery reaches only the streams held by the worker that made
+    the change, so with several workers a client misses transitions made
+    elsewhere until it reconnects; replay reads the shared event table, so
+    reconnecting to any worker catches it up.
+    """
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE):
+        self.queue_size = queue_size
+        self.events_delivered = 0
+        self.subscribers_dropped = 0
+        self._subscribers: Dict[int, Set[Subscriber]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def publish(self, events: Iterable[ApplicationEvent]) -> None:
+        """Sends committed events to their users' streams. Callable from any thread."""
+        with self._lock:
+            loop = self._loop
+            batch = [(event.user_id, event.id, format_event(event)) for event in events if event.user_id in self._subscribers]
+        if batch and loop is not None:
+            loop.call_soon_threadsafe(self._deliver, batch)
+
+    def _deliver(self, batch: List[Tuple[int, int, bytes]]) -> None:
+        with self._lock:
+            for user_id, event_id, event in batch:
+                for subscriber in list(self._subscribers.get(user_id, ())):
+                    try:
+                        subscriber.queue.put_nowait((event_id, event))
+                    except asyncio.QueueFull:
+                        subscriber.dropped = True
+                        self._remove(subscriber)
+                        self.subscribers_dropped += 1
+                self.events_delivered += 1
+
+    def _remove(self, subscriber: Subscriber) -> None:
+        subscribers = self._subscribers.get(subscriber.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.user_id]
+
+    def subscribe(self, user_id: int) -> Subscriber:
+        """Registers a stream for the user. Event loop only."""
+        subscriber = Subscriber(user_id, self.queue_size)
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            self._remove(subscriber)
+
+    async def stream(self, engine: Engine, user_id: int, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """The body of one SSE response."""
+        # Subscribed before reading the backlog, so nothing committed in
+        # between is missed; events in both are sent once
+        subscriber = self.subscribe(user_id)
+        try:
+            yield b"retry: 3000\n\n"
+            # Live events up to here were already sent from the backlog
+            replayed_until = 0
+            if last_event_id is not None:
+                backlog = None
+                if last_event_id.isdigit():
+                    backlog = await run_in_threadpool(missed_events, engine, user_id, int(last_event_id))
+                if backlog is None:
+                    yield RESET_EVENT
+                else:
+                    replayed_until = backlog[-1].id if backlog else int(last_event_id)
+                    for event in backlog:
+                        yield format_event(event)
+            while not (subscriber.dropped and subscriber.queue.empty()):
+                try:
+                    event_id, event = await asyncio.wait_for(subscriber.queue.get(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if event_id > replayed_until:
+                    yield event
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "users": len(self._subscribers),
+                "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values()),
+                "events_delivered": self.events_delivered,
+                "subscribers_dropped": self.subscribers_dropped,
+            }
+
+
+def missed_events(engine: Engine, user_id: int, after: int) -> Optional[List[ApplicationEvent]]:
+    """The user's events after `after`, oldest first, or None if there are more than MAX_REPLAY."""
+    with Session(engine) as session:
+        events = session.exec(
+            select(ApplicationEvent)
+            .where(ApplicationEvent.user_id == user_id, ApplicationEvent.id > after)
+            .order_by(ApplicationEvent.id)
+            .limit(MAX_REPLAY + 1)
+        ).all()
+    return None if len(events) > MAX_REPLAY else list(events)
+
+
+notification_broker = NotificationBroker()
+
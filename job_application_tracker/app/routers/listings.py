@@ -1,35 +1,118 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import List, Optional
+import json
+from datetime import date, timedelta
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select as sa_select, tuple_
 from sqlmodel import Session, select
 
-from app.database import get_session
-from app.models import JobListing, JobListingCreate, JobApplication, JobApplicationCreate, User
+from app.applications import apply, apply_bulk, listing_exists
+from app.database import engine, get_session
+from app.listing_cache import listing_cache
+from app.notifications import notification_broker
+from app.models import (
+    JobListing, JobListingCreate, JobApplication, JobApplicationCreate, BulkApplicationCreate, BulkApplicationResult,
+    ApplicationEvent, StatusTransition, BulkStatusTransition, StatusTransitionResult, ApplicationStats, User
+)
+from app.search import search_listings
 from app.security import get_current_user, get_current_admin
+from app.stats import application_stats, forget_listing
+from app.workflow import transition_application, transition_applications
 
 router = APIRouter(prefix="/listings", tags=["listings"])
 
-### Public Endpoints ###
-@router.get("/", response_model=List[JobListing], description="Retrieves all public job listings. No authentication required.")
-def get_all_listings(session: Session = Depends(get_session)):
-    """Retrieves all public job listings."""
-    listings = session.exec(select(JobListing)).all()
-    return listings
+# Fields a listing page can be projected to, in output order
+LISTING_FIELDS = {
+    "id": JobListing.id,
+    "company": JobListing.company,
+    "position": JobListing.position,
+    "description": JobListing.description,
+    "creator_id": JobListing.creator_id,
+}
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """Validates a comma-separated field list; the id is always included, as it is the cursor."""
+    if not fields:
+        return list(LISTING_FIELDS)
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - LISTING_FIELDS.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}. Choose from: {', '.join(LISTING_FIELDS)}."
+        )
+    return [field for field in LISTING_FIELDS if field in requested or field == "id"]
 
-@router.get("/search", response_model=List[JobListing], description="Searches for job listings by position or company. No authentication required.")
-def search_listings(
-    position: Optional[str] = Query(None, description="Search by job position"),
-    company: Optional[str] = Query(None, description="Search by company name"),
+def parse_application_cursor(after: Optional[str]) -> Optional[Tuple[date, int]]:
+    """Reads an `X-Next-Cursor` of the applications list: the last row's date_applied and id."""
+    if after is None:
+        return None
+    day, _, application_id = after.partition(":")
+    try:
+        return date.fromisoformat(day), int(application_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid `after` cursor.")
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    return any(tag.strip().removeprefix("W/") in (etag, "*") for tag in if_none_match.split(","))
+
+### Public Endpoints ###
+@router.get("/", response_model=List[JobListing], description="Retrieves public job listings, newest first, one page at a time. No authentication required.")
+def get_all_listings(
+    request: Request,
+    after: Optional[int] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    limit: int = Query(50, ge=1, le=200),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. `id,company,position`"),
     session: Session = Depends(get_session)
 ):
-    """Searches for job listings by position or company."""
-    query = select(JobListing)
+    """
+    Retrieves public job listings, newest first, keyset-paginated on the id.
+    The next page's cursor is returned in the `X-Next-Cursor` header. Pages
+    are served from the in-process listing cache.
+    """
+    selected = parse_fields(fields)
 
-    if position:
-        query = query.where(JobListing.position.like(f"%{position}%"))
-    if company:
-        query = query.where(JobListing.company.like(f"%{company}%"))
+    def load() -> Tuple[bytes, Dict[str, str]]:
+        query = sa_select(*[LISTING_FIELDS[field] for field in selected]).order_by(JobListing.id.desc()).limit(limit)
+        if after is not None:
+            query = query.where(JobListing.id < after)
+        rows = session.connection().execute(query).all()
+        headers = {}
+        if len(rows) == limit:
+            headers["X-Next-Cursor"] = str(rows[-1].id)
+        return json.dumps([dict(row._mapping) for row in rows], separators=(",", ":")).encode(), headers
 
-    listings = session.exec(query).all()
+    page = listing_cache.get_or_load(("feed", after, limit, tuple(selected)), load)
+    headers = {**page.headers, "ETag": page.etag, "Cache-Control": f"public, max-age={int(listing_cache.ttl)}"}
+    if etag_matches(request.headers.get("if-none-match"), page.etag):
+        listing_cache.record_not_modified()
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=page.body, media_type="application/json", headers=headers)
+
+@router.get("/search", response_model=List[JobListing], description="Full-text search over job listings. No authentication required.")
+def search_job_listings(
+    response: Response,
+    q: Optional[str] = Query(None, max_length=200, description="Words to find in the company, position or description"),
+    position: Optional[str] = Query(None, max_length=200, description="Search by job position"),
+    company: Optional[str] = Query(None, max_length=200, description="Search by company name"),
+    prefix: bool = Query(True, description="Treat the last word of each field as a prefix (search-as-you-type)"),
+    limit: int = Query(50, ge=1, le=200),
+    after: Optional[str] = Query(None, max_length=64, description="Cursor from the X-Next-Cursor header of the previous page"),
+    session: Session = Depends(get_session)
+):
+    """
+    Searches job listings by words in any field (`q`) and/or in the position
+    or company. Every word must match; best matches come first. The next
+    page's cursor is returned in the `X-Next-Cursor` header.
+    """
+    try:
+        listings, next_cursor = search_listings(session, q, position, company, limit, after, prefix)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid `after` cursor.")
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
     return listings
 
 ### User-Specific Endpoints ###
@@ -39,29 +122,30 @@ def apply_to_listing(
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
 ):
-    """Allows an authenticated user to apply to a job listing."""
-    listing = session.get(JobListing, application_data.listing_id)
-    if not listing:
-        raise HTTPException(status_code=404, detail="Job listing not found.")
-    
-    # Check if the user has already applied to this listing
-    existing_application = session.exec(
-        select(JobApplication).where(
-            JobApplication.user_id == current_user.id,
-            JobApplication.listing_id == application_data.listing_id
-        )
-    ).first()
-    if existing_application:
+    """
+    Allows an authenticated user to apply to a job listing. The existence
+    and duplicate checks run inside the INSERT itself, so a second
+    application to the same listing gets a 409 even under concurrency.
+    """
+    application = apply(session, current_user.id, application_data.listing_id)
+    if application is None:
+        if not listing_exists(session, application_data.listing_id):
+            raise HTTPException(status_code=404, detail="Job listing not found.")
         raise HTTPException(status_code=409, detail="You have already applied to this listing.")
+    return application
 
-    new_application = JobApplication(
-        user_id=current_user.id,
-        listing_id=application_data.listing_id
-    )
-    session.add(new_application)
-    session.commit()
-    session.refresh(new_application)
-    return new_application
+@router.post("/apply/bulk", response_model=List[BulkApplicationResult], description="Applies to many job listings at once.")
+def apply_to_listings_bulk(
+    applications_data: BulkApplicationCreate,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """
+    Applies the authenticated user to up to 100 listings in one transaction
+    and returns, per listing, whether it was `applied`, `already_applied` or
+    `not_found`.
+    """
+    return apply_bulk(session, current_user.id, applications_data.listing_ids)
 
 @router.get("/my-applications", response_model=List[JobApplication], description="Retrieves all job applications for the authenticated user.")
 def get_my_applications(
@@ -74,6 +158,41 @@ def get_my_applications(
     ).all()
     return applications
 
+@router.get("/my-applications/events", summary="Live status changes of your applications (Server-Sent Events)")
+async def stream_my_application_events(
+    last_event_id: Optional[str] = Header(None, max_length=20),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Streams status changes of the authenticated user's applications as
+    Server-Sent Events, instead of polling `/listings/my-applications`.
+
+    Each `status` event carries one change, e.g. `{"application_id": 7,
+    "listing_id": 3, "from_status": "pending", "to_status": "reviewing",
+    "changed_at": "..."}`. Reconnecting with Last-Event-ID resumes where the
+    client left off; a `reset` event means it missed too much and should
+    reload its applications.
+    """
+    return StreamingResponse(
+        notification_broker.stream(engine, current_user.id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/applications/{application_id}/events", response_model=List[ApplicationEvent], description="Status history of an application.")
+def get_application_events(
+    application_id: int,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """Returns every status change of an application, oldest first, to its applicant or an admin."""
+    application = session.get(JobApplication, application_id)
+    if not application or (application.user_id != current_user.id and current_user.role != "admin"):
+        raise HTTPException(status_code=404, detail="Application not found.")
+    return session.exec(
+        select(ApplicationEvent).where(ApplicationEvent.application_id == application_id).order_by(ApplicationEvent.id)
+    ).all()
+
 ### Admin-Only Endpoints ###
 @router.post(
         "/", 
@@ -94,6 +213,7 @@ def create_listing(
     )
     session.add(listing)
     session.commit()
+    listing_cache.bump()
     session.refresh(listing)
     return listing
 
@@ -118,6 +238,7 @@ def update_listing(
     
     session.add(listing)
     session.commit()
+    listing_cache.bump()
     session.refresh(listing)
     return listing
 
@@ -137,17 +258,150 @@ def delete_listing(
         raise HTTPException(status_code=404, detail="Listing not found.")
     
     session.delete(listing)
+    forget_listing(session, listing_id)
     session.commit()
+    listing_cache.bump()
     return
 
+@router.get(
+        "/cache/stats",
+        summary="Listing cache metrics (Admin Only)")
+def get_listing_cache_stats(current_admin: User = Depends(get_current_admin)):
+    """Returns the hit ratio, 304 and invalidation counters of the listing cache."""
+    return listing_cache.stats()
+
+def filtered_applications(
+    session: Session,
+    status: Optional[str] = None,
+    listing_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    after: Optional[Tuple[date, int]] = None,
+    limit: int = 100
+) -> List[JobApplication]:
+    """
+    One page of applications matching the filters, newest first (by
+    date_applied, then id), keyset-paginated after `after`, the
+    (date_applied, id) of the previous page's last row; holding both keeps
+    the cursor valid if that application is deleted. Listing and status
+    filters are served by ix_jobapplication_listing_id_status, date ranges
+    by ix_jobapplication_date_applied; both are read in page order.
+    """
+    query = select(JobApplication)
+    if status is not None:
+        query = query.where(JobApplication.status == status)
+    if listing_id is not None:
+        query = query.where(JobApplication.listing_id == listing_id)
+    if date_from is not None:
+        query = query.where(JobApplication.date_applied >= date_from)
+    if date_to is not None:
+        query = query.where(JobApplication.date_applied <= date_to)
+    if after is not None:
+        query = query.where(tuple_(JobApplication.date_applied, JobApplication.id) < tuple_(*after))
+    return session.exec(
+        query.order_by(JobApplication.date_applied.desc(), JobApplication.id.desc()).limit(limit)
+    ).all()
+
 @router.get(
         "/all-applications",
         response_model=List[JobApplication],
         summary="View all job applications (Admin Only)")
 def get_all_applications(
+    response: Response,
+    status_filter: Optional[str] = Query(None, alias="status", description="Only applications with this status"),
+    listing_id: Optional[int] = Query(None, description="Only applications to this listing"),
+    date_from: Optional[date] = Query(None, description="Applied on or after this day"),
+    date_to: Optional[date] = Query(None, description="Applied on or before this day"),
+    after: Optional[str] = Query(None, max_length=32, description="Cursor from the X-Next-Cursor header of the previous page"),
+    limit: int = Query(100, ge=1, le=1000),
+    current_admin: User = Depends(get_current_admin),
+    session: Session = Depends(get_session)
+):
+    """
+    Allows an admin to view job applications from all users, newest first,
+    filtered and one page at a time. The next page's cursor is returned in
+    the `X-Next-Cursor` header.
+    """
+    cursor = parse_application_cursor(after)
+    applications = filtered_applications(session, status_filter, listing_id, date_from, date_to, cursor, limit)
+    if len(applications) == limit:
+        last = applications[-1]
+        response.headers["X-Next-Cursor"] = f"{last.date_applied.isoformat()}:{last.id}"
+    return applications
+
+@router.patch(
+        "/applications/{application_id}/status",
+        response_model=JobApplication,
+        summary="Change an application's status (Admin Only)")
+def update_application_status(
+    application_id: int,
+    transition: StatusTransition,
+    current_admin: User = Depends(get_current_admin),
+    session: Session = Depends(get_session)
+):
+    """
+    Moves an application to a new status, if the workflow allows it:
+    pending -> reviewing -> interviewing -> offered -> hired, with rejected
+    and withdrawn reachable until the end. The change is recorded and
+    pushed to the applicant.
+    """
+    result = transition_application(session, application_id, transition.status, current_admin.id)
+    if result.outcome == "not_found":
+        raise HTTPException(status_code=404, detail="Application not found.")
+    if result.outcome == "invalid_transition":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Cannot move an application from '{result.status}' to '{transition.status}'."
+        )
+    if result.outcome == "conflict":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="The application was changed by another request. Reload it and try again."
+        )
+    return session.get(JobApplication, application_id)
+
+@router.post(
+        "/applications/status/bulk",
+        response_model=List[StatusTransitionResult],
+        summary="Change the status of many applications (Admin Only)")
+def update_application_status_bulk(
+    transition: BulkStatusTransition,
+    current_admin: User = Depends(get_current_admin),
+    session: Session = Depends(get_session)
+):
+    """
+    Moves up to 1000 applications to a new status in one transaction and
+    returns, per application, whether it was `updated`, `unchanged`, an
+    `invalid_transition`, a `conflict` with a concurrent change, or
+    `not_found`.
+    """
+    return transition_applications(session, transition.application_ids, transition.status, current_admin.id)
+
+@router.get(
+        "/notifications/stats",
+        summary="Application event stream metrics (Admin Only)")
+def get_notification_stats(current_admin: User = Depends(get_current_admin)):
+    """Returns the number of connected streams and events delivered."""
+    return notification_broker.stats()
+
+@router.get(
+        "/stats",
+        response_model=ApplicationStats,
+        summary="Application counts per listing, status and day (Admin Only)")
+def get_application_stats(
+    date_from: Optional[date] = Query(None, description="First day of the daily volume (default: 29 days before `date_to`)"),
+    date_to: Optional[date] = Query(None, description="Last day of the daily volume, inclusive (default: today)"),
+    listing_id: Optional[int] = Query(None, description="Only count applications to this listing"),
+    limit: int = Query(20, ge=1, le=100, description="Listings returned, most applications first"),
     current_admin: User = Depends(get_current_admin),
     session: Session = Depends(get_session)
 ):
-    """Allows an admin to view all job applications from all users."""
-    applications = session.exec(select(JobApplication)).all()
-    return applications
\ No newline at end of file
+    """
+    Returns application counts per status and for the busiest listings (with
+    their per-status breakdown), and the number of applications per day.
+    """
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="`date_from` must not be after `date_to`.")
+    return application_stats(session, date_from, date_to, listing_id, limit)
@@ -0,0 +1,159 @@
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from app.models import JobListing
+
+# External-content FTS5 index over joblisting(company, position, description).
+# The text lives only in the joblisting table; joblisting_fts stores the
+# inverted index, and the triggers keep it in step with every
+# INSERT/UPDATE/DELETE, whichever code path issues them.
+SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS joblisting_fts USING fts5(
+        company, position, description,
+        content='joblisting', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3 4'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS joblisting_fts_ai AFTER INSERT ON joblisting BEGIN
+        INSERT INTO joblisting_fts(rowid, company, position, description)
+        VALUES (new.id, new.company, new.position, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS joblisting_fts_ad AFTER DELETE ON joblisting BEGIN
+        INSERT INTO joblisting_fts(joblisting_fts, rowid, company, position, description)
+        VALUES ('delete', old.id, old.company, old.position, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS joblisting_fts_au AFTER UPDATE OF company, position, description ON joblisting BEGIN
+        INSERT INTO joblisting_fts(joblisting_fts, rowid, company, position, description)
+        VALUES ('delete', old.id, old.company, old.position, old.description);
+        INSERT INTO joblisting_fts(rowid, company, position, description)
+        VALUES (new.id, new.company, new.position, new.description);
+    END
+    """,
+]
+
+# Column weights for bm25(): a hit in the position counts most, one in the
+# description least
+COMPANY_WEIGHT = 5.0
+POSITION_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+# Every match is ranked (FTS5 ORDER BY rank, ties newest first) and pages
+# are keyset-paginated on (rank, rowid): the cursor is the last row's score
+# and id, so any page costs the same and no match is out of reach.
+SEARCH_SQL = text("""
+    WITH page AS (
+        SELECT rowid AS id, rank AS score
+        FROM joblisting_fts
+        WHERE joblisting_fts MATCH :match
+          AND (rank > :after_score OR (rank = :after_score AND rowid < :after_id))
+        ORDER BY rank, rowid DESC
+        LIMIT :limit
+    )
+    SELECT p.score, l.id, l.company, l.position, l.description, l.creator_id
+    FROM page AS p
+    JOIN joblisting AS l ON l.id = p.id
+    ORDER BY p.score, p.id DESC
+""")
+
+# unicode61 treats letters and digits as token characters; "_" separates
+TERM_PATTERN = re.compile(r"[^\W_]+\*?")
+
+
+def create_search_index(engine: Engine) -> None:
+    """
+    Creates the FTS table and its sync triggers if they are missing. When the
+    table is new, it is filled from the existing listings in one pass.
+    """
+    with engine.begin() as conn:
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'joblisting_fts'"
+        ).first()
+        for statement in SEARCH_DDL:
+            conn.exec_driver_sql(statement)
+        conn.exec_driver_sql(
+            "INSERT INTO joblisting_fts(joblisting_fts, rank) "
+            f"VALUES ('rank', 'bm25({COMPANY_WEIGHT}, {POSITION_WEIGHT}, {DESCRIPTION_WEIGHT})')"
+        )
+        if not exists:
+            conn.exec_driver_sql("INSERT INTO joblisting_fts(joblisting_fts) VALUES ('rebuild')")
+
+
+def match_phrases(text_in: str, prefix: bool) -> List[str]:
+    """
+    Quotes every word of `text_in` so FTS5 operators in user input are read
+    as plain text. A word ending in `*` is a prefix; with `prefix` the last
+    word is one too, which suits search-as-you-type.
+    """
+    terms = TERM_PATTERN.findall(text_in)
+    phrases = []
+    for i, term in enumerate(terms):
+        phrase = f'"{term.rstrip("*")}"'
+        if term.endswith("*") or (prefix and i == len(terms) - 1):
+            phrase += "*"
+        phrases.append(phrase)
+    return phrases
+
+
+def build_match(
+    q: Optional[str] = None,
+    position: Optional[str] = None,
+    company: Optional[str] = None,
+    prefix: bool = True,
+) -> Optional[str]:
+    """
+    Builds one FTS5 MATCH expression requiring every word: words of `q` may
+    be in any column, words of `position` / `company` only in that column.
+    Returns None when there are no words to search for.
+    """
+    clauses = match_phrases(q or "", prefix)
+    for column, value in (("position", position), ("company", company)):
+        phrases = match_phrases(value or "", prefix)
+        if phrases:
+            clauses.append(f"{column} : ({' '.join(phrases)})")
+    return " AND ".join(clauses) or None
+
+
+def search_listings(
+    session: Session,
+    q: Optional[str] = None,
+    position: Optional[str] = None,
+    company: Optional[str] = None,
+    limit: int = 50,
+    after: Optional[str] = None,
+    prefix: bool = True,
+) -> Tuple[List[JobListing], Optional[str]]:
+    """
+    Returns one page of listings matching every word given, best BM25 match
+    first (ties newest first), and the cursor of the next page (None on the
+    last one). With no words at all, pages through the newest listings.
+    Raises ValueError for a cursor this search could not have returned.
+    """
+    match = build_match(q, position, company, prefix)
+    if match is None:
+        query = select(JobListing).order_by(JobListing.id.desc()).limit(limit)
+        if after is not None:
+            query = query.where(JobListing.id < int(after))
+        listings = session.exec(query).all()
+        return listings, str(listings[-1].id) if len(listings) == limit else None
+
+    after_score, after_id = float("-inf"), 0
+    if after is not None:
+        score, _, listing_id = after.rpartition(":")
+        after_score, after_id = float(score), int(listing_id)
+    rows = session.connection().execute(SEARCH_SQL, {
+        "match": match, "limit": limit, "after_score": after_score, "after_id": after_id
+    }).all()
+    listings = [JobListing.model_validate(row._mapping) for row in rows]
+    # repr() round-trips the float exactly, so the next page starts right after this row
+    return listings, f"{rows[-1].score!r}:{rows[-1].id}" if len(rows) == limit else None
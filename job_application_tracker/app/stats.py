@@ -0,0 +1,220 @@
+from collections import Counter
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import delete, text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from app.models import (
+    ApplicationStats, DailyApplications, DailyVolume, JobApplication, JobListing, ListingApplicationCount, ListingStats,
+    ListingStatusCount, StatusApplicationCount, StatusCount
+)
+
+
+def _counter_upsert(model, *keys: str):
+    """Core upsert adding `applications` to the row with these keys, so a batch is one executemany."""
+    table = model.__table__
+    statement = insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c[key] for key in keys],
+        set_={"applications": table.c.applications + statement.excluded.applications}
+    )
+
+upsert_listing_status = _counter_upsert(ListingStatusCount, "listing_id", "status")
+upsert_listing = _counter_upsert(ListingApplicationCount, "listing_id")
+upsert_status = _counter_upsert(StatusApplicationCount, "status")
+upsert_day = _counter_upsert(DailyApplications, "day")
+
+COUNT_TABLES = ["listingstatuscount", "listingapplicationcount", "statusapplicationcount", "dailyapplications"]
+
+REBUILD_SQL = [f"DELETE FROM {table}" for table in COUNT_TABLES] + [
+    """
+    INSERT INTO listingstatuscount (listing_id, status, applications)
+    SELECT listing_id, status, count(*) FROM jobapplication
+    WHERE listing_id IS NOT NULL
+    GROUP BY listing_id, status
+    """,
+    """
+    INSERT INTO listingapplicationcount (listing_id, applications)
+    SELECT listing_id, sum(applications) FROM listingstatuscount GROUP BY listing_id
+    """,
+    """
+    INSERT INTO statusapplicationcount (status, applications)
+    SELECT status, count(*) FROM jobapplication GROUP BY status
+    """,
+    """
+    INSERT INTO dailyapplications (day, applications)
+    SELECT date_applied, count(*) FROM jobapplication GROUP BY date_applied
+    """,
+]
+
+
+def record_applications(session: Session, applications: Iterable[JobApplication]) -> None:
+    """
+    Adds new applications to the counts. Called inside the transaction that
+    inserts them, so the counts commit (or roll back) with the applications.
+    """
+    by_listing_status: Dict[Tuple[int, str], int] = Counter()
+    by_status: Dict[str, int] = Counter()
+    by_day: Dict[date, int] = Counter()
+    for application in applications:
+        if application.listing_id is not None:
+            by_listing_status[(application.listing_id, application.status)] += 1
+        by_status[application.status] += 1
+        by_day[application.date_applied] += 1
+    if not by_day:
+        return
+
+    by_listing: Dict[int, int] = Counter()
+    for (listing_id, _), count in by_listing_status.items():
+        by_listing[listing_id] += count
+
+    connection = session.connection()
+    if by_listing_status:
+        connection.execute(upsert_listing_status, [
+            {"listing_id": listing_id, "status": status, "applications": count}
+            for (listing_id, status), count in by_listing_status.items()
+        ])
+        connection.execute(upsert_listing, [
+            {"listing_id": listing_id, "applications": count} for listing_id, count in by_listing.items()
+        ])
+    connection.execute(upsert_status, [{"status": status, "applications": count} for status, count in by_status.items()])
+    connection.execute(upsert_day, [{"day": day, "applications": count} for day, count in by_day.items()])
+
+
+def record_status_changes(session: Session, changes: Iterable[Tuple[Optional[int], str, str]]) -> None:
+    """
+    Moves applications between statuses in the counts, given one
+    (listing_id, from_status, to_status) per changed application. Called
+    inside the transaction that changes them.
+    """
+    by_listing_status: Dict[Tuple[int, str], int] = Counter()
+    by_status: Dict[str, int] = Counter()
+    for listing_id, from_status, to_status in changes:
+        if listing_id is not None:
+            by_listing_status[(listing_id, from_status)] -= 1
+            by_listing_status[(listing_id, to_status)] += 1
+        by_status[from_status] -= 1
+        by_status[to_status] += 1
+    if not by_status:
+        return
+
+    connection = session.connection()
+    if by_listing_status:
+        connection.execute(upsert_listing_status, [
+            {"listing_id": listing_id, "status": status, "applications": count}
+            for (listing_id, status), count in by_listing_status.items()
+        ])
+    connection.execute(upsert_status, [{"status": status, "applications": count} for status, count in by_status.items()])
+
+
+def forget_listing(session: Session, listing_id: int) -> None:
+    """
+    Drops a deleted listing from the per-listing counts. Its applications
+    stay (unlinked), so the per-status and daily totals keep them.
+    """
+    connection = session.connection()
+    for model in (ListingStatusCount, ListingApplicationCount):
+        connection.execute(delete(model).where(model.listing_id == listing_id))
+
+
+def rebuild_application_stats(engine: Engine) -> None:
+    """
+    Recomputes the counts from JobApplication in one transaction; the first
+    DELETE makes it SQLite's writer, so no apply can land in between.
+    """
+    with engine.begin() as conn:
+        for statement in REBUILD_SQL:
+            conn.exec_driver_sql(statement)
+
+
+def backfill_application_stats(engine: Engine) -> None:
+    """Fills the counts on first start against a database that already has applications."""
+    with Session(engine) as session:
+        has_applications = session.exec(select(JobApplication.id).limit(1)).first() is not None
+        has_counts = session.exec(select(DailyApplications.day).limit(1)).first() is not None
+    if has_applications and not has_counts:
+        rebuild_application_stats(engine)
+
+
+def application_stats(
+    session: Session,
+    date_from: date,
+    date_to: date,
+    listing_id: Optional[int] = None,
+    limit: int = 20,
+) -> ApplicationStats:
+    """
+    Application counts per status and for the `limit` busiest listings
+    (or just `listing_id`), plus daily volume over [date_from, date_to].
+    Everything is read from the counts tables, whose size depends on the
+    number of listings and days, not applications.
+    """
+    if listing_id is None:
+        status_query = select(StatusApplicationCount.status, StatusApplicationCount.applications)
+        top_query = (
+            select(ListingApplicationCount.listing_id, ListingApplicationCount.applications)
+            .order_by(ListingApplicationCount.applications.desc(), ListingApplicationCount.listing_id.desc())
+            .limit(limit)
+        )
+    else:
+        status_query = (
+            select(ListingStatusCount.status, ListingStatusCount.applications)
+            .where(ListingStatusCount.listing_id == listing_id)
+        )
+        top_query = (
+            select(ListingApplicationCount.listing_id, ListingApplicationCount.applications)
+            .where(ListingApplicationCount.listing_id == listing_id)
+        )
+
+    by_status = [
+        StatusCount(status=status, applications=count)
+        for status, count in session.exec(status_query.order_by(text("status"))).all()
+        if count
+    ]
+
+    top = session.exec(top_query).all()
+    listing_ids = [row_listing_id for row_listing_id, _ in top]
+    breakdowns: Dict[int, Dict[str, int]] = {row_listing_id: {} for row_listing_id in listing_ids}
+    for row_listing_id, status, count in session.exec(
+        select(ListingStatusCount.listing_id, ListingStatusCount.status, ListingStatusCount.applications)
+        .where(ListingStatusCount.listing_id.in_(listing_ids))
+        .order_by(ListingStatusCount.listing_id, ListingStatusCount.status)
+    ).all():
+        if count:
+            breakdowns[row_listing_id][status] = count
+    details = {
+        row_listing_id: (company, position)
+        for row_listing_id, company, position in session.exec(
+            select(JobListing.id, JobListing.company, JobListing.position).where(JobListing.id.in_(listing_ids))
+        ).all()
+    }
+    by_listing = [
+        ListingStats(
+            listing_id=row_listing_id,
+            company=details.get(row_listing_id, (None, None))[0],
+            position=details.get(row_listing_id, (None, None))[1],
+            applications=total,
+            by_status=breakdowns[row_listing_id],
+        )
+        for row_listing_id, total in top
+    ]
+
+    daily = [
+        DailyVolume(day=day, applications=count)
+        for day, count in session.exec(
+            select(DailyApplications.day, DailyApplications.applications)
+            .where(DailyApplications.day >= date_from, DailyApplications.day <= date_to)
+            .order_by(DailyApplications.day)
+        ).all()
+    ]
+
+    return ApplicationStats(
+        total=sum(item.applications for item in by_status),
+        by_status=by_status,
+        by_listing=by_listing,
+        daily=daily,
+    )
+
@@ -0,0 +1,127 @@
+from datetime import datetime
+from typing import Dict, FrozenSet, List
+
+from sqlalchemy import insert, update
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from app.models import ApplicationEvent, JobApplication, StatusTransitionResult
+from app.notifications import notification_broker
+from app.stats import record_status_changes
+
+# The status an application may move to from each status; hired, rejected
+# and withdrawn are final
+TRANSITIONS: Dict[str, FrozenSet[str]] = {
+    "pending": frozenset({"reviewing", "rejected", "withdrawn"}),
+    "reviewing": frozenset({"interviewing", "offered", "rejected", "withdrawn"}),
+    "interviewing": frozenset({"offered", "rejected", "withdrawn"}),
+    "offered": frozenset({"hired", "rejected", "withdrawn"}),
+    "hired": frozenset(),
+    "rejected": frozenset(),
+    "withdrawn": frozenset(),
+}
+
+# The event table is append-only: the database refuses to change or remove
+# a recorded transition, whichever code path tries
+EVENT_LOG_DDL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS applicationevent_no_update BEFORE UPDATE ON applicationevent BEGIN
+        SELECT RAISE(ABORT, 'applicationevent is append-only');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS applicationevent_no_delete BEFORE DELETE ON applicationevent BEGIN
+        SELECT RAISE(ABORT, 'applicationevent is append-only');
+    END
+    """,
+]
+
+
+def create_event_log_guards(engine: Engine) -> None:
+    """Creates the triggers that keep the event table append-only."""
+    with engine.begin() as conn:
+        for statement in EVENT_LOG_DDL:
+            conn.exec_driver_sql(statement)
+
+
+def transition_applications(
+    session: Session, application_ids: List[int], new_status: str, changed_by: int
+) -> List[StatusTransitionResult]:
+    """
+    Moves the applications to `new_status` in one transaction, records an
+    event per application moved and updates the dashboard counts, then
+    commits and notifies the applicants. Returns the outcome per
+    application, in request order (repeated ids are reported once).
+
+    Each UPDATE only matches rows still in the status that was validated,
+    so an application changed by a concurrent request in between is
+    reported as a `conflict` instead of making a transition the state
+    machine does not allow.
+    """
+    application_ids = list(dict.fromkeys(application_ids))
+    current = dict(session.exec(
+        select(JobApplication.id, JobApplication.status).where(JobApplication.id.in_(application_ids))
+    ).all())
+
+    outcomes: Dict[int, str] = {}
+    by_status: Dict[str, List[int]] = {}
+    for application_id in application_ids:
+        status = current.get(application_id)
+        if status is None:
+            outcomes[application_id] = "not_found"
+        elif status == new_status:
+            outcomes[application_id] = "unchanged"
+        elif new_status not in TRANSITIONS.get(status, ()):
+            outcomes[application_id] = "invalid_transition"
+        else:
+            by_status.setdefault(status, []).append(application_id)
+
+    connection = session.connection()
+    changed_at = datetime.utcnow()
+    changes: Dict[int, dict] = {}
+    for from_status, ids in by_status.items():
+        rows = connection.execute(
+            update(JobApplication)
+            .where(JobApplication.id.in_(ids), JobApplication.status == from_status)
+            .values(status=new_status)
+            .returning(JobApplication.id, JobApplication.user_id, JobApplication.listing_id)
+        ).all()
+        for application_id, user_id, listing_id in rows:
+            changes[application_id] = {
+                "application_id": application_id, "user_id": user_id, "listing_id": listing_id,
+                "from_status": from_status, "to_status": new_status,
+                "changed_by": changed_by, "changed_at": changed_at,
+            }
+        for application_id in ids:
+            outcomes[application_id] = "updated" if application_id in changes else "conflict"
+
+    events: List[ApplicationEvent] = []
+    if changes:
+        rows = connection.execute(
+            insert(ApplicationEvent).returning(*ApplicationEvent.__table__.columns, sort_by_parameter_order=True),
+            [changes[application_id] for application_id in application_ids if application_id in changes]
+        )
+        events = [ApplicationEvent.model_validate(row._mapping) for row in rows]
+        record_status_changes(session, [(event.listing_id, event.from_status, event.to_status) for event in events])
+    session.commit()
+    # Only committed transitions are pushed
+    notification_broker.publish(events)
+
+    if any(outcome == "conflict" for outcome in outcomes.values()):
+        current.update(session.exec(
+            select(JobApplication.id, JobApplication.status).where(JobApplication.id.in_(application_ids))
+        ).all())
+    return [
+        StatusTransitionResult(
+            application_id=application_id,
+            outcome=outcomes[application_id],
+            status=new_status if application_id in changes else current.get(application_id),
+        )
+        for application_id in application_ids
+    ]
+
+
+def transition_application(
+    session: Session, application_id: int, new_status: str, changed_by: int
+) -> StatusTransitionResult:
+    return transition_applications(session, [application_id], new_status, changed_by)[0]
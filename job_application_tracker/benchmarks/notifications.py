@@ -0,0 +1,81 @@
+"""
+Cost of polling /my-applications against pushing status events.
+
+    python benchmarks/notifications.py [--users 10000] [--applications 30] [--poll-interval 5] [--events 10000]
+
+Each run uses a fresh database in a scratch directory.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--users", type=int, default=10_000)
+parser.add_argument("--applications", type=int, default=30, help="Applications per user")
+parser.add_argument("--poll-interval", type=float, default=5.0)
+parser.add_argument("--events", type=int, default=10_000, help="Status changes pushed in the fan-out run")
+args = parser.parse_args()
+
+scratch = tempfile.TemporaryDirectory(prefix="notifications_benchmark_")
+os.chdir(scratch.name)
+
+from sqlmodel import Session, SQLModel, create_engine, select  # noqa: E402
+
+from app.models import ApplicationEvent, JobApplication  # noqa: E402
+from app.notifications import NotificationBroker  # noqa: E402
+
+engine = create_engine("sqlite:///notifications_benchmark.db")
+SQLModel.metadata.create_all(engine)
+with engine.begin() as conn:
+    conn.exec_driver_sql(
+        "INSERT INTO jobapplication (user_id, listing_id, status, date_applied) VALUES (?, ?, 'pending', '2025-01-01')",
+        [(user_id, listing_id) for user_id in range(1, args.users + 1) for listing_id in range(1, args.applications + 1)]
+    )
+
+# Polling: every client fetches its whole list every interval
+timings = []
+with Session(engine) as session:
+    for user_id in range(1, args.users + 1, max(1, args.users // 500)):
+        started = time.perf_counter()
+        session.exec(select(JobApplication).where(JobApplication.user_id == user_id)).all()
+        timings.append((time.perf_counter() - started) * 1000)
+poll_ms = statistics.median(timings)
+polls_per_second = args.users / args.poll_interval
+print(f"{args.users} users with {args.applications} applications each, polling every {args.poll_interval:g}s:")
+print(f"  {polls_per_second:.0f} list queries/s at {poll_ms:.3f} ms each = {polls_per_second * poll_ms / 1000:.2f} s of "
+      f"database time per second, whether or not anything changed")
+
+
+# Push: one stream per user, each change delivered to its user only
+async def fan_out() -> float:
+    broker = NotificationBroker(queue_size=args.events)
+    subscribers = [broker.subscribe(user_id) for user_id in range(1, args.users + 1)]
+    now = datetime.utcnow()
+    events = [
+        ApplicationEvent(
+            id=i + 1, application_id=i + 1, user_id=i % args.users + 1, listing_id=1,
+            from_status="pending", to_status="reviewing", changed_at=now
+        )
+        for i in range(args.events)
+    ]
+    started = time.perf_counter()
+    broker.publish(events)
+    await asyncio.sleep(0)
+    elapsed = time.perf_counter() - started
+    assert sum(subscriber.queue.qsize() for subscriber in subscribers) == args.events
+    return elapsed
+
+
+elapsed = asyncio.run(fan_out())
+print(f"  push: {args.events} status changes delivered to {args.users} open streams in {elapsed * 1000:.1f} ms "
+      f"({elapsed / args.events * 1e6:.1f} us per change), and nothing while idle")
+
+engine.dispose()
+os.chdir(os.path.dirname(scratch.name))
@@ -0,0 +1,125 @@
+"""
+Listing search latency: FTS5 against the old LIKE '%term%' scan.
+
+    python benchmarks/search.py [--listings 500000] [--queries 500] [--limit 50] [--pages 20] [--db PATH]
+
+The listings are built in a scratch directory unless --db names a file; an
+existing file is reused, which saves rebuilding a large table per run.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--db", help="Listings database to build, or reuse if it exists")
+parser.add_argument("--listings", type=int, default=500_000)
+parser.add_argument("--queries", type=int, default=500)
+parser.add_argument("--limit", type=int, default=50)
+parser.add_argument("--pages", type=int, default=20, help="Pages walked with the cursor for a common word")
+args = parser.parse_args()
+
+from sqlmodel import Session, SQLModel, create_engine, select  # noqa: E402
+
+from app.models import JobListing  # noqa: E402
+from app.search import create_search_index, search_listings  # noqa: E402
+
+scratch = None
+if args.db is None:
+    scratch = tempfile.TemporaryDirectory(prefix="search_benchmark_")
+    args.db = os.path.join(scratch.name, "search_benchmark.db")
+
+rng = random.Random(42)
+levels = ["Junior", "Senior", "Staff", "Principal", "Lead", "Associate", "Head of"]
+fields = ["Software", "Data", "Backend", "Frontend", "Platform", "Security", "Machine Learning", "Mobile",
+          "Cloud", "Product", "Marketing", "Sales", "Finance", "Support", "Design", "QA", "Site Reliability"]
+roles = ["Engineer", "Analyst", "Manager", "Scientist", "Designer", "Developer", "Architect", "Specialist"]
+syllables = ["ac", "me", "glo", "bex", "tri", "nova", "zen", "quant", "lux", "ora", "vex", "pix", "dyn", "ark"]
+companies = sorted({
+    "".join(rng.choices(syllables, k=rng.randint(2, 3))).title() + rng.choice([" Inc", " Labs", " Group", " Systems", ""])
+    for _ in range(20_000)
+})
+vocabulary = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9))) for _ in range(10_000)]
+
+engine = create_engine(f"sqlite:///{args.db}")
+if not os.path.exists(args.db):
+    SQLModel.metadata.create_all(engine)
+    create_search_index(engine)
+    print(f"Inserting {args.listings} listings...")
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        batch = []
+        for i in range(args.listings):
+            position = f"{rng.choice(levels)} {rng.choice(fields)} {rng.choice(roles)}"
+            description = " ".join(rng.choices(vocabulary, k=40))
+            batch.append((rng.choice(companies), position, description))
+            if len(batch) == 10_000 or i == args.listings - 1:
+                conn.exec_driver_sql("INSERT INTO joblisting (company, position, description) VALUES (?, ?, ?)", batch)
+                batch = []
+    print(f"Loaded (index kept in sync by triggers) in {time.perf_counter() - started:.1f}s")
+
+
+def like_search(session: Session, position: Optional[str], company: Optional[str], limit: int) -> List[JobListing]:
+    """The search endpoint's query before FTS5, limited to one page for a fair comparison."""
+    query = select(JobListing).limit(limit)
+    if position:
+        query = query.where(JobListing.position.like(f"%{position}%"))
+    if company:
+        query = query.where(JobListing.company.like(f"%{company}%"))
+    return session.exec(query).all()
+
+
+queries = []
+for _ in range(args.queries):
+    kind = rng.random()
+    if kind < 0.3:
+        queries.append(("position", rng.choice(fields + roles), None, None))
+    elif kind < 0.55:
+        queries.append(("company", None, rng.choice(companies).split()[0], None))
+    elif kind < 0.8:
+        queries.append(("q, 2 words", None, None, f"{rng.choice(fields)} {rng.choice(vocabulary)}"))
+    else:
+        word = rng.choice(companies).split()[0]
+        queries.append(("q, partial", None, None, word[:rng.randint(2, len(word))]))
+
+fts_timings, like_timings = {}, {}
+with Session(engine) as session:
+    for kind, position, company, q in queries:
+        started = time.perf_counter()
+        search_listings(session, q, position, company, args.limit)
+        fts_timings.setdefault(kind, []).append((time.perf_counter() - started) * 1000)
+        if q is None and len(like_timings.get(kind, [])) < 20:
+            started = time.perf_counter()
+            like_search(session, position, company, args.limit)
+            like_timings.setdefault(kind, []).append((time.perf_counter() - started) * 1000)
+
+    # Every match is ranked, so a common word costs the same on any page
+    page_timings, cursor = [], None
+    for _ in range(args.pages):
+        started = time.perf_counter()
+        _, cursor = search_listings(session, "engineer", limit=args.limit, after=cursor, prefix=False)
+        page_timings.append((time.perf_counter() - started) * 1000)
+        if cursor is None:
+            break
+
+print(f"{args.queries} queries over {args.listings} listings (limit {args.limit})")
+for kind, timings in fts_timings.items():
+    timings.sort()
+    line = (
+        f"{kind:>11}: FTS5 p50 {timings[len(timings) // 2]:.2f} ms | p95 {timings[int(len(timings) * 0.95)]:.2f} ms"
+        f" | max {timings[-1]:.2f} ms"
+    )
+    if kind in like_timings:
+        line += f" || LIKE '%term%' median {statistics.median(like_timings[kind]):.1f} ms"
+    print(line)
+print(
+    f"'engineer', {len(page_timings)} pages by cursor: first {page_timings[0]:.1f} ms, "
+    f"last {page_timings[-1]:.1f} ms, median {statistics.median(page_timings):.1f} ms"
+)
+engine.dispose()
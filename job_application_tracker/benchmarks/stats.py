@@ -0,0 +1,107 @@
+"""
+Admin dashboard latency: the stats counts and the filtered application list.
+
+    python benchmarks/stats.py [--applications 5000000] [--listings 10000] [--days 365] [--db PATH]
+
+The history is built in a scratch directory unless --db names a file; an
+existing file is reused, which saves rebuilding a large table per run.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--db", help="History database to build, or reuse if it exists")
+parser.add_argument("--applications", type=int, default=5_000_000)
+parser.add_argument("--listings", type=int, default=10_000)
+parser.add_argument("--days", type=int, default=365)
+args = parser.parse_args()
+
+# Importing the router creates the app's engine, whose file lives in the
+# working directory
+scratch = tempfile.TemporaryDirectory(prefix="stats_benchmark_")
+if args.db is None:
+    args.db = os.path.join(scratch.name, "stats_benchmark.db")
+else:
+    args.db = os.path.abspath(args.db)
+os.chdir(scratch.name)
+
+from sqlmodel import Session, SQLModel, create_engine, func, select  # noqa: E402
+
+from app.models import JobApplication  # noqa: E402
+from app.routers.listings import filtered_applications  # noqa: E402
+from app.stats import application_stats, rebuild_application_stats  # noqa: E402
+
+statuses = ["pending", "reviewing", "interviewing", "offered", "hired", "rejected", "withdrawn"]
+engine = create_engine(f"sqlite:///{args.db}")
+first_day = date(2025, 1, 1)
+if not os.path.exists(args.db):
+    SQLModel.metadata.create_all(engine)
+    print(f"Inserting {args.applications} applications...")
+    started = time.perf_counter()
+    rng = random.Random(5)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO joblisting (id, company, position) VALUES (?, ?, 'Engineer')",
+            [(i, f"Company {i}") for i in range(1, args.listings + 1)]
+        )
+        batch = []
+        for i in range(args.applications):
+            # Ten applications per user, to distinct listings (7919 is prime, so i * 7919 cycles)
+            listing_id = (i * 7919) % args.listings + 1
+            day = first_day + timedelta(days=int(args.days * i / args.applications))
+            batch.append((i // 10 + 1, listing_id, rng.choices(statuses, weights=[40, 15, 10, 3, 2, 25, 5])[0], day.isoformat()))
+            if len(batch) == 50_000 or i == args.applications - 1:
+                conn.exec_driver_sql(
+                    "INSERT INTO jobapplication (user_id, listing_id, status, date_applied) VALUES (?, ?, ?, ?)", batch
+                )
+                batch = []
+    print(f"Inserted in {time.perf_counter() - started:.1f}s")
+    started = time.perf_counter()
+    rebuild_application_stats(engine)
+    print(f"Built counts in {time.perf_counter() - started:.1f}s")
+
+
+def timed(fn, runs: int = 20) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+last_day = first_day + timedelta(days=args.days - 1)
+month_ago = last_day - timedelta(days=29)
+with Session(engine) as session:
+    # A cursor halfway down the list, as the client gets it: (date_applied, id)
+    middle = session.exec(select(func.max(JobApplication.id))).one() // 2
+    cursor = session.exec(
+        select(JobApplication.date_applied, JobApplication.id).where(JobApplication.id >= middle).order_by(JobApplication.id)
+    ).first()
+    cases = {
+        "stats, 30 days": lambda: application_stats(session, month_ago, last_day),
+        "stats, one listing": lambda: application_stats(session, month_ago, last_day, listing_id=42),
+        "GROUP BY status on jobapplication": lambda: session.exec(
+            select(JobApplication.status, func.count()).group_by(JobApplication.status)
+        ).all(),
+        "list, no filter": lambda: filtered_applications(session, limit=100),
+        "list, one listing": lambda: filtered_applications(session, listing_id=42, limit=100),
+        "list, listing + status": lambda: filtered_applications(session, status="rejected", listing_id=42, limit=100),
+        "list, 7-day range": lambda: filtered_applications(session, date_from=last_day - timedelta(days=6), date_to=last_day, limit=100),
+        "list, status, deep cursor": lambda: filtered_applications(session, status="hired", after=tuple(cursor), limit=100),
+        "list, rare listing + status": lambda: filtered_applications(session, status="offered", listing_id=7, limit=100),
+    }
+    print(f"{args.applications} applications, {args.listings} listings, {args.days} days (median of 20)")
+    for label, fn in cases.items():
+        print(f"{label:>34}: {timed(fn, 5 if label.startswith('GROUP') else 20):8.2f} ms")
+
+engine.dispose()
+os.chdir(os.path.dirname(scratch.name))
@@ -0,0 +1,114 @@
+"""
+Per-request latency added by the request gate.
+
+    python benchmarks/user_agent_middleware.py [--requests 100000] [--rounds 5]
+
+A trivial ASGI app is called directly and through each middleware, with no
+server or network in between.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+from time import perf_counter_ns
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--requests", type=int, default=100_000)
+parser.add_argument("--rounds", type=int, default=5)
+args = parser.parse_args()
+
+from fastapi import HTTPException  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+
+from app.middleware.user_agent import GatePolicy, UserAgentMiddleware  # noqa: E402
+
+
+class OldUserAgentMiddleware(BaseHTTPMiddleware):
+    """The middleware the request gate replaced."""
+
+    async def dispatch(self, request, call_next):
+        if "user-agent" not in request.headers:
+            raise HTTPException(status_code=400, detail="User-Agent header is missing.")
+        return await call_next(request)
+
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+# Headers of a typical browser request
+browser_headers: List[Tuple[bytes, bytes]] = [
+    (b"host", b"api.example.com"),
+    (b"user-agent", b"Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36"),
+    (b"accept", b"application/json"),
+    (b"accept-language", b"en-US,en;q=0.9"),
+    (b"accept-encoding", b"gzip, deflate, br"),
+    (b"authorization", b"Bearer eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.e30.sig"),
+    (b"origin", b"http://localhost:3000"),
+    (b"referer", b"http://localhost:3000/"),
+    (b"connection", b"keep-alive"),
+    (b"sec-fetch-mode", b"cors"),
+]
+scope = {
+    "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+    "path": "/listings/", "raw_path": b"/listings/", "query_string": b"", "root_path": "",
+    "headers": browser_headers, "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 8000),
+}
+bots = ["curl/", "python-requests", "scrapy", "wget", "httpclient", "go-http-client", "headlesschrome",
+        "phantomjs", "semrushbot", "ahrefsbot", "mj12bot", "dotbot", "petalbot", "bytespider", "gptbot"]
+
+
+async def run(app, request_scope: dict, n: int) -> float:
+    start = perf_counter_ns()
+    for _ in range(n):
+        await app(dict(request_scope), receive, send)
+    return (perf_counter_ns() - start) / n
+
+
+async def main():
+    apps = {
+        "bare app": endpoint,
+        "BaseHTTPMiddleware (old)": OldUserAgentMiddleware(endpoint),
+        "gate, header check": UserAgentMiddleware(endpoint, GatePolicy(denied_user_agents=[])),
+        f"gate, + {len(bots)}-agent deny list": UserAgentMiddleware(
+            endpoint, GatePolicy(denied_user_agents=bots, exempt_paths=["/health", "/docs*"])
+        ),
+    }
+    timings = {label: [] for label in apps}
+    for app in apps.values():
+        await run(app, scope, args.requests // 10)
+    for _ in range(args.rounds):
+        for label, app in apps.items():
+            timings[label].append(await run(app, scope, args.requests))
+
+    bare = statistics.median(timings["bare app"])
+    print(f"Accepted request with {len(browser_headers)} headers (median of {args.rounds} x {args.requests}):")
+    for label, runs in timings.items():
+        median = statistics.median(runs)
+        added = "" if label == "bare app" else f"  (+{(median - bare) / 1000:.2f} µs)"
+        print(f"{label:>34}: {median / 1000:6.2f} µs/request{added}")
+
+    no_user_agent = {**scope, "headers": [header for header in browser_headers if header[0] != b"user-agent"]}
+    gate = UserAgentMiddleware(endpoint)
+    rejected = statistics.median([await run(gate, no_user_agent, args.requests) for _ in range(args.rounds)])
+    print(f"{'gate, rejecting (400)':>34}: {rejected / 1000:6.2f} µs/request")
+    try:
+        await OldUserAgentMiddleware(endpoint)(dict(no_user_agent), receive, send)
+    except HTTPException:
+        print(f"{'BaseHTTPMiddleware (old)':>34}: HTTPException escapes the middleware, so the client gets a 500")
+
+
+asyncio.run(main())
@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app keeps its SQLite file in the working directory: run the suite in
+# a scratch one, with the project importable from there
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(tempfile.mkdtemp(prefix="job_tracker_tests_"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from app.database import engine, sqlite_file_name  # noqa: E402
+from app.listing_cache import listing_cache  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import JobListing, User  # noqa: E402
+from app.security import create_access_token  # noqa: E402
+
+engine.echo = False
+
+
+def remove_database() -> None:
+    # A fresh file rather than drop_all: the FTS index and the event log
+    # triggers are not part of the SQLModel metadata
+    engine.dispose()
+    if os.path.exists(sqlite_file_name):
+        os.remove(sqlite_file_name)
+
+
+@pytest.fixture
+def client():
+    remove_database()
+    listing_cache.bump()
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def auth_headers(username: str) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+
+
+ADMIN = auth_headers("admin")
+
+
+def create_users(count: int, prefix: str = "applicant") -> list:
+    """Inserts `count` users and returns their ids."""
+    users = [User(username=f"{prefix}{i}", hashed_password="") for i in range(count)]
+    with Session(engine) as session:
+        session.add_all(users)
+        session.commit()
+        return [user.id for user in users]
+
+
+def create_listings(*positions: str, company: str = "Acme", description: str = "") -> list:
+    """Inserts a listing per position and returns their ids, oldest first."""
+    listings = [JobListing(company=company, position=position, description=description) for position in positions]
+    with Session(engine) as session:
+        session.add_all(listings)
+        session.commit()
+        return [listing.id for listing in listings]
@@ -0,0 +1,55 @@
+from datetime import date, timedelta
+
+from app.database import engine
+from conftest import ADMIN, create_listings, create_users
+
+DAYS = 5
+
+
+def create_applications(users: list, listings: list) -> list:
+    """One application per (user, listing), spread over DAYS days; returns their ids newest first."""
+    rows = [
+        (user_id, listing_id, (date(2025, 1, 1) + timedelta(days=(user_id + listing_id) % DAYS)).isoformat())
+        for user_id in users for listing_id in listings
+    ]
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO jobapplication (user_id, listing_id, status, date_applied) VALUES (?, ?, 'pending', ?)", rows
+        )
+        return [row[0] for row in conn.exec_driver_sql("SELECT id FROM jobapplication ORDER BY date_applied DESC, id DESC")]
+
+
+def get_page(client, **params):
+    response = client.get("/listings/all-applications", params=params, headers=ADMIN)
+    assert response.status_code == 200, response.text
+    return [application["id"] for application in response.json()], response.headers.get("X-Next-Cursor")
+
+
+def test_cursor_pages_through_every_application_newest_first(client):
+    expected = create_applications(create_users(6), create_listings("A", "B", "C"))
+
+    ids, after = [], None
+    while True:
+        page, after = get_page(client, limit=4, **({"after": after} if after else {}))
+        ids += page
+        if after is None:
+            break
+
+    assert ids == expected
+
+
+def test_cursor_survives_deleting_the_last_application_of_the_page(client):
+    expected = create_applications(create_users(6), create_listings("A", "B", "C"))
+    first_page, after = get_page(client, limit=5)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM jobapplication WHERE id = ?", (first_page[-1],))
+
+    second_page, _ = get_page(client, limit=5, after=after)
+
+    assert second_page == expected[5:10]
+
+
+def test_invalid_cursor_is_rejected(client):
+    for after in ("42", "2025-13-01:4", "2025-01-01:x"):
+        response = client.get("/listings/all-applications", params={"after": after}, headers=ADMIN)
+        assert response.status_code == 400, after
@@ -0,0 +1,89 @@
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from app.applications import apply
+from app import database
+from app.database import engine, remove_duplicate_applications
+from conftest import auth_headers, create_listings, create_users
+
+USERS = 10
+LISTINGS = 5
+# Concurrent requests per (user, listing) pair
+ATTEMPTS = 4
+THREADS = 16
+
+
+def test_concurrent_applies_create_one_application_per_pair(client):
+    users = create_users(USERS)
+    listings = create_listings(*[f"Role {i}" for i in range(LISTINGS)])
+    pairs = [(user_id, listing_id) for user_id in users for listing_id in listings] * ATTEMPTS
+    random.Random(1).shuffle(pairs)
+
+    counts = {"created": 0, "rejected": 0, "integrity_errors": 0}
+    counts_lock = threading.Lock()
+    start = threading.Barrier(THREADS)
+
+    def worker(work) -> None:
+        start.wait()
+        for user_id, listing_id in work:
+            with Session(engine) as session:
+                try:
+                    outcome = "created" if apply(session, user_id, listing_id) else "rejected"
+                except IntegrityError:
+                    outcome = "integrity_errors"
+            with counts_lock:
+                counts[outcome] += 1
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        list(pool.map(worker, [pairs[i::THREADS] for i in range(THREADS)]))
+
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql("SELECT count(*) FROM jobapplication").scalar()
+        distinct = conn.exec_driver_sql("SELECT count(*) FROM (SELECT DISTINCT user_id, listing_id FROM jobapplication)").scalar()
+        counted = conn.exec_driver_sql("SELECT sum(applications) FROM listingapplicationcount").scalar()
+    assert counts == {"created": USERS * LISTINGS, "rejected": USERS * LISTINGS * (ATTEMPTS - 1), "integrity_errors": 0}
+    assert rows - distinct == 0
+    assert rows == counted == USERS * LISTINGS
+
+
+def test_repeat_application_is_409(client):
+    create_users(1)
+    [listing_id] = create_listings("Engineer")
+    headers = auth_headers("applicant0")
+
+    assert client.post("/listings/apply", json={"listing_id": listing_id}, headers=headers).status_code == 201
+    assert client.post("/listings/apply", json={"listing_id": listing_id}, headers=headers).status_code == 409
+    assert client.post("/listings/apply", json={"listing_id": listing_id + 1}, headers=headers).status_code == 404
+
+
+def test_duplicates_from_before_the_unique_index_are_removed_and_reported(client, capsys, monkeypatch):
+    monkeypatch.setattr(database, "MAX_LOGGED_PAIRS", 1)
+    first_user, second_user = create_users(2)
+    listing_a, listing_b = create_listings("Engineer", "Designer")
+    with engine.begin() as conn:
+        # A database from before the index existed
+        conn.exec_driver_sql("DROP INDEX ix_jobapplication_user_id_listing_id")
+        conn.exec_driver_sql(
+            "INSERT INTO jobapplication (user_id, listing_id, status, date_applied) VALUES (?, ?, 'pending', '2025-01-01')",
+            [(first_user, listing_a), (first_user, listing_a), (first_user, listing_b),
+             (second_user, listing_b), (first_user, listing_a), (second_user, listing_b)]
+        )
+    capsys.readouterr()
+
+    assert remove_duplicate_applications() == 3
+
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT id FROM jobapplication ORDER BY id").scalars().all() == [1, 3, 4]
+    output = capsys.readouterr().out
+    assert "Removed 3 duplicate applications" in output
+    assert f"({first_user}, {listing_a}) x2 and 1 more" in output
+
+    # With nothing left to remove it stays quiet, and once indexed it does not look
+    assert remove_duplicate_applications() == 0
+    database.create_db_and_tables()
+    assert remove_duplicate_applications() == 0
+    assert "WARNING" not in capsys.readouterr().out
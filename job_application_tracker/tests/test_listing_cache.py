@@ -0,0 +1,177 @@
+import threading
+import time
+
+import pytest
+
+from app import listing_cache as listing_cache_module
+from app.listing_cache import ListingCache, listing_cache
+from conftest import ADMIN, auth_headers, create_listings, create_users
+
+
+class Clock:
+    """Stands in for the time module, so TTLs pass without sleeping."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def counting_loader(body: bytes = b"[]"):
+    calls = []
+
+    def load():
+        calls.append(body)
+        return body, {"X-Next-Cursor": "7"}
+
+    return load, calls
+
+
+def test_pages_expire_after_the_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(listing_cache_module, "time", clock)
+    cache = ListingCache(ttl=5)
+    load, calls = counting_loader()
+
+    page = cache.get_or_load("feed", load)
+    clock.now += 4.9
+    assert cache.get_or_load("feed", load) is page
+    clock.now += 0.1
+    assert cache.get_or_load("feed", load) is not page
+
+    assert len(calls) == 2
+    assert page.headers == {"X-Next-Cursor": "7"}
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 2)
+
+
+def test_bump_invalidates_every_page():
+    cache = ListingCache()
+    load, calls = counting_loader()
+    cache.get_or_load("feed", load)
+    cache.get_or_load("other", load)
+
+    cache.bump()
+
+    cache.get_or_load("feed", load)
+    cache.get_or_load("other", load)
+    assert len(calls) == 4
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_a_page_loaded_during_a_write_is_not_cached():
+    cache = ListingCache()
+    calls = []
+
+    def load_while_a_listing_changes():
+        calls.append(1)
+        if len(calls) == 1:
+            cache.bump()  # A write commits after the query started
+        return b"[]", {}
+
+    first = cache.get_or_load("feed", load_while_a_listing_changes)
+    second = cache.get_or_load("feed", load_while_a_listing_changes)
+
+    # The stale page is still returned to its own request, just not kept
+    assert first.body == second.body == b"[]"
+    assert len(calls) == 2
+    assert cache.get_or_load("feed", load_while_a_listing_changes) is second
+    assert len(calls) == 2
+
+
+def test_concurrent_misses_load_once():
+    cache = ListingCache()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_load():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return b"[1]", {}
+
+    pages = []
+    threads = [threading.Thread(target=lambda: pages.append(cache.get_or_load("feed", slow_load))) for _ in range(8)]
+    threads[0].start()
+    assert started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert len(pages) == 8 and all(page is pages[0] for page in pages)
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (7, 1)
+
+
+def test_a_failed_load_is_retried():
+    cache = ListingCache()
+
+    def fail():
+        raise RuntimeError("database is locked")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load("feed", fail)
+    load, calls = counting_loader()
+
+    assert cache.get_or_load("feed", load).body == b"[]"
+    assert len(calls) == 1
+
+
+def test_feed_revalidates_with_etag(client):
+    create_listings("Engineer", "Designer", "Analyst")
+
+    first = client.get("/listings/", params={"limit": 2})
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == f"public, max-age={int(listing_cache.ttl)}"
+    assert [listing["position"] for listing in first.json()] == ["Analyst", "Designer"]
+
+    before = listing_cache.stats()
+    revalidated = client.get("/listings/", params={"limit": 2}, headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["etag"] == etag
+    # The cursor is cached with the page
+    assert revalidated.headers["x-next-cursor"] == first.headers["x-next-cursor"]
+    assert client.get("/listings/", params={"limit": 2}, headers={"If-None-Match": f'W/{etag}'}).status_code == 304
+    assert client.get("/listings/", params={"limit": 3}, headers={"If-None-Match": etag}).status_code == 200
+
+    stats = listing_cache.stats()
+    assert stats["not_modified"] - before["not_modified"] == 2
+    assert stats["hits"] - before["hits"] == 2
+
+
+def test_listing_writes_invalidate_the_feed(client):
+    [listing_id] = create_listings("Engineer")
+    etag = client.get("/listings/").headers["etag"]
+
+    def feed_since(etag: str) -> tuple:
+        response = client.get("/listings/", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        return response.headers["etag"], [listing["position"] for listing in response.json()]
+
+    response = client.post("/listings/", json={"company": "Acme", "position": "Designer"}, headers=ADMIN)
+    assert response.status_code == 201, response.text
+    etag, positions = feed_since(etag)
+    assert positions == ["Designer", "Engineer"]
+
+    response = client.put(f"/listings/{listing_id}", json={"company": "Acme", "position": "Staff Engineer"}, headers=ADMIN)
+    assert response.status_code == 200, response.text
+    etag, positions = feed_since(etag)
+    assert positions == ["Designer", "Staff Engineer"]
+
+    assert client.delete(f"/listings/{listing_id}", headers=ADMIN).status_code == 204
+    etag, positions = feed_since(etag)
+    assert positions == ["Designer"]
+
+
+def test_cache_stats_are_admin_only(client):
+    create_users(1)
+
+    assert client.get("/listings/cache/stats", headers=auth_headers("applicant0")).status_code == 403
+    response = client.get("/listings/cache/stats", headers=ADMIN)
+    assert response.status_code == 200
+    assert response.json() == listing_cache.stats()
@@ -0,0 +1,57 @@
+from app.database import engine
+from conftest import create_listings
+
+NEWER = 1_100
+
+
+def search_all(client, **params) -> list:
+    """Every listing the search returns, following the cursor page by page."""
+    ids, after = [], None
+    while True:
+        response = client.get("/listings/search", params={**params, **({"after": after} if after else {})})
+        assert response.status_code == 200, response.text
+        ids += [listing["id"] for listing in response.json()]
+        after = response.headers.get("X-Next-Cursor")
+        if after is None:
+            return ids
+
+
+def test_best_match_ranks_first_however_many_newer_matches(client):
+    [best] = create_listings("Engineer")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO joblisting (company, position, description) VALUES ('Acme', 'Senior Platform Engineer', ?)",
+            [(f"team {i}",) for i in range(NEWER)]
+        )
+
+    response = client.get("/listings/search", params={"q": "engineer", "limit": 10})
+
+    assert response.json()[0]["id"] == best
+
+
+def test_cursor_reaches_every_match_once(client):
+    create_listings("Engineer")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO joblisting (company, position, description) VALUES ('Acme', ?, '')",
+            [(f"Engineer level {i % 3}",) for i in range(NEWER)]
+        )
+    create_listings("Designer")
+
+    ids = search_all(client, q="engineer", limit=200)
+
+    assert len(ids) == NEWER + 1
+    assert len(set(ids)) == len(ids)
+
+
+def test_browsing_without_words_pages_newest_first(client):
+    ids = create_listings(*[f"Role {i}" for i in range(7)])
+
+    assert search_all(client, limit=3) == ids[::-1]
+
+
+def test_invalid_cursor_is_rejected(client):
+    create_listings("Engineer")
+
+    for params in ({"q": "engineer", "after": "not-a-cursor"}, {"after": "1.5:2"}):
+        assert client.get("/listings/search", params=params).status_code == 400
@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from app import notifications
+from app.database import engine
+from app.notifications import RESET_EVENT, notification_broker
+from app.workflow import transition_applications
+from conftest import ADMIN, create_listings, create_users
+
+
+def create_applications(user_id: int, count: int) -> list:
+    listings = create_listings(*[f"Role {i}" for i in range(count)])
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO jobapplication (user_id, listing_id, status, date_applied) VALUES (?, ?, 'pending', '2025-01-01')",
+            [(user_id, listing_id) for listing_id in listings]
+        )
+        return [row[0] for row in conn.exec_driver_sql("SELECT id FROM jobapplication WHERE user_id = ? ORDER BY id", (user_id,))]
+
+
+def transition(application_ids: list, status: str) -> list:
+    with Session(engine) as session:
+        return [(result.outcome, result.status) for result in transition_applications(session, application_ids, status, changed_by=1)]
+
+
+def user_event_ids(user_id: int) -> list:
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("SELECT id FROM applicationevent WHERE user_id = ? ORDER BY id", (user_id,)).scalars().all()
+
+
+def event_rows() -> list:
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("SELECT application_id, from_status, to_status FROM applicationevent ORDER BY id").all()
+
+
+def test_invalid_transition_changes_nothing(client):
+    [user_id] = create_users(1)
+    pending, reviewing = create_applications(user_id, 2)
+    transition([reviewing], "reviewing")
+
+    assert transition([pending, reviewing, pending + 100], "hired") == [
+        ("invalid_transition", "pending"), ("invalid_transition", "reviewing"), ("not_found", None)
+    ]
+    assert event_rows() == [(reviewing, "pending", "reviewing")]
+
+    response = client.patch(f"/listings/applications/{pending}/status", json={"status": "hired"}, headers=ADMIN)
+    assert response.status_code == 409
+    assert "from 'pending' to 'hired'" in response.json()["detail"]
+
+
+def test_concurrent_change_is_a_conflict(client):
+    [user_id] = create_users(1)
+    contested, other = create_applications(user_id, 2)
+
+    withdrawn = []
+
+    def withdraw_first(conn, cursor, statement, parameters, context, executemany):
+        # Another request withdraws the application between the status check and the UPDATE
+        if statement.startswith("UPDATE jobapplication") and not withdrawn:
+            withdrawn.append(contested)
+            with engine.begin() as other_conn:
+                other_conn.exec_driver_sql("UPDATE jobapplication SET status = 'withdrawn' WHERE id = ?", (contested,))
+
+    event.listen(engine, "before_cursor_execute", withdraw_first)
+    try:
+        outcomes = transition([contested, other], "reviewing")
+    finally:
+        event.remove(engine, "before_cursor_execute", withdraw_first)
+
+    assert outcomes == [("conflict", "withdrawn"), ("updated", "reviewing")]
+    assert event_rows() == [(other, "pending", "reviewing")]
+
+
+def test_event_log_rejects_update_and_delete(client):
+    [user_id] = create_users(1)
+    [application_id] = create_applications(user_id, 1)
+    transition([application_id], "reviewing")
+
+    for statement in ("UPDATE applicationevent SET to_status = 'hired'", "DELETE FROM applicationevent"):
+        with pytest.raises(IntegrityError, match="append-only"):
+            with engine.begin() as conn:
+                conn.exec_driver_sql(statement)
+    assert event_rows() == [(application_id, "pending", "reviewing")]
+
+
+def read_stream(user_id: int, last_event_id, count: int, then=None) -> list:
+    """The first `count` chunks of a user's event stream; `then` runs once those are read, for one more."""
+    async def read() -> list:
+        stream = notification_broker.stream(engine, user_id, last_event_id)
+        try:
+            chunks = [await stream.__anext__() for _ in range(count)]
+            if then is not None:
+                then()
+                chunks.append(await asyncio.wait_for(stream.__anext__(), 5))
+            return chunks
+        finally:
+            await stream.aclose()
+
+    return asyncio.run(read())
+
+
+def event_ids(chunks: list) -> list:
+    return [int(chunk.split(b"\n")[0][len(b"id: "):]) for chunk in chunks if chunk.startswith(b"id: ")]
+
+
+def test_last_event_id_replays_missed_events(client):
+    user_id, other_user_id = create_users(2)
+    first, second, third = create_applications(user_id, 3)
+    [others] = create_applications(other_user_id, 1)
+    transition([first], "reviewing")
+    transition([others], "reviewing")
+    transition([second, third], "rejected")
+    seen, *missed = user_event_ids(user_id)
+
+    chunks = read_stream(user_id, str(seen), 3, then=lambda: transition([first], "interviewing"))
+
+    assert chunks[0] == b"retry: 3000\n\n"
+    assert event_ids(chunks[1:3]) == missed
+    assert b'"application_id":%d,' % second in chunks[1] and b'"to_status":"rejected"' in chunks[1]
+    # Live events follow the replay
+    assert event_ids(chunks[3:]) == user_event_ids(user_id)[-1:]
+
+
+def test_unusable_last_event_id_gets_a_reset(client, monkeypatch):
+    [user_id] = create_users(1)
+    transition(create_applications(user_id, 3), "reviewing")
+    monkeypatch.setattr(notifications, "MAX_REPLAY", 2)
+
+    assert read_stream(user_id, "not-an-id", 2)[1] == RESET_EVENT
+    assert read_stream(user_id, "0", 2)[1] == RESET_EVENT
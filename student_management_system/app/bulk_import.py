@@ -0,0 +1,214 @@
+import csv
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Dict, Iterator, List, Sequence, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.models import Grade, ImportRowError, OtherGrade, Student, StudentImportRow, User, is_score
+from app.security import hash_password
+
+# Rows per INSERT/IN batch; well under SQLite's bound-parameter limit
+INSERT_BATCH_SIZE = 500
+# Most rows and bytes one import may send; each row costs a bcrypt hash
+MAX_IMPORT_ROWS = int(os.getenv("BULK_IMPORT_MAX_ROWS", "10000"))
+MAX_IMPORT_BYTES = int(os.getenv("BULK_IMPORT_MAX_BYTES", str(10 * 1024 * 1024)))
+
+NumberedRow = Tuple[int, StudentImportRow]
+
+
+class ImportTooLarge(Exception):
+    """Raised while parsing when the body passes MAX_IMPORT_ROWS or MAX_IMPORT_BYTES."""
+
+
+def batched(items: Sequence, size: int = INSERT_BATCH_SIZE) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Splits a streamed request body into text lines as the bytes arrive.
+    Raises ImportTooLarge once more than MAX_IMPORT_BYTES have been read.
+    """
+    buffer = b""
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > MAX_IMPORT_BYTES:
+            raise ImportTooLarge(f"Imports are limited to {MAX_IMPORT_BYTES} bytes.")
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8", errors="replace").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8", errors="replace").rstrip("\r")
+
+
+def parse_csv_row(header: List[str], line: str) -> dict:
+    values = next(csv.reader([line]))
+    if len(values) != len(header):
+        raise ValueError(f"Expected {len(header)} columns, got {len(values)}.")
+    data = dict(zip(header, values))
+    # Grades travel as a JSON object in a single column, e.g. {"math": 90}
+    if data.get("grades"):
+        data["grades"] = json.loads(data["grades"])
+    else:
+        data.pop("grades", None)
+    if not data.get("name"):
+        data.pop("name", None)
+    return data
+
+
+async def parse_import(chunks: AsyncIterator[bytes], fmt: str) -> Tuple[List[NumberedRow], List[ImportRowError]]:
+    """
+    Validates an import body row by row while it streams in.
+
+    `fmt` is "csv" (first line is a header; quoted fields may not span lines)
+    or "ndjson". Returns the valid rows, numbered from 1, and one error per
+    rejected row, including usernames or emails repeated within the file.
+    Raises ImportTooLarge past MAX_IMPORT_ROWS rows or MAX_IMPORT_BYTES.
+    """
+    rows: List[NumberedRow] = []
+    errors: List[ImportRowError] = []
+    seen_usernames = set()
+    seen_emails = set()
+    header = None
+    row_number = 0
+
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        if fmt == "csv" and header is None:
+            header = [column.strip() for column in next(csv.reader([line]))]
+            continue
+
+        row_number += 1
+        if row_number > MAX_IMPORT_ROWS:
+            raise ImportTooLarge(f"Imports are limited to {MAX_IMPORT_ROWS} rows.")
+        try:
+            data = parse_csv_row(header, line) if fmt == "csv" else json.loads(line)
+            row = StudentImportRow.model_validate(data)
+        except (ValueError, ValidationError) as e:
+            errors.append(ImportRowError(row=row_number, error=str(e)))
+            continue
+
+        if row.username in seen_usernames:
+            errors.append(ImportRowError(row=row_number, error="Duplicate username in import."))
+        elif row.email in seen_emails:
+            errors.append(ImportRowError(row=row_number, error="Duplicate email in import."))
+        else:
+            seen_usernames.add(row.username)
+            seen_emails.add(row.email)
+            rows.append((row_number, row))
+
+    return rows, errors
+
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """Hashes passwords with bcrypt across a process pool."""
+    if len(passwords) < 2:
+        return [hash_password(password) for password in passwords]
+    workers = min(os.cpu_count() or 1, len(passwords))
+    # "spawn" because we are called from a worker thread, where forking is unsafe
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        return list(pool.map(hash_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+def check_taken(session: Session, rows: List[NumberedRow]) -> Tuple[List[NumberedRow], List[ImportRowError]]:
+    """Splits rows into those free to insert and an error for each whose username or email is taken."""
+    taken_usernames = set()
+    taken_emails = set()
+    for batch in batched(rows):
+        usernames = [row.username for _, row in batch]
+        emails = [row.email for _, row in batch]
+        taken_usernames.update(session.exec(select(User.username).where(User.username.in_(usernames))).all())
+        taken_emails.update(session.exec(select(Student.email).where(Student.email.in_(emails))).all())
+
+    free: List[NumberedRow] = []
+    errors: List[ImportRowError] = []
+    for row_number, row in rows:
+        if row.username in taken_usernames:
+            errors.append(ImportRowError(row=row_number, error="Username already registered."))
+        elif row.email in taken_emails:
+            errors.append(ImportRowError(row=row_number, error="A student with this email already exists."))
+        else:
+            free.append((row_number, row))
+    return free, errors
+
+
+def insert_rows(session: Session, rows: List[NumberedRow], hashed_passwords: Dict[int, str]) -> None:
+    """
+    Inserts the students, their grades and their user accounts with batched
+    executemany INSERTs. The student's user link is written with the user
+    row itself, so there is no follow-up UPDATE pass. The caller commits.
+    """
+    for batch in batched(rows):
+        student_ids = session.exec(
+            insert(Student).returning(Student.id, sort_by_parameter_order=True),
+            params=[{"name": row.name or row.username, "age": row.age, "email": row.email} for _, row in batch]
+        ).scalars().all()
+
+        grade_params = [
+            {"student_id": student_id, "subject": subject, "score": value}
+            for student_id, (_, row) in zip(student_ids, batch)
+            for subject, value in row.grades.items() if is_score(value)
+        ]
+        if grade_params:
+            session.exec(insert(Grade), params=grade_params)
+        other_grade_params = [
+            {"student_id": student_id, "subject": subject, "value": json.dumps(value)}
+            for student_id, (_, row) in zip(student_ids, batch)
+            for subject, value in row.grades.items() if not is_score(value)
+        ]
+        if other_grade_params:
+            session.exec(insert(OtherGrade), params=other_grade_params)
+
+        session.exec(
+            insert(User),
+            params=[
+                {"username": row.username, "hashed_password": hashed_passwords[row_number], "role": "student", "student_id": student_id}
+                for (row_number, row), student_id in zip(batch, student_ids)
+            ]
+        )
+
+
+def import_rows(rows: List[NumberedRow]) -> Tuple[int, List[ImportRowError]]:
+    """
+    Creates a user account and a linked student record for every row in a
+    single transaction.
+
+    Rows whose username or email already exists are reported and skipped.
+    One registered concurrently, after the check, makes the INSERT fail: the
+    transaction is rolled back, the rows taken in the meantime are reported
+    the same way, and the rest are inserted again.
+    """
+    with Session(engine) as session:
+        rows, errors = check_taken(session, rows)
+        if not rows:
+            return 0, errors
+
+        hashed_passwords = dict(zip(
+            [row_number for row_number, _ in rows], hash_passwords([row.password for _, row in rows])
+        ))
+
+        while rows:
+            try:
+                insert_rows(session, rows, hashed_passwords)
+                session.commit()
+                break
+            except IntegrityError:
+                session.rollback()
+                rows, conflicts = check_taken(session, rows)
+                if not conflicts:
+                    raise
+                errors.extend(conflicts)
+
+    return len(rows), errors
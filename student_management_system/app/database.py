@@ -1,5 +1,10 @@
+import json
+from typing import Any, Dict
+
 from sqlmodel import SQLModel, create_engine, Session
 
+from app.models import is_score
+
 sqlite_file_name = "database.db"
 sqlite_url = f"sqlite:///{sqlite_file_name}"
 
@@ -9,6 +14,61 @@ engine = create_engine(sqlite_url, echo=True)
 def create_db_and_tables():
     """Create the database file and all tables defined in SQLModel."""
     SQLModel.metadata.create_all(engine)
+    migrate_legacy_grades()
+
+def migrate_legacy_grades():
+    """
+    Moves grades out of the old JSON-string `student.grades` column: numbers
+    into the grade table, any other value into othergrade.
+
+    Runs in one transaction. The old column is only dropped once every grade
+    has been read back from the new tables; if a student's column is not a
+    JSON object, or the copy does not match, the migration is aborted with
+    the offending student ids and the database is left as it was.
+    """
+    with engine.begin() as conn:
+        columns = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(student)")]
+        if "grades" not in columns:
+            return
+
+        legacy: Dict[int, Dict[str, Any]] = {}
+        unparseable = []
+        for student_id, raw in conn.exec_driver_sql("SELECT id, grades FROM student"):
+            try:
+                grades = json.loads(raw) if raw else {}
+            except ValueError:
+                grades = None
+            if isinstance(grades, dict):
+                legacy[student_id] = grades
+            else:
+                unparseable.append(student_id)
+        if unparseable:
+            raise RuntimeError(
+                f"Cannot migrate student.grades: not a JSON object for student ids {unparseable}. "
+                "Fix these rows and restart; nothing was changed."
+            )
+
+        scores = [(student_id, subject, value) for student_id, grades in legacy.items()
+                  for subject, value in grades.items() if is_score(value)]
+        others = [(student_id, subject, json.dumps(value)) for student_id, grades in legacy.items()
+                  for subject, value in grades.items() if not is_score(value)]
+        if scores:
+            conn.exec_driver_sql("INSERT INTO grade (student_id, subject, score) VALUES (?, ?, ?)", scores)
+        if others:
+            conn.exec_driver_sql("INSERT INTO othergrade (student_id, subject, value) VALUES (?, ?, ?)", others)
+
+        copied: Dict[int, Dict[str, Any]] = {}
+        for student_id, subject, score in conn.exec_driver_sql("SELECT student_id, subject, score FROM grade"):
+            copied.setdefault(student_id, {})[subject] = score
+        for student_id, subject, value in conn.exec_driver_sql("SELECT student_id, subject, value FROM othergrade"):
+            copied.setdefault(student_id, {})[subject] = json.loads(value)
+        mismatched = [student_id for student_id, grades in legacy.items() if copied.get(student_id, {}) != grades]
+        if mismatched:
+            raise RuntimeError(
+                f"Cannot migrate student.grades: the copy does not match for student ids {mismatched}. "
+                "Nothing was changed."
+            )
+        conn.exec_driver_sql("ALTER TABLE student DROP COLUMN grades")
 
 def get_session():
     """Dependency to get a database session."""
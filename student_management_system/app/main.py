@@ -1,19 +1,20 @@
 import time
-import json
-import os
-from fastapi import FastAPI, Request, Response, status
+from fastapi import FastAPI, Request, Response, status, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 from colorama import Fore, Style, init
 
 from app.database import create_db_and_tables, get_session
+from app.models import User
 from app.routers import students
-from app.security import create_initial_admin_user
+from app.security import create_initial_admin_user, credential_cache, get_current_admin
+from app.request_log import NDJSONRequestLog, RequestLogSink
 from sqlmodel import Session
 
 init(autoreset=True)
-LOG_FILE = "request_log.json"
+LOG_FILE = "request_log.ndjson"
+request_log: RequestLogSink = NDJSONRequestLog(LOG_FILE)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -22,7 +23,10 @@ async def lifespan(app: FastAPI):
     with next(get_session()) as session:
         print(f"{Fore.MAGENTA}INFO: Ensuring initial admin user exists...{Style.RESET_ALL}")
         create_initial_admin_user(session)
+    await request_log.start()
     yield
+    print(f"{Fore.MAGENTA}INFO: Flushing request log...{Style.RESET_ALL}")
+    await request_log.stop()
     print(f"{Fore.MAGENTA}INFO: Application shutdown complete.{Style.RESET_ALL}")
 
 app = FastAPI(lifespan=lifespan)
@@ -43,32 +47,21 @@ app.add_middleware(
 # --- Logging Middleware ---
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    start_time = time.time()
+    start_time = time.perf_counter()
     response = await call_next(request)
-    process_time = time.time() - start_time
+    process_time = time.perf_counter() - start_time
     
     log_entry = {
         "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
         "path": request.url.path,
         "method": request.method,
-        "client_host": request.client.host,
+        "client_host": request.client.host if request.client else None,
         "response_status": response.status_code,
         "process_time_ms": round(process_time * 1000, 2)
     }
 
-    try:
-        if not os.path.exists(LOG_FILE) or os.stat(LOG_FILE).st_size == 0:
-            with open(LOG_FILE, "w") as f:
-                json.dump([log_entry], f, indent=4)
-        else:
-            with open(LOG_FILE, "r+") as f:
-                data = json.load(f)
-                data.append(log_entry)
-                f.seek(0)
-                json.dump(data, f, indent=4)
-    except Exception as e:
-        print(f"{Fore.RED}ERROR: Failed to write to log file: {e}{Style.RESET_ALL}")
-        
+    # Queued for the background writer; never blocks the request.
+    request_log.emit(log_entry)
     return response
 
 # --- Routers ---
@@ -77,4 +70,8 @@ app.include_router(students.router)
 # --- Root Endpoint ---
 @app.get("/")
 def read_root():
-    return {"message": "Welcome to the Student Management API"}
\ No newline at end of file
+    return {"message": "Welcome to the Student Management API"}
+
+@app.get("/auth/cache-stats", summary="Credential cache hit/miss counters (Admin only)")
+def get_credential_cache_stats(admin_user: User = Depends(get_current_admin)):
+    return credential_cache.stats()
@@ -1,5 +1,6 @@
 from typing import Optional, Dict, Any, List
 from sqlmodel import Field, SQLModel, Relationship, JSON, String
+from sqlalchemy import Index, UniqueConstraint
 import json
 
 
@@ -18,10 +19,57 @@ class Student(SQLModel, table=True):
     name: str = Field(index=True)
     age: int
     email: str = Field(unique=True)
-    grades: str = Field(default="{}")
 
     # One-to-one relationship with User model
     user: Optional[User] = Relationship(back_populates="student")
+    # One row per subject, see Grade
+    grade_entries: List["Grade"] = Relationship(
+        back_populates="student",
+        sa_relationship_kwargs={"cascade": "all, delete-orphan"}
+    )
+    # Subjects whose grade is not a number, see OtherGrade
+    other_grade_entries: List["OtherGrade"] = Relationship(
+        back_populates="student",
+        sa_relationship_kwargs={"cascade": "all, delete-orphan"}
+    )
+
+    def grades_dict(self) -> Dict[str, Any]:
+        grades = {grade.subject: json.loads(grade.value) for grade in self.other_grade_entries}
+        # Whole-number scores go out as ints, as they did when grades were stored as JSON
+        grades.update(
+            (grade.subject, int(grade.score) if grade.score.is_integer() else grade.score)
+            for grade in self.grade_entries
+        )
+        return grades
+
+def is_score(value: Any) -> bool:
+    """Whether a grade value belongs in the grade table (bool is an int, but not a score)."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+class Grade(SQLModel, table=True):
+    __table_args__ = (
+        UniqueConstraint("student_id", "subject"),
+        # Covers per-subject aggregation without touching the table rows
+        Index("ix_grade_subject_score", "subject", "score"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    student_id: int = Field(foreign_key="student.id", index=True)
+    subject: str
+    score: float
+
+    student: Optional[Student] = Relationship(back_populates="grade_entries")
+
+class OtherGrade(SQLModel, table=True):
+    """A grade that is not a number (a letter grade, pass/fail, ...), kept as JSON text."""
+    __table_args__ = (UniqueConstraint("student_id", "subject"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    student_id: int = Field(foreign_key="student.id", index=True)
+    subject: str
+    value: str
+
+    student: Optional[Student] = Relationship(back_populates="other_grade_entries")
 
 class StudentCreate(SQLModel):
     name: str
@@ -35,6 +83,53 @@ class StudentUpdate(SQLModel):
     email: Optional[str] = None
     grades: Optional[Dict[str, Any]] = None
 
+class StudentRead(SQLModel):
+    """Response shape of a student, with grades folded back into a dict."""
+    id: int
+    name: str
+    age: int
+    email: str
+    grades: Dict[str, Any] = {}
+
+    @classmethod
+    def from_student(cls, student: Student) -> "StudentRead":
+        return cls(
+            id=student.id,
+            name=student.name,
+            age=student.age,
+            email=student.email,
+            grades=student.grades_dict()
+        )
+
+class SubjectStats(SQLModel):
+    subject: str
+    count: int
+    mean: float
+    min: float
+    max: float
+    p25: float
+    p50: float
+    p75: float
+    p90: float
+
 class UserLogin(SQLModel):
     username: str
-    password: str
\ No newline at end of file
+    password: str
+
+class StudentImportRow(SQLModel):
+    """One row of a bulk import: the login account plus its student record."""
+    username: str
+    password: str
+    name: Optional[str] = None  # Defaults to the username, matching create_student's linking rule
+    age: int
+    email: str
+    grades: Dict[str, Any] = {}
+
+class ImportRowError(SQLModel):
+    row: int
+    error: str
+
+class ImportReport(SQLModel):
+    created: int
+    failed: int
+    errors: List[ImportRowError] = []
@@ -0,0 +1,220 @@
+import asyncio
+import glob
+import gzip
+import json
+import os
+import shutil
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional
+
+from colorama import Fore, Style
+
+LogEntry = Dict[str, Any]
+
+
+class RequestLogSink(ABC):
+    """Base class for request-log sinks used by the logging middleware."""
+
+    async def start(self) -> None:
+        pass
+
+    @abstractmethod
+    def emit(self, entry: LogEntry) -> None:
+        """Records one entry; called on the request path, so it must not block."""
+
+    async def stop(self) -> None:
+        pass
+
+
+class NDJSONRequestLog(RequestLogSink):
+    """
+    Buffered, append-only request log.
+
+    Entries are queued in memory and a background task writes them to disk
+    as NDJSON in batches. The active file is rotated by size and/or age and
+    rotated segments can optionally be gzipped. When the queue is full new
+    entries are dropped and counted instead of blocking the request.
+    """
+
+    def __init__(
+        self,
+        path: str = "request_log.ndjson",
+        max_queue_size: int = 10_000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_bytes: Optional[int] = 10 * 1024 * 1024,
+        rotate_interval: Optional[float] = 24 * 60 * 60,
+        compress_rotated: bool = True,
+    ):
+        self.path = path
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.compress_rotated = compress_rotated
+
+        self.written = 0
+        self.dropped = 0
+        self.write_errors = 0
+        self.rotations = 0
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: List[LogEntry] = []
+        self._inflight: Optional[asyncio.Future] = None
+        self._opened_at = time.time()
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        if os.path.exists(self.path):
+            self._opened_at = os.stat(self.path).st_mtime
+        else:
+            self._opened_at = time.time()
+        self._task = asyncio.create_task(self._run())
+
+    def emit(self, entry: LogEntry) -> None:
+        """Queues an entry without blocking; drops it if the queue is full."""
+        if self._queue is None:
+            self.dropped += 1
+            return
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def stop(self) -> None:
+        """Stops the writer task and flushes everything still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._inflight is not None:
+            await self._inflight
+            self._inflight = None
+        if self._queue is not None:
+            batch, self._pending = self._pending + self._drain(self.batch_size - len(self._pending)), []
+            while batch:
+                self._write_batch(batch)
+                batch = self._drain()
+            self._queue = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "write_errors": self.write_errors,
+            "rotations": self.rotations,
+        }
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._pending.append(await self._queue.get())
+            # Give the batch a moment to fill up before touching the disk.
+            if self._queue.qsize() < self.batch_size:
+                await asyncio.sleep(self.flush_interval)
+            batch, self._pending = self._pending + self._drain(self.batch_size - len(self._pending)), []
+            self._inflight = loop.run_in_executor(None, self._write_batch, batch)
+            await asyncio.shield(self._inflight)
+            self._inflight = None
+
+    def _drain(self, limit: Optional[int] = None) -> List[LogEntry]:
+        limit = self.batch_size if limit is None else limit
+        batch: List[LogEntry] = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    def _write_batch(self, batch: List[LogEntry]) -> None:
+        if not batch:
+            return
+        try:
+            if self._should_rotate():
+                self._rotate()
+            data = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in batch)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+            self.written += len(batch)
+        except OSError as e:
+            self.write_errors += 1
+            self.dropped += len(batch)
+            print(f"{Fore.RED}ERROR: Failed to write to log file: {e}{Style.RESET_ALL}")
+
+    def _should_rotate(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        if self.max_bytes is not None and os.stat(self.path).st_size >= self.max_bytes:
+            return True
+        if self.rotate_interval is not None and time.time() - self._opened_at >= self.rotate_interval:
+            return True
+        return False
+
+    def _rotate(self) -> None:
+        base, ext = os.path.splitext(self.path)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        # The zero-padded counter keeps segments in lexical == chronological order.
+        suffix = 0
+        rotated = f"{base}.{stamp}-{suffix:03d}{ext}"
+        while os.path.exists(rotated) or os.path.exists(rotated + ".gz"):
+            suffix += 1
+            rotated = f"{base}.{stamp}-{suffix:03d}{ext}"
+        os.replace(self.path, rotated)
+        if self.compress_rotated:
+            with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(rotated)
+        self._opened_at = time.time()
+        self.rotations += 1
+
+
+def log_segments(path: str = "request_log.ndjson") -> List[str]:
+    """Returns the rotated segments (oldest first) followed by the active file."""
+    base, ext = os.path.splitext(path)
+    segments = glob.glob(f"{glob.escape(base)}.*{ext}") + glob.glob(f"{glob.escape(base)}.*{ext}.gz")
+    segments = sorted(s for s in segments if s != path)
+    if os.path.exists(path):
+        segments.append(path)
+    return segments
+
+
+def read_request_log(path: str = "request_log.ndjson") -> Iterator[LogEntry]:
+    """Yields every logged entry across rotated (optionally gzipped) segments."""
+    for segment in log_segments(path):
+        opener = gzip.open if segment.endswith(".gz") else open
+        with opener(segment, "rt", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def export_json_array(path: str = "request_log.ndjson", dest: str = "request_log.json") -> int:
+    """Writes the whole log to `dest` in the legacy JSON-array format."""
+    count = 0
+    with open(dest, "w", encoding="utf-8") as out:
+        out.write("[")
+        for entry in read_request_log(path):
+            out.write(",\n    " if count else "\n    ")
+            out.write(json.dumps(entry))
+            count += 1
+        out.write("\n]" if count else "]")
+    return count
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the NDJSON request log as a JSON array.")
+    parser.add_argument("--log", default="request_log.ndjson")
+    parser.add_argument("--out", default="request_log.json")
+    args = parser.parse_args()
+    print(f"Exported {export_json_array(args.log, args.out)} entries to {args.out}")
@@ -1,34 +1,95 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
-from typing import List, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session, select, func, case
+from sqlalchemy.orm import selectinload
+from typing import List, Dict, Any, Iterator, Literal, Optional
 import json
 
-from app.database import get_session
-from app.models import Student, StudentCreate, StudentUpdate, User, UserLogin
+from app.bulk_import import ImportTooLarge, import_rows, parse_import
+from app.database import engine, get_session
+from app.models import Grade, ImportReport, OtherGrade, Student, StudentCreate, StudentRead, StudentUpdate, SubjectStats, User, UserLogin, is_score
 from app.security import get_current_admin, get_authenticated_user, hash_password
 
 router = APIRouter(prefix="/students", tags=["students"])
 
+# Loads both kinds of grade rows with the students, one query each
+GRADE_LOADERS = (selectinload(Student.grade_entries), selectinload(Student.other_grade_entries))
+
 def get_student_or_404(session: Session, student_id: int) -> Student:
-    """Helper function to fetch a student and deserialize their grades."""
-    student = session.get(Student, student_id)
+    """Helper function to fetch a student together with their grade rows."""
+    student = session.exec(
+        select(Student).where(Student.id == student_id).options(*GRADE_LOADERS)
+    ).first()
     if not student:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Student with ID {student_id} not found.")
-    
-    # We deserialize the grades string here for endpoints that need it
-    if student.grades:
-        student.grades = json.loads(student.grades)
-    else:
-        student.grades = {}
     return student
 
-# New helper function for fetching without deserialization
-def get_student_for_deletion(session: Session, student_id: int) -> Student:
-    """Helper function to fetch a student without deserializing grades."""
-    student = session.get(Student, student_id)
-    if not student:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Student with ID {student_id} not found.")
-    return student
+def set_grades(student: Student, grades: Dict[str, Any]) -> None:
+    """Replaces a student's grades: numbers become Grade rows, any other value an OtherGrade row."""
+    # Existing rows are updated in place so the (student_id, subject) unique
+    # constraint never sees a delete and an insert of the same subject.
+    existing = {grade.subject: grade for grade in student.grade_entries}
+    existing_other = {grade.subject: grade for grade in student.other_grade_entries}
+    entries = []
+    other_entries = []
+    for subject, value in grades.items():
+        if is_score(value):
+            grade = existing.get(subject) or Grade(subject=subject)
+            grade.score = value
+            entries.append(grade)
+        else:
+            other = existing_other.get(subject) or OtherGrade(subject=subject)
+            other.value = json.dumps(value)
+            other_entries.append(other)
+    student.grade_entries = entries
+    student.other_grade_entries = other_entries
+
+# Percentiles reported by /students/stats (nearest-rank method)
+STATS_PERCENTILES = (25, 50, 75, 90)
+
+# Page size of GET /students/ when only a cursor is given
+DEFAULT_PAGE_SIZE = 100
+
+# Rows fetched per round trip when streaming the full student list
+STREAM_BATCH_SIZE = 500
+
+# Content types accepted by POST /students/bulk
+IMPORT_FORMATS = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+def stream_students(after: Optional[int], fmt: str) -> Iterator[bytes]:
+    """
+    Yields every student (id > after) as a JSON array or NDJSON, batch by batch.
+
+    Rows come from a server-side cursor (yield_per) and each batch is dropped
+    once serialized (the identity map only holds weak references), so memory
+    stays flat regardless of table size. The generator owns its session
+    because it outlives the request dependency.
+    """
+    query = select(Student).options(*GRADE_LOADERS).order_by(Student.id)
+    if after is not None:
+        query = query.where(Student.id > after)
+
+    with Session(engine) as session:
+        result = session.exec(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+        first = True
+        if fmt == "json":
+            yield b"["
+        for batch in result.partitions():
+            rows = [StudentRead.from_student(student).model_dump_json() for student in batch]
+            if fmt == "ndjson":
+                yield ("\n".join(rows) + "\n").encode()
+            else:
+                yield (("" if first else ",") + ",".join(rows)).encode()
+            first = False
+        if fmt == "json":
+            yield b"]"
 
 # --- New Endpoints for Students ---
 @router.post("/register", status_code=status.HTTP_201_CREATED, summary="Register a new student account (Admin only)")
@@ -52,7 +113,7 @@ def register_student_account(
     
     return {"message": "Student account registered successfully.", "username": new_user.username}
 
-@router.get("/me", response_model=Student, summary="View my grades (Students only)")
+@router.get("/me", response_model=StudentRead, summary="View my grades (Students only)")
 def get_my_grades(
     current_user: User = Depends(get_authenticated_user),
     session: Session = Depends(get_session)
@@ -70,10 +131,10 @@ def get_my_grades(
         )
     
     student = get_student_or_404(session, current_user.student_id)
-    return student
+    return StudentRead.from_student(student)
 
 # --- Admin-only Endpoints ---
-@router.post("/", response_model=Student, status_code=status.HTTP_201_CREATED, summary="Create a new student record (Admin only)")
+@router.post("/", response_model=StudentRead, status_code=status.HTTP_201_CREATED, summary="Create a new student record (Admin only)")
 def create_student(
     student_in: StudentCreate, 
     session: Session = Depends(get_session), 
@@ -99,11 +160,8 @@ def create_student(
             detail=f"User '{user_to_link.username}' is already linked to a student record."
         )
     
-    student_data = student_in.model_dump()
-    if student_in.grades:
-        student_data['grades'] = json.dumps(student_in.grades)
-    
-    new_student = Student(**student_data)
+    new_student = Student(**student_in.model_dump(exclude={"grades"}))
+    set_grades(new_student, student_in.grades)
     
     session.add(new_student)
     session.commit()
@@ -112,33 +170,109 @@ def create_student(
     user_to_link.student_id = new_student.id
     session.add(user_to_link)
     session.commit()
-    session.refresh(new_student)
     
-    new_student.grades = json.loads(new_student.grades)
-    return new_student
-
-@router.get("/", response_model=List[Student], summary="Retrieve all students (Admin only)")
-def get_all_students(*, session: Session = Depends(get_session), admin_user: User = Depends(get_current_admin)):
-    students = session.exec(select(Student)).all()
-    for student in students:
-        if student.grades:
-            student.grades = json.loads(student.grades)
-        else:
-            student.grades = {}
-    return students
+    return StudentRead.from_student(new_student)
+
+@router.post("/bulk", response_model=ImportReport, summary="Bulk import student accounts and records (Admin only)")
+async def bulk_import_students(request: Request, admin_user: User = Depends(get_current_admin)):
+    """
+    Creates a user account and linked student record per row of a CSV
+    (header: username,password,name,age,email,grades) or NDJSON body.
+    `name` defaults to the username and `grades` is a JSON object. Rows are
+    validated as the body streams in; all valid rows are inserted in one
+    transaction and every rejected row is listed in the report. Bodies past
+    BULK_IMPORT_MAX_ROWS rows or BULK_IMPORT_MAX_BYTES bytes get a 413.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    fmt = IMPORT_FORMATS.get(content_type)
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send the import as text/csv or application/x-ndjson."
+        )
+
+    try:
+        rows, errors = await parse_import(request.stream(), fmt)
+    except ImportTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    created, import_errors = await run_in_threadpool(import_rows, rows)
+    errors = sorted(errors + import_errors, key=lambda error: error.row)
+    return ImportReport(created=created, failed=len(errors), errors=errors)
+
+@router.get("/", response_model=List[StudentRead], summary="Retrieve students, paginated by ID (Admin only)")
+def get_all_students(
+    *,
+    session: Session = Depends(get_session),
+    admin_user: User = Depends(get_current_admin),
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size"),
+    after: Optional[int] = Query(None, description="Return students with an ID greater than this cursor"),
+    stream: bool = Query(False, description="Stream every remaining student instead of a single page"),
+    format: Literal["json", "ndjson"] = Query("json", description="Streaming format")
+):
+    """
+    Student list. Without `limit` or `after`, every student is returned, as
+    before pagination existed. Otherwise it is keyset-paginated (`limit`
+    defaults to DEFAULT_PAGE_SIZE when only `after` is given): the cursor for
+    the next page is returned in the `X-Next-Cursor` header and is absent on
+    the last page. With `stream=true` all students after the cursor are
+    streamed and `limit` is ignored.
+    """
+    if stream:
+        media_type = "application/x-ndjson" if format == "ndjson" else "application/json"
+        return StreamingResponse(stream_students(after, format), media_type=media_type)
 
-@router.get("/{student_id}", response_model=Student, summary="Retrieve a single student by ID (Admin only)")
+    query = select(Student).options(*GRADE_LOADERS).order_by(Student.id)
+    if after is not None:
+        query = query.where(Student.id > after)
+        limit = limit or DEFAULT_PAGE_SIZE
+    if limit is not None:
+        query = query.limit(limit)
+    students = session.exec(query).all()
+
+    if limit is not None and len(students) == limit:
+        response.headers["X-Next-Cursor"] = str(students[-1].id)
+    return [StudentRead.from_student(student) for student in students]
+
+@router.get("/stats", response_model=List[SubjectStats], summary="Per-subject grade statistics (Admin only)")
+def get_grade_stats(*, session: Session = Depends(get_session), admin_user: User = Depends(get_current_admin)):
+    """Computes count, mean, min, max and percentiles per subject in a single SQL pass."""
+    ranked = select(
+        Grade.subject,
+        Grade.score,
+        func.row_number().over(partition_by=Grade.subject, order_by=Grade.score).label("rn"),
+        func.count().over(partition_by=Grade.subject).label("n"),
+    ).subquery()
+
+    percentile_columns = [
+        # Nearest rank: ceil(p / 100 * n), in integer arithmetic
+        func.max(case((ranked.c.rn == (p * ranked.c.n + 99) // 100, ranked.c.score))).label(f"p{p}")
+        for p in STATS_PERCENTILES
+    ]
+    query = select(
+        ranked.c.subject,
+        func.count().label("count"),
+        func.avg(ranked.c.score).label("mean"),
+        func.min(ranked.c.score).label("min"),
+        func.max(ranked.c.score).label("max"),
+        *percentile_columns,
+    ).group_by(ranked.c.subject).order_by(ranked.c.subject)
+
+    return [SubjectStats(**row._mapping) for row in session.exec(query)]
+
+@router.get("/{student_id}", response_model=StudentRead, summary="Retrieve a single student by ID (Admin only)")
 def get_student_by_id(*, session: Session = Depends(get_session), student_id: int, admin_user: User = Depends(get_current_admin)):
     student = get_student_or_404(session, student_id)
-    return student
+    return StudentRead.from_student(student)
 
-@router.put("/{student_id}", response_model=Student, summary="Update an existing student (Admin only)")
+@router.put("/{student_id}", response_model=StudentRead, summary="Update an existing student (Admin only)")
 def update_student(*, session: Session = Depends(get_session), student_id: int, student_in: StudentUpdate, admin_user: User = Depends(get_current_admin)):
     student = get_student_or_404(session, student_id)
     student_data = student_in.model_dump(exclude_unset=True)
     
-    if "grades" in student_data:
-        student_data['grades'] = json.dumps(student_data['grades'])
+    grades = student_data.pop("grades", None)
+    if grades is not None:
+        set_grades(student, grades)
     
     for key, value in student_data.items():
         setattr(student, key, value)
@@ -146,13 +280,12 @@ def update_student(*, session: Session = Depends(get_session), student_id: int,
     session.add(student)
     session.commit()
     session.refresh(student)
-    student.grades = json.loads(student.grades)
-    return student
+    return StudentRead.from_student(student)
 
 @router.delete("/{student_id}", status_code=status.HTTP_204_NO_CONTENT, summary="Delete a student (Admin only)")
 def delete_student(*, session: Session = Depends(get_session), student_id: int, admin_user: User = Depends(get_current_admin)):
-    # Use the new helper function to get the student without deserializing grades
-    student = get_student_for_deletion(session, student_id)
+    # Grade rows are removed along with the student via the relationship cascade
+    student = get_student_or_404(session, student_id)
     
     user_to_delete = session.exec(select(User).where(User.student_id == student_id)).first()
     if user_to_delete:
@@ -1,9 +1,16 @@
+import hashlib
+import hmac
 import json
 import os
+import threading
+import time
+from collections import OrderedDict
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Set
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session as OrmSession
 from sqlmodel import Session, select
 
 from app.database import get_session
@@ -18,17 +25,171 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+class CredentialCache:
+    """
+    Bounded LRU cache of successfully verified HTTP Basic credentials.
+
+    Entries are keyed by an HMAC of username and password under a per-process
+    secret, so the plaintext password is never stored. A hit skips both the
+    bcrypt verification and the User lookup and returns a detached snapshot
+    of the user. Entries expire after `ttl` seconds, and every entry for a
+    user is dropped when a commit changes their password, role or student
+    link or deletes them (see `_collect_changed_users`).
+
+    Each invalidation also bumps the username's generation. A lookup reads
+    the generation before loading the user and hands it to `put`, which
+    skips the insert if it moved: credentials verified against a row read
+    just before a change committed are never cached after it.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._secret = os.urandom(32)
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._keys_by_username: Dict[str, Set[bytes]] = {}
+        # Bumped on every invalidation, whether or not anything was cached
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, username: str, password: str) -> bytes:
+        message = username.encode() + b"\x00" + password.encode()
+        return hmac.new(self._secret, message, hashlib.sha256).digest()
+
+    def get(self, username: str, password: str) -> Optional[User]:
+        key = self._key(username, password)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return User(**user.model_dump())
+
+    def generation(self, username: str) -> int:
+        """Read before loading the user; pass it to `put`."""
+        with self._lock:
+            return self._generations.get(username, 0)
+
+    def put(self, username: str, password: str, user: User, generation: int) -> None:
+        """Caches verified credentials unless `username` was invalidated since `generation` was read."""
+        key = self._key(username, password)
+        snapshot = User(**user.model_dump())  # column values only, no relationships
+        with self._lock:
+            if self._generations.get(username, 0) != generation:
+                return
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, snapshot)
+            self._keys_by_username.setdefault(username, set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, username: str) -> None:
+        """Drops every cached credential for `username`."""
+        with self._lock:
+            self._generations[username] = self._generations.get(username, 0) + 1
+            for key in list(self._keys_by_username.get(username, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_username.clear()
+            self._generations.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key: bytes) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        username = entry[1].username
+        keys = self._keys_by_username.get(username)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_username[username]
+
+
+credential_cache = CredentialCache(
+    max_size=int(os.getenv("CREDENTIAL_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("CREDENTIAL_CACHE_TTL", "300")),
+)
+
+# User columns a cached credential depends on
+CACHED_USER_FIELDS = ("username", "hashed_password", "role", "student_id")
+
+@event.listens_for(OrmSession, "after_flush")
+def _collect_changed_users(session, flush_context) -> None:
+    """Remembers users whose cached credentials a flush made stale."""
+    stale = session.info.setdefault("stale_credentials", set())
+    for user in session.deleted:
+        if isinstance(user, User):
+            stale.add(user.username)
+    for user in session.dirty:
+        if not isinstance(user, User):
+            continue
+        attributes = inspect(user).attrs
+        for field in CACHED_USER_FIELDS:
+            history = attributes[field].history
+            if history.has_changes():
+                stale.add(user.username)
+                if field == "username":
+                    stale.update(history.deleted)
+
+@event.listens_for(OrmSession, "after_commit")
+def _invalidate_changed_users(session) -> None:
+    # Only after commit: invalidating earlier would let a concurrent login
+    # re-cache the old credentials while the change is still uncommitted
+    for username in session.info.pop("stale_credentials", ()):
+        credential_cache.invalidate(username)
+
+@event.listens_for(OrmSession, "after_rollback")
+def _forget_changed_users(session) -> None:
+    session.info.pop("stale_credentials", None)
+
 def get_authenticated_user(
     credentials: HTTPBasicCredentials = Depends(security),
     session: Session = Depends(get_session)
 ) -> User:
     """Authenticates a user and returns their user data from the database."""
+    cached_user = credential_cache.get(credentials.username, credentials.password)
+    if cached_user is not None:
+        return cached_user
+
+    generation = credential_cache.generation(credentials.username)
     user = session.exec(select(User).where(User.username == credentials.username)).first()
     if not user or not verify_password(credentials.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
         )
+    credential_cache.put(credentials.username, credentials.password, user, generation)
     return user
 
 def get_current_admin(user: User = Depends(get_authenticated_user)) -> User:
@@ -0,0 +1,62 @@
+"""
+Throughput of GET /students/ with the verified-credential cache off and on.
+
+    python benchmarks/credential_cache.py [--requests 50] [--students 100]
+
+Runs the app in-process (TestClient) against a scratch database, so the
+numbers are the app's own cost per request, bcrypt included.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--requests", type=int, default=50)
+parser.add_argument("--students", type=int, default=100)
+args = parser.parse_args()
+
+# The app keeps its database and request log in the working directory
+scratch = tempfile.TemporaryDirectory(prefix="credential_cache_benchmark_")
+os.chdir(scratch.name)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.database import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.security import credential_cache  # noqa: E402
+
+engine.echo = False
+ADMIN = ("admin", "admin_password")
+
+
+def run(client: TestClient, label: str) -> float:
+    credential_cache.clear()
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        response = client.get("/students/", auth=ADMIN)
+        assert response.status_code == 200, response.text
+    elapsed = time.perf_counter() - started
+    print(f"{label:>12}: {args.requests / elapsed:8.1f} requests/s ({elapsed / args.requests * 1000:.2f} ms each)")
+    return elapsed
+
+
+with TestClient(app) as client:
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO student (name, age, email) VALUES (?, 20, ?)",
+            [(f"Student {i}", f"student{i}@example.com") for i in range(args.students)]
+        )
+    print(f"GET /students/ as admin, {args.students} students, {args.requests} requests")
+
+    max_size = credential_cache.max_size
+    credential_cache.max_size = 0  # Every entry is evicted as soon as it is added
+    uncached = run(client, "cache off")
+    credential_cache.max_size = max_size
+    cached = run(client, "cache on")
+    print(f"{'speed-up':>12}: {uncached / cached:8.1f}x  {credential_cache.stats()}")
+
+os.chdir(os.path.dirname(scratch.name))
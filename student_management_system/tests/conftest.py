@@ -0,0 +1,37 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app keeps its SQLite file and request log in the working directory:
+# run the suite in a scratch one, with the project importable from there
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(tempfile.mkdtemp(prefix="student_tests_"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+
+from app.database import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.security import credential_cache  # noqa: E402
+
+ADMIN = ("admin", "admin_password")
+
+
+@pytest.fixture
+def client():
+    SQLModel.metadata.drop_all(engine)
+    credential_cache.clear()
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def create_student_account(client: TestClient, username: str, password: str, **student) -> dict:
+    """Registers a login and the student record linked to it; returns the record."""
+    response = client.post("/students/register", json={"username": username, "password": password}, auth=ADMIN)
+    assert response.status_code == 201, response.text
+    record = {"name": username, "age": 20, "email": f"{username}@example.com", **student}
+    response = client.post("/students/", json=record, auth=ADMIN)
+    assert response.status_code == 201, response.text
+    return response.json()
@@ -0,0 +1,141 @@
+import json
+
+from sqlmodel import Session
+
+from app import bulk_import
+from app.database import engine
+from app.models import User
+from app.security import hash_password
+from conftest import ADMIN, create_student_account
+
+NDJSON = {"content-type": "application/x-ndjson"}
+
+
+def ndjson(*rows) -> str:
+    return "\n".join(row if isinstance(row, str) else json.dumps(row) for row in rows) + "\n"
+
+
+def student_row(username: str, **fields) -> dict:
+    return {"username": username, "password": f"{username}_password", "age": 20, "email": f"{username}@example.com", **fields}
+
+
+def test_import_creates_students_with_logins_and_grades(client):
+    body = (
+        "username,password,name,age,email,grades\n"
+        'alice,alice_password,Alice,21,alice@example.com,"{""math"": 90, ""art"": ""A""}"\n'
+        "bob,bob_password,,22,bob@example.com,\n"
+    )
+
+    response = client.post("/students/bulk", content=body, headers={"content-type": "text/csv"}, auth=ADMIN)
+
+    assert response.status_code == 200, response.text
+    assert response.json() == {"created": 2, "failed": 0, "errors": []}
+    alice = client.get("/students/me", auth=("alice", "alice_password")).json()
+    assert (alice["name"], alice["age"], alice["email"]) == ("Alice", 21, "alice@example.com")
+    assert alice["grades"] == {"math": 90, "art": "A"}
+    bob = client.get("/students/me", auth=("bob", "bob_password")).json()
+    assert (bob["name"], bob["grades"]) == ("bob", {})
+
+
+def test_duplicates_within_the_file_are_reported(client):
+    body = ndjson(
+        student_row("alice"),
+        student_row("alice", email="other@example.com"),
+        student_row("bob", email="alice@example.com"),
+    )
+
+    response = client.post("/students/bulk", content=body, headers=NDJSON, auth=ADMIN)
+
+    assert response.json() == {
+        "created": 1,
+        "failed": 2,
+        "errors": [
+            {"row": 2, "error": "Duplicate username in import."},
+            {"row": 3, "error": "Duplicate email in import."},
+        ],
+    }
+
+
+def test_duplicates_already_registered_are_reported(client):
+    create_student_account(client, "alice", "alice_password")
+    create_student_account(client, "bob", "bob_password")
+    body = ndjson(
+        student_row("alice", email="new@example.com"),
+        student_row("carol", email="bob@example.com"),
+        student_row("dave"),
+    )
+
+    response = client.post("/students/bulk", content=body, headers=NDJSON, auth=ADMIN)
+
+    assert response.json() == {
+        "created": 1,
+        "failed": 2,
+        "errors": [
+            {"row": 1, "error": "Username already registered."},
+            {"row": 2, "error": "A student with this email already exists."},
+        ],
+    }
+    assert client.get("/students/me", auth=("dave", "dave_password")).status_code == 200
+
+
+def test_malformed_rows_are_reported_and_the_rest_imported(client):
+    body = ndjson(
+        "{not json",
+        {"username": "alice", "password": "alice_password", "email": "alice@example.com"},  # No age
+        student_row("bob"),
+    )
+
+    response = client.post("/students/bulk", content=body, headers=NDJSON, auth=ADMIN)
+
+    report = response.json()
+    assert (report["created"], report["failed"]) == (1, 2)
+    assert [error["row"] for error in report["errors"]] == [1, 2]
+    assert "age" in report["errors"][1]["error"]
+
+    response = client.post(
+        "/students/bulk", content="username,password,age,email\ncarol,pw,20\n", headers={"content-type": "text/csv"}, auth=ADMIN
+    )
+    assert response.json() == {"created": 0, "failed": 1, "errors": [{"row": 1, "error": "Expected 4 columns, got 3."}]}
+
+
+def test_registration_between_the_check_and_the_insert_is_reported(client, monkeypatch):
+    hash_passwords = bulk_import.hash_passwords
+
+    def register_bob_meanwhile(passwords):
+        # Runs after the duplicate check, before the INSERTs
+        with Session(engine) as session:
+            session.add(User(username="bob", hashed_password=hash_password("other"), role="student"))
+            session.commit()
+        return hash_passwords(passwords)
+
+    monkeypatch.setattr(bulk_import, "hash_passwords", register_bob_meanwhile)
+    body = ndjson(student_row("alice"), student_row("bob"), student_row("carol"))
+
+    response = client.post("/students/bulk", content=body, headers=NDJSON, auth=ADMIN)
+
+    assert response.status_code == 200, response.text
+    assert response.json() == {"created": 2, "failed": 1, "errors": [{"row": 2, "error": "Username already registered."}]}
+    assert client.get("/students/me", auth=("alice", "alice_password")).status_code == 200
+    assert client.get("/students/me", auth=("carol", "carol_password")).status_code == 200
+
+
+def test_oversized_imports_are_refused(client, monkeypatch):
+    monkeypatch.setattr(bulk_import, "MAX_IMPORT_ROWS", 2)
+    body = ndjson(student_row("alice"), student_row("bob"), student_row("carol"))
+
+    response = client.post("/students/bulk", content=body, headers=NDJSON, auth=ADMIN)
+
+    assert response.status_code == 413
+    assert client.get("/students/", auth=ADMIN).json() == []
+
+    monkeypatch.setattr(bulk_import, "MAX_IMPORT_BYTES", 64)
+    response = client.post("/students/bulk", content=ndjson(student_row("alice", name="a" * 100)), headers=NDJSON, auth=ADMIN)
+    assert response.status_code == 413
+
+
+def test_import_is_admin_only(client):
+    create_student_account(client, "alice", "alice_password")
+
+    response = client.post("/students/bulk", content=ndjson(student_row("bob")), headers=NDJSON, auth=("alice", "alice_password"))
+
+    assert response.status_code == 403
@@ -0,0 +1,101 @@
+from sqlmodel import Session, select
+
+from app import security
+from app.database import engine
+from app.models import User
+from app.security import credential_cache, hash_password
+from conftest import ADMIN, create_student_account
+
+
+def update_user(username: str, **fields) -> None:
+    with Session(engine) as session:
+        user = session.exec(select(User).where(User.username == username)).one()
+        for name, value in fields.items():
+            setattr(user, name, value)
+        session.add(user)
+        session.commit()
+
+
+def test_repeated_requests_skip_bcrypt(client):
+    # The counters run for the life of the cache, across tests
+    before = credential_cache.stats()
+    for _ in range(3):
+        assert client.get("/students/", auth=ADMIN).status_code == 200
+    stats = credential_cache.stats()
+    assert stats["misses"] - before["misses"] == 1
+    assert stats["hits"] - before["hits"] == 2
+
+
+def test_password_change_invalidates_cached_credentials(client):
+    create_student_account(client, "alice", "old-password")
+    assert client.get("/students/me", auth=("alice", "old-password")).status_code == 200
+
+    update_user("alice", hashed_password=hash_password("new-password"))
+
+    assert client.get("/students/me", auth=("alice", "old-password")).status_code == 401
+    assert client.get("/students/me", auth=("alice", "new-password")).status_code == 200
+
+
+def test_role_change_invalidates_cached_credentials(client):
+    create_student_account(client, "bob", "password")
+    assert client.get("/students/", auth=("bob", "password")).status_code == 403
+
+    update_user("bob", role="admin")
+
+    assert client.get("/students/", auth=("bob", "password")).status_code == 200
+
+
+def test_delete_student_invalidates_cached_credentials(client):
+    student = create_student_account(client, "carol", "password")
+    assert client.get("/students/me", auth=("carol", "password")).status_code == 200
+
+    assert client.delete(f"/students/{student['id']}", auth=ADMIN).status_code == 204
+
+    assert client.get("/students/me", auth=("carol", "password")).status_code == 401
+
+
+def test_rolled_back_change_keeps_cached_credentials(client):
+    create_student_account(client, "dave", "password")
+    assert client.get("/students/me", auth=("dave", "password")).status_code == 200
+    invalidations = credential_cache.stats()["invalidations"]
+
+    with Session(engine) as session:
+        user = session.exec(select(User).where(User.username == "dave")).one()
+        user.role = "admin"
+        session.add(user)
+        session.flush()
+        session.rollback()
+
+    assert credential_cache.stats()["invalidations"] == invalidations
+
+
+def test_password_change_during_a_lookup_is_not_cached_over(client, monkeypatch):
+    create_student_account(client, "erin", "old-password")
+    verify = security.verify_password
+
+    def verify_then_change_password(plain_password, hashed_password):
+        # The user row was read before the change; it commits while bcrypt runs
+        if plain_password == "old-password":
+            monkeypatch.setattr(security, "verify_password", verify)
+            update_user("erin", hashed_password=hash_password("new-password"))
+        return verify(plain_password, hashed_password)
+
+    monkeypatch.setattr(security, "verify_password", verify_then_change_password)
+    # Verified against the row it read, so this one request still gets in
+    assert client.get("/students/me", auth=("erin", "old-password")).status_code == 200
+
+    assert client.get("/students/me", auth=("erin", "old-password")).status_code == 401
+    assert client.get("/students/me", auth=("erin", "new-password")).status_code == 200
+
+
+def test_put_skips_credentials_read_before_an_invalidation(client):
+    with Session(engine) as session:
+        admin = session.exec(select(User).where(User.username == "admin")).one()
+    generation = credential_cache.generation("admin")
+
+    credential_cache.invalidate("admin")
+    credential_cache.put("admin", "admin_password", admin, generation)
+    assert credential_cache.get("admin", "admin_password") is None
+
+    credential_cache.put("admin", "admin_password", admin, credential_cache.generation("admin"))
+    assert credential_cache.get("admin", "admin_password") is not None
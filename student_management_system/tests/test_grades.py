@@ -0,0 +1,84 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel
+
+from app.database import engine
+from app.main import app
+from app.security import credential_cache
+from conftest import ADMIN, create_student_account
+
+LEGACY_STUDENT_DDL = (
+    "CREATE TABLE student (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, age INTEGER NOT NULL, "
+    "email VARCHAR NOT NULL UNIQUE, grades VARCHAR NOT NULL DEFAULT '{}')"
+)
+
+
+def create_legacy_database(rows) -> None:
+    """A database as it was before grades had their own tables."""
+    SQLModel.metadata.drop_all(engine)
+    credential_cache.clear()
+    with engine.begin() as conn:
+        conn.exec_driver_sql(LEGACY_STUDENT_DDL)
+        conn.exec_driver_sql(
+            "INSERT INTO student (id, name, age, email, grades) VALUES (?, ?, 20, ?, ?)",
+            [(student_id, f"s{student_id}", f"s{student_id}@example.com", grades) for student_id, grades in rows]
+        )
+
+
+def student_columns() -> list:
+    with engine.connect() as conn:
+        return [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(student)")]
+
+
+def test_grades_keep_their_json_shape(client):
+    grades = {"math": 90, "physics": 87.5, "art": "A-", "pe": True, "notes": {"term": 1}}
+    student = create_student_account(client, "alice", "password", grades=grades)
+    assert student["grades"] == grades
+    assert isinstance(student["grades"]["math"], int)
+
+    fetched = client.get(f"/students/{student['id']}", auth=ADMIN).json()
+    assert fetched["grades"] == grades
+    assert isinstance(fetched["grades"]["math"], int)
+
+
+def test_whole_number_scores_are_returned_as_ints(client):
+    student = create_student_account(client, "bob", "password", grades={"math": 90.0})
+    assert '"math":90}' in client.get(f"/students/{student['id']}", auth=ADMIN).text
+
+
+def test_subject_can_change_between_score_and_letter(client):
+    student = create_student_account(client, "carol", "password", grades={"math": 70, "art": "B"})
+
+    response = client.put(f"/students/{student['id']}", json={"grades": {"math": "A", "art": 95}}, auth=ADMIN)
+    assert response.status_code == 200, response.text
+    assert response.json()["grades"] == {"math": "A", "art": 95}
+
+    stats = client.get("/students/stats", auth=ADMIN).json()
+    assert [row["subject"] for row in stats] == ["art"]
+
+
+def test_migration_keeps_every_legacy_grade():
+    create_legacy_database([
+        (1, '{"math": 90, "physics": 72.5, "art": "A", "pe": "pass"}'),
+        (2, '{"math": 60, "remarks": null}'),
+        (3, '{}'),
+    ])
+
+    # Startup runs the migration
+    with TestClient(app) as client:
+        assert "grades" not in student_columns()
+        assert client.get("/students/1", auth=ADMIN).json()["grades"] == {"math": 90, "physics": 72.5, "art": "A", "pe": "pass"}
+        assert client.get("/students/2", auth=ADMIN).json()["grades"] == {"math": 60, "remarks": None}
+        assert client.get("/students/3", auth=ADMIN).json()["grades"] == {}
+
+
+def test_migration_aborts_on_unparseable_grades():
+    create_legacy_database([(1, '{"math": 90}'), (2, "not json"), (3, '[90, 80]')])
+
+    with pytest.raises(RuntimeError, match=r"student ids \[2, 3\]"):
+        with TestClient(app):
+            pass
+
+    assert "grades" in student_columns()
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT count(*) FROM grade").scalar() == 0
@@ -0,0 +1,47 @@
+from app.database import engine
+from conftest import ADMIN
+
+
+def insert_students(count: int) -> None:
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO student (name, age, email) VALUES (?, 20, ?)",
+            [(f"Student {i}", f"student{i}@example.com") for i in range(count)]
+        )
+
+
+def test_list_without_parameters_returns_every_student(client):
+    insert_students(250)
+
+    response = client.get("/students/", auth=ADMIN)
+
+    assert response.status_code == 200
+    assert len(response.json()) == 250
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_list_pages_follow_the_cursor(client):
+    insert_students(25)
+
+    seen = []
+    params = {"limit": 10}
+    while True:
+        response = client.get("/students/", params=params, auth=ADMIN)
+        assert response.status_code == 200
+        seen += [student["id"] for student in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        params["after"] = cursor
+
+    assert seen == sorted(seen)
+    assert len(set(seen)) == 25
+
+
+def test_cursor_without_limit_returns_a_default_page(client):
+    insert_students(150)
+
+    response = client.get("/students/", params={"after": 0}, auth=ADMIN)
+
+    assert len(response.json()) == 100
+    assert response.headers["X-Next-Cursor"] == str(response.json()[-1]["id"])
@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+from app.request_log import NDJSONRequestLog, export_json_array, log_segments, read_request_log
+
+
+class RecordingLog(NDJSONRequestLog):
+    """Remembers the size of every batch it writes."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batches = []
+
+    def _write_batch(self, batch):
+        if batch:
+            self.batches.append(len(batch))
+        super()._write_batch(batch)
+
+
+def entries(count: int, start: int = 0) -> list:
+    return [{"method": "GET", "path": "/students/", "i": i} for i in range(start, start + count)]
+
+
+def test_entries_are_written_in_batches(tmp_path):
+    path = str(tmp_path / "log.ndjson")
+
+    async def run() -> RecordingLog:
+        log = RecordingLog(path, batch_size=4, flush_interval=0.05, max_bytes=None, rotate_interval=None)
+        await log.start()
+        for entry in entries(10):
+            log.emit(entry)
+        await asyncio.sleep(0.5)
+        await log.stop()
+        return log
+
+    log = asyncio.run(run())
+
+    assert list(read_request_log(path)) == entries(10)
+    assert log.written == 10
+    assert max(log.batches) <= 4
+    assert len(log.batches) < 10
+
+
+def test_stop_flushes_everything_queued(tmp_path):
+    path = str(tmp_path / "log.ndjson")
+
+    async def run() -> NDJSONRequestLog:
+        # The writer waits a minute for its batch to fill: only stop() can write these
+        log = NDJSONRequestLog(path, flush_interval=60, max_bytes=None, rotate_interval=None)
+        await log.start()
+        for entry in entries(25):
+            log.emit(entry)
+        await asyncio.sleep(0.05)
+        await log.stop()
+        return log
+
+    log = asyncio.run(run())
+
+    assert list(read_request_log(path)) == entries(25)
+    assert log.stats() == {"queued": 0, "written": 25, "dropped": 0, "write_errors": 0, "rotations": 0}
+
+
+def test_full_queue_drops_and_counts(tmp_path):
+    path = str(tmp_path / "log.ndjson")
+
+    async def run() -> NDJSONRequestLog:
+        log = NDJSONRequestLog(path, max_queue_size=3, flush_interval=60)
+        log.emit(entries(1)[0])  # Not started yet
+        await log.start()
+        # No await in between, so the writer cannot take anything off the queue
+        for entry in entries(5):
+            log.emit(entry)
+        await log.stop()
+        return log
+
+    log = asyncio.run(run())
+
+    assert log.dropped == 3
+    assert list(read_request_log(path)) == entries(3)
+
+
+def test_size_rotation_gzips_segments_and_reads_back_in_order(tmp_path):
+    path = str(tmp_path / "log.ndjson")
+
+    async def run() -> NDJSONRequestLog:
+        # Each batch is bigger than max_bytes, so every batch after the first rotates
+        log = NDJSONRequestLog(path, batch_size=2, flush_interval=60, max_bytes=64, rotate_interval=None)
+        await log.start()
+        for entry in entries(9):
+            log.emit(entry)
+        await log.stop()
+        return log
+
+    log = asyncio.run(run())
+
+    segments = log_segments(path)
+    assert log.rotations == 4
+    assert len(segments) == 5
+    assert all(segment.endswith(".gz") for segment in segments[:-1])
+    assert segments[-1] == path
+    assert list(read_request_log(path)) == entries(9)
+
+    dest = str(tmp_path / "log.json")
+    assert export_json_array(path, dest) == 9
+    with open(dest, encoding="utf-8") as f:
+        assert json.load(f) == entries(9)
+
+
+def test_export_of_an_empty_log_is_an_empty_array(tmp_path):
+    dest = str(tmp_path / "log.json")
+
+    assert export_json_array(str(tmp_path / "missing.ndjson"), dest) == 0
+    with open(dest, encoding="utf-8") as f:
+        assert json.load(f) == []